@@ -1,3 +1,4 @@
 from .celery import celery_app
+from . import db  # noqa: F401  (connects the SQLite pragma receiver)
 
 __all__ = ('celery_app',)
\ No newline at end of file
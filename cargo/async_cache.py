@@ -0,0 +1,79 @@
+"""
+Non-blocking access to the default cache for async views.
+
+django-redis has no async API, and Django's own `cache.aget()` only runs the
+blocking client on a worker thread. When the default cache is django-redis,
+`AsyncRedisCache` talks to the same server through redis.asyncio instead.
+It reuses the backend's key format and serializer, so sync and async views
+read and write the same entries. Any other backend (locmem in tests) is
+used through its `a*` methods.
+
+redis.asyncio connections belong to the event loop that opened them, so a
+client is kept per running loop.
+"""
+
+import asyncio
+import threading
+import weakref
+
+import redis.asyncio
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django_redis.cache import RedisCache
+
+from cargo.metrics import InstrumentedRedisCache, record_cache
+
+
+class AsyncRedisCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.counted = isinstance(backend, InstrumentedRedisCache)
+        self._clients = weakref.WeakKeyDictionary()
+
+    def _client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            # django-redis writes to the first server of LOCATION.
+            client = self._clients[loop] = redis.asyncio.Redis.from_url(self.backend.client._server[0])
+        return client
+
+    def _timeout(self, timeout):
+        """Timeout in milliseconds for SET's PX, or None for no expiry."""
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.backend.default_timeout
+        return None if timeout is None else max(int(timeout * 1000), 1)
+
+    async def aget(self, key, default=None):
+        value = await self._client().get(self.backend.client.make_key(key))
+        if self.counted:
+            record_cache(value is not None, value is None)
+        if value is None:
+            return default
+        return self.backend.client.decode(value)
+
+    async def aset(self, key, value, timeout=DEFAULT_TIMEOUT):
+        await self._client().set(self.backend.client.make_key(key), self.backend.client.encode(value),
+                                 px=self._timeout(timeout))
+
+    async def aadd(self, key, value, timeout=DEFAULT_TIMEOUT):
+        return bool(await self._client().set(self.backend.client.make_key(key), self.backend.client.encode(value),
+                                             px=self._timeout(timeout), nx=True))
+
+
+_async_cache = None
+_async_cache_lock = threading.Lock()
+
+
+def get_async_cache():
+    """The default cache with awaitable `aget`, `aset` and `aadd`."""
+    global _async_cache
+
+    backend = caches["default"]
+    if not isinstance(backend, RedisCache):
+        return backend
+    if _async_cache is None:
+        with _async_cache_lock:
+            if _async_cache is None:
+                _async_cache = AsyncRedisCache(backend)
+    return _async_cache
@@ -0,0 +1,255 @@
+"""
+Two-tier cache for small, read-mostly catalog tables.
+
+Reads are served from a per-process LRU with a short TTL, falling back to
+the shared Django cache (Redis) and finally to a loader hitting the
+database. Invalidations delete the shared entry and are broadcast over a
+pub/sub channel so that every process drops its local copy as well; the
+local TTL bounds staleness should a broadcast ever be missed.
+
+Values fresh from a loader are only stored once the surrounding
+transaction commits. A loader run inside an atomic block can see rows the
+block wrote itself, such as tags created by `Tag.objects.resolve`, and
+those never existed if the block rolls back. Callers invalidating after a
+write should likewise do so from `transaction.on_commit`, or a concurrent
+loader could put the old row straight back.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django_redis import get_redis_connection
+
+from cargo.async_cache import get_async_cache
+from cargo.db_router import read_from_primary
+
+logger = logging.getLogger(__name__)
+
+
+class LocalTransport:
+    """In-memory stand-in for Redis pub/sub, delivering to subscribers in this process."""
+
+    def __init__(self):
+        self._subscribers = defaultdict(list)
+
+    def publish(self, channel, message):
+        for callback in list(self._subscribers[channel]):
+            callback(message)
+
+    def subscribe(self, channel, callback):
+        self._subscribers[channel].append(callback)
+
+
+class RedisTransport:
+    """Redis pub/sub, listened to from a daemon thread per process."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def publish(self, channel, message):
+        self.client.publish(channel, message)
+
+    def subscribe(self, channel, callback):
+        def on_message(message):
+            data = message["data"]
+            callback(data.decode() if isinstance(data, bytes) else data)
+
+        def on_error(exception, pubsub, thread):
+            logger.error(f"Catalog invalidation listener failed, retrying: {exception}")
+            time.sleep(1)
+
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{channel: on_message})
+        pubsub.run_in_thread(sleep_time=1, daemon=True, exception_handler=on_error)
+
+
+class LocalLRUCache:
+    """Thread-safe, size-bounded LRU mapping whose entries expire after `timeout` seconds."""
+
+    def __init__(self, max_entries=1024, timeout=60):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def evict(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class TwoTierCache:
+    def __init__(self, backend, transport, channel="catalog_invalidations", key_prefix="catalog",
+                 max_entries=1024, timeout=60, shared_timeout=60 * 60):
+        self.backend = backend
+        self.transport = transport
+        self.channel = channel
+        self.key_prefix = key_prefix
+        self.shared_timeout = shared_timeout
+        self.local = LocalLRUCache(max_entries, timeout)
+        self._subscribe_lock = threading.Lock()
+        self._subscribed = False
+
+    def _shared_key(self, key):
+        return f"{self.key_prefix}:{key}"
+
+    def _subscribe(self):
+        if not self._subscribed:
+            with self._subscribe_lock:
+                if not self._subscribed:
+                    self.transport.subscribe(self.channel, self._on_invalidation)
+                    self._subscribed = True
+
+    def _on_invalidation(self, message):
+        self.local.evict(json.loads(message))
+
+    def _fill(self, loaded):
+        """Store `loaded` ({key: value} fresh from a loader) in both tiers once the transaction commits."""
+        def fill():
+            self.backend.set_many({self._shared_key(key): value for key, value in loaded.items()},
+                                  self.shared_timeout)
+            for key, value in loaded.items():
+                self.local.set(key, value)
+
+        # Runs right away in autocommit mode; dropped if the transaction rolls back.
+        transaction.on_commit(fill)
+
+    @staticmethod
+    def _load_from_primary(loader):
+        with read_from_primary():
+            return loader()
+
+    def get(self, key, loader):
+        """Return the value for `key`, loading it with `loader()` on a miss.
+
+        A loader returning None (e.g. a missing row) is not cached.
+        """
+        self._subscribe()
+        value = self.local.get(key)
+        if value is not None:
+            return value
+
+        value = self.backend.get(self._shared_key(key))
+        if value is None:
+            with read_from_primary():
+                value = loader()
+            if value is not None:
+                self._fill({key: value})
+            return value
+        self.local.set(key, value)
+        return value
+
+    async def aget(self, key, loader):
+        """`get` for async views: the shared tier is read without blocking, and
+        `loader` (still a plain function) runs on a worker thread."""
+        self._subscribe()
+        value = self.local.get(key)
+        if value is not None:
+            return value
+
+        shared = get_async_cache()
+        value = await shared.aget(self._shared_key(key))
+        if value is None:
+            # Async views never run inside a transaction, so there is
+            # nothing to wait for before storing what the loader read.
+            value = await sync_to_async(self._load_from_primary)(loader)
+            if value is None:
+                return None
+            await shared.aset(self._shared_key(key), value, self.shared_timeout)
+        self.local.set(key, value)
+        return value
+
+    def get_many(self, keys, loader):
+        """Like `get` for several keys; `loader(missing_keys)` returns {key: value}."""
+        self._subscribe()
+        found = {}
+        for key in keys:
+            value = self.local.get(key)
+            if value is not None:
+                found[key] = value
+
+        missing = [key for key in keys if key not in found]
+        if missing:
+            shared = self.backend.get_many([self._shared_key(key) for key in missing])
+            for key in missing:
+                value = shared.get(self._shared_key(key))
+                if value is not None:
+                    found[key] = value
+                    self.local.set(key, value)
+
+        missing = [key for key in keys if key not in found]
+        if missing:
+            with read_from_primary():
+                loaded = {key: value for key, value in loader(missing).items() if value is not None}
+            if loaded:
+                self._fill(loaded)
+            found.update(loaded)
+        return found
+
+    def invalidate(self, *keys):
+        """Drop `keys` from the shared cache and from every process's local tier."""
+        self.backend.delete_many([self._shared_key(key) for key in keys])
+        self.local.evict(keys)
+        self.transport.publish(self.channel, json.dumps(keys))
+
+    def set_many(self, mapping, timeout=None):
+        """Store `mapping` in the shared cache and drop stale local copies everywhere."""
+        self.backend.set_many({self._shared_key(key): value for key, value in mapping.items()},
+                              timeout or self.shared_timeout)
+        self.local.evict(mapping)
+        self.transport.publish(self.channel, json.dumps(list(mapping)))
+
+
+_catalog_cache = None
+_catalog_cache_lock = threading.Lock()
+
+
+def get_catalog_cache():
+    global _catalog_cache
+
+    if _catalog_cache is None:
+        with _catalog_cache_lock:
+            if _catalog_cache is None:
+                config = settings.CATALOG_CACHE
+                if config.get("TRANSPORT") == "local":
+                    transport = LocalTransport()
+                else:
+                    transport = RedisTransport(get_redis_connection("default"))
+                _catalog_cache = TwoTierCache(
+                    cache,
+                    transport,
+                    max_entries=config["MAX_ENTRIES"],
+                    timeout=config["TIMEOUT"],
+                    shared_timeout=config["SHARED_TIMEOUT"],
+                )
+    return _catalog_cache
@@ -11,8 +11,40 @@ celery_app.autodiscover_tasks()
 
 
 celery_app.conf.beat_schedule = {
-    'deactivate_expired_subscriptions_daily_at_8am': {
-        'task': 'subscriptions.tasks.deactivate_expired_subscriptions',
-        'schedule': crontab(minute=0, hour=8), 
+    'process_due_subscriptions_hourly': {
+        'task': 'subscription.tasks.process_due_subscriptions',
+        'schedule': crontab(minute=0),
+    },
+    'rescore_recent_content_every_5_minutes': {
+        'task': 'content.tasks.rescore_recent_content',
+        'schedule': crontab(minute='*/5'),
+    },
+    'rollup_user_activity_every_minute': {
+        'task': 'users.tasks.rollup_user_activity',
+        'schedule': crontab(),
+    },
+    'update_similarity_index_every_5_minutes': {
+        'task': 'content.tasks.update_similarity_index',
+        'schedule': crontab(minute='*/5'),
+    },
+    'build_similarity_index_nightly': {
+        'task': 'content.tasks.build_similarity_index',
+        'schedule': crontab(hour=3, minute=30),
+    },
+    'update_related_content_every_10_minutes': {
+        'task': 'content.tasks.update_related_content',
+        'schedule': crontab(minute='*/10'),
+    },
+    'rebuild_related_content_nightly': {
+        'task': 'content.tasks.rebuild_related_content',
+        'schedule': crontab(hour=4, minute=0),
+    },
+    'refresh_trending_every_minute': {
+        'task': 'content.tasks.refresh_trending',
+        'schedule': crontab(),
+    },
+    'drain_activity_buffer_every_5_seconds': {
+        'task': 'users.tasks.drain_activity_buffer',
+        'schedule': 5.0,
     },
 }
\ No newline at end of file
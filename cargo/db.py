@@ -0,0 +1,25 @@
+"""
+SQLite connection tuning.
+
+`apply_sqlite_pragmas` runs on every new SQLite connection and issues the
+PRAGMAs in the SQLITE_PRAGMAS setting (empty by default; the production
+profile in cargo/settings.py fills it in). WAL lets readers run alongside
+the single writer, and busy_timeout makes a blocked writer wait rather
+than fail with "database is locked".
+"""
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    pragmas = getattr(settings, "SQLITE_PRAGMAS", None)
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
@@ -0,0 +1,85 @@
+"""
+Read/write splitting between the primary database and a read replica.
+
+`ReadReplicaMiddleware` marks requests to the read-only views named in
+READ_REPLICA_VIEWS; while such a request is being served,
+`ReadReplicaRouter` sends its reads to the REPLICA_DATABASE alias. All
+writes, every other request, Celery tasks and management commands use
+`default`. A replica lags its primary, so only views that can serve
+slightly stale data belong in READ_REPLICA_VIEWS.
+
+Views that cache what they read don't: their cache hits never reach the
+database, and a miss answered by the lagging replica would be stored
+under a fresh cache key and served for the key's whole lifetime. For the
+same reason, cache loaders wrap their reads in `read_from_primary()`.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+_use_replica = ContextVar("use_replica", default=False)
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+@contextmanager
+def read_from_primary():
+    """Send the reads inside the block to `default`, even in a request routed to the replica."""
+    token = _use_replica.set(False)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get():
+            return settings.REPLICA_DATABASE
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica's schema comes from the primary, not from migrations.
+        return db == "default"
+
+
+class ReadReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _use_replica.set(False)
+        try:
+            return self.get_response(request)
+        finally:
+            _use_replica.reset(token)
+
+    async def __acall__(self, request):
+        token = _use_replica.set(False)
+        try:
+            return await self.get_response(request)
+        finally:
+            _use_replica.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Under ASGI this runs on a worker thread; asgiref copies the
+        # variable back into the request's context when it returns.
+        if request.method in SAFE_METHODS and request.resolver_match.url_name in settings.READ_REPLICA_VIEWS:
+            _use_replica.set(True)
@@ -0,0 +1,25 @@
+import functools
+
+from django.http import HttpResponseNotAllowed
+
+
+def async_require_http_methods(methods):
+    """`django.views.decorators.http.require_http_methods` for async views.
+
+    Django 4.2's decorator wraps views in a sync function, which would make
+    Django run an async view on a worker thread.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return HttpResponseNotAllowed(methods)
+            return await view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+async_require_GET = async_require_http_methods(["GET"])
@@ -0,0 +1,273 @@
+"""
+Per-endpoint performance metrics, exposed in Prometheus text format.
+
+For every request, `MetricsMiddleware` records the following under the
+resolved URL name and method:
+
+- latency, as a histogram;
+- the number and total time of SQL queries;
+- hits and misses on the Django cache.
+
+SQL is timed by an `execute_wrapper` installed once on each database
+connection; it does nothing outside a request. Cache lookups are counted by `InstrumentedRedisCache`,
+a drop-in django-redis backend, and by `cargo.async_cache` for async views.
+The running counters of a request live in a context variable, so they
+follow it into the threads its async ORM calls run on.
+
+Recording never takes a lock. Each thread writes to its own shard of plain
+counters, and the `/metrics` view sums the shards when scraped. Numbers are
+per process, so every worker process has to be scraped. The view answers
+only scrapers presenting settings.METRICS_TOKEN, or, with no token set,
+clients in settings.METRICS_ALLOWED_IPS.
+"""
+
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+from django_redis.cache import RedisCache
+
+# Latency histogram upper bounds, in seconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+UNRESOLVED = "<unresolved>"
+
+
+class EndpointStats:
+    __slots__ = ("statuses", "buckets", "latency_sum", "queries", "query_time", "cache_hits", "cache_misses")
+
+    def __init__(self):
+        self.statuses = {}
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.queries = 0
+        self.query_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+class RequestCounters:
+    """Running SQL and cache counters of one request."""
+
+    __slots__ = ("queries", "query_time", "cache_hits", "cache_misses")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+_request_counters = ContextVar("request_counters", default=None)
+_local = threading.local()
+_shards = []
+_shards_lock = threading.Lock()
+
+
+def current_counters():
+    """The counters of the request being served, or None outside MetricsMiddleware."""
+    return _request_counters.get()
+
+
+def _shard():
+    """This thread's {(view, method): EndpointStats}, registered on first use."""
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = _local.shard = {}
+        with _shards_lock:
+            _shards.append(shard)
+    return shard
+
+
+def _time_query(execute, sql, params, many, context):
+    counters = _request_counters.get()
+    if counters is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        counters.queries += 1
+        counters.query_time += time.perf_counter() - started
+
+
+def _wrap(connection):
+    # The wrapper object outlives reconnections, which send connection_created
+    # again, so it is marked rather than checked against the list each time.
+    if not getattr(connection, "_metrics_wrapped", False):
+        connection.execute_wrappers.append(_time_query)
+        connection._metrics_wrapped = True
+
+
+def _wrap_connections():
+    """Wrap this thread's connections, once per thread."""
+    if not getattr(_local, "connections_wrapped", False):
+        for alias in connections:
+            _wrap(connections[alias])
+        _local.connections_wrapped = True
+
+
+@receiver(connection_created)
+def wrap_new_connection(sender, connection, **kwargs):
+    # Covers the connections of the worker threads async views run their
+    # queries on, which never pass through the middleware themselves.
+    _wrap(connection)
+
+
+def record_cache(hits, misses):
+    counters = _request_counters.get()
+    if counters is not None:
+        counters.cache_hits += hits
+        counters.cache_misses += misses
+
+
+class InstrumentedRedisCache(RedisCache):
+    """django-redis cache that counts hits and misses towards the current request's metrics."""
+
+    _missing = object()
+
+    def get(self, key, default=None, version=None, client=None):
+        value = super().get(key, self._missing, version=version, client=client)
+        if value is self._missing:
+            record_cache(0, 1)
+            return default
+        record_cache(1, 0)
+        return value
+
+    def get_many(self, keys, version=None, client=None):
+        keys = list(keys)
+        found = super().get_many(keys, version=version, client=client)
+        record_cache(len(found), len(keys) - len(found))
+        return found
+
+
+class MetricsMiddleware:
+    """Record latency, SQL and cache metrics per URL name; keep it first in MIDDLEWARE."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        _wrap_connections()
+        counters = RequestCounters()
+        token = _request_counters.set(counters)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_counters.reset(token)
+        self._record(request, response, counters, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        counters = RequestCounters()
+        token = _request_counters.set(counters)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_counters.reset(token)
+        self._record(request, response, counters, time.perf_counter() - started)
+        return response
+
+    def _record(self, request, response, counters, elapsed):
+        match = request.resolver_match
+        key = (match.view_name if match else UNRESOLVED, request.method)
+        shard = _shard()
+        stats = shard.get(key)
+        if stats is None:
+            stats = shard[key] = EndpointStats()
+        stats.statuses[response.status_code] = stats.statuses.get(response.status_code, 0) + 1
+        stats.buckets[bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+        stats.latency_sum += elapsed
+        stats.queries += counters.queries
+        stats.query_time += counters.query_time
+        stats.cache_hits += counters.cache_hits
+        stats.cache_misses += counters.cache_misses
+
+
+def collect():
+    """Sum every thread's shard into {(view, method): EndpointStats}."""
+    with _shards_lock:
+        shards = list(_shards)
+    totals = {}
+    for shard in shards:
+        for key, stats in list(shard.items()):
+            total = totals.get(key)
+            if total is None:
+                total = totals[key] = EndpointStats()
+            for status, count in list(stats.statuses.items()):
+                total.statuses[status] = total.statuses.get(status, 0) + count
+            total.buckets = [a + b for a, b in zip(total.buckets, stats.buckets)]
+            total.latency_sum += stats.latency_sum
+            total.queries += stats.queries
+            total.query_time += stats.query_time
+            total.cache_hits += stats.cache_hits
+            total.cache_misses += stats.cache_misses
+    return totals
+
+
+def _labels(view, method, **extra):
+    pairs = {"view": view, "method": method, **extra}
+    return ",".join(f'{name}="{value}"' for name, value in pairs.items())
+
+
+def render(totals):
+    lines = [
+        "# HELP cargo_http_requests_total Requests served, by URL name, method and status.",
+        "# TYPE cargo_http_requests_total counter",
+    ]
+    for (view, method), stats in sorted(totals.items()):
+        for status, count in sorted(stats.statuses.items()):
+            lines.append(f"cargo_http_requests_total{{{_labels(view, method, status=status)}}} {count}")
+
+    lines += [
+        "# HELP cargo_http_request_duration_seconds Request latency, by URL name and method.",
+        "# TYPE cargo_http_request_duration_seconds histogram",
+    ]
+    for (view, method), stats in sorted(totals.items()):
+        cumulative = 0
+        for bound, count in zip((*LATENCY_BUCKETS, "+Inf"), stats.buckets):
+            cumulative += count
+            lines.append(f"cargo_http_request_duration_seconds_bucket{{{_labels(view, method, le=bound)}}} {cumulative}")
+        lines.append(f"cargo_http_request_duration_seconds_sum{{{_labels(view, method)}}} {stats.latency_sum}")
+        lines.append(f"cargo_http_request_duration_seconds_count{{{_labels(view, method)}}} {cumulative}")
+
+    for name, kind, help_text, attribute in (
+        ("cargo_db_queries_total", "counter", "SQL queries run", "queries"),
+        ("cargo_db_query_duration_seconds_total", "counter", "Time spent in SQL queries", "query_time"),
+        ("cargo_cache_hits_total", "counter", "Django cache lookups that hit", "cache_hits"),
+        ("cargo_cache_misses_total", "counter", "Django cache lookups that missed", "cache_misses"),
+    ):
+        lines += [f"# HELP {name} {help_text}, by URL name and method.", f"# TYPE {name} {kind}"]
+        for (view, method), stats in sorted(totals.items()):
+            lines.append(f"{name}{{{_labels(view, method)}}} {getattr(stats, attribute)}")
+    return "\n".join(lines) + "\n"
+
+
+def _may_scrape(request):
+    token = settings.METRICS_TOKEN
+    if token:
+        return hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+    return request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS
+
+
+def metrics_view(request):
+    if not _may_scrape(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render(collect()), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,42 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from cargo.metrics import current_counters
+
+
+class QueryCountMiddleware:
+    """Report how many SQL queries a request ran in an X-DB-Query-Count header.
+
+    Used by the `loadtest` command to spot N+1 regressions per endpoint.
+    Enabled with the QUERY_COUNT_HEADER setting. The count is read from the
+    request counters kept by `cargo.metrics.MetricsMiddleware`, which must
+    come before this middleware; they also cover the queries async views
+    run on worker threads.
+    """
+
+    header = "X-DB-Query-Count"
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "QUERY_COUNT_HEADER", False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._add_header(self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._add_header(await self.get_response(request))
+
+    def _add_header(self, response):
+        counters = current_counters()
+        if counters is not None:
+            response[self.header] = str(counters.queries)
+        return response
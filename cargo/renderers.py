@@ -0,0 +1,34 @@
+"""
+JSON rendering with orjson.
+
+`ORJSONRenderer` is a drop-in for DRF's JSONRenderer. It produces the same
+compact UTF-8 JSON several times faster. Anything orjson can't encode
+natively, such as datetimes, Decimals, lazy strings and numpy values, goes
+through DRF's own encoder, so values render exactly as before. Without
+orjson installed, and for `?indent=` requests, it falls back to
+JSONRenderer.
+"""
+
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    # Hand datetimes to DRF's encoder too: orjson's format differs from
+    # DRF's (no millisecond truncation, "+00:00" instead of "Z").
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class ORJSONRenderer(JSONRenderer):
+    _encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        return orjson.dumps(data, default=self._encoder.default, option=ORJSON_OPTIONS)
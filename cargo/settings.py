@@ -49,6 +49,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'cargo.metrics.MetricsMiddleware',
+    'cargo.middleware.QueryCountMiddleware',
+    'cargo.db_router.ReadReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,6 +61,9 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Adds an X-DB-Query-Count header to every response (see cargo/middleware.py).
+QUERY_COUNT_HEADER = DEBUG
+
 ROOT_URLCONF = 'cargo.urls'
 
 TEMPLATES = [
@@ -89,6 +95,49 @@ DATABASES = {
     }
 }
 
+# Applied to every new SQLite connection by cargo/db.py.
+SQLITE_PRAGMAS = {}
+
+# Views whose reads may go to the replica when ReadReplicaRouter is active,
+# see cargo/db_router.py. Views that fill a shared cache don't belong here.
+REPLICA_DATABASE = 'replica'
+READ_REPLICA_VIEWS = [
+    'subscription_list',
+    'subscription_by_id',
+    'subscription_by_id_async',
+]
+
+# CARGO_DATABASE_PROFILE=production: persistent connections, WAL and a
+# read replica. The replica is a second SQLite file kept in sync outside
+# Django (Litestream, or `sqlite3 db.sqlite3 ".backup db.replica.sqlite3"`
+# when trying it locally).
+DATABASE_PROFILE = os.environ.get('CARGO_DATABASE_PROFILE', 'development')
+
+if DATABASE_PROFILE == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'timeout': 20},
+    })
+    DATABASES[REPLICA_DATABASE] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('CARGO_REPLICA_DATABASE', BASE_DIR / 'db.replica.sqlite3'),
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'timeout': 20},
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['cargo.db_router.ReadReplicaRouter']
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 20000,
+        'mmap_size': 256 * 1024 * 1024,
+        # Negative values are KiB: 64 MiB of page cache per connection.
+        'cache_size': -64 * 1024,
+        'temp_store': 'MEMORY',
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -138,7 +187,11 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'cargo.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ),
 }
 
@@ -148,6 +201,8 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
     'SIGNING_KEY': 'bcb16482-cbba-45ef-ba7e-9c1f97738b8e',  
+    'TOKEN_OBTAIN_SERIALIZER': 'users.serializers.CargoTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.CargoTokenRefreshSerializer',
 }
 
 
@@ -211,12 +266,65 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 
 
+# Write-behind buffering for activity tracking. When enabled, the activity
+# endpoints only validate and enqueue events (202 Accepted) and
+# `users.tasks.drain_activity_buffer` stores them in bulk. BACKEND 'local'
+# keeps the buffer in process memory and is only meant for development/tests.
+ACTIVITY_BUFFER = {
+    'ENABLED': False,
+    'BACKEND': 'redis',
+    'LOCATION': CELERY_BROKER_URL,
+    'MAX_SIZE': 100000,
+    'DRAIN_BATCH_SIZE': 1000,
+    # Seconds after which a batch claimed by a drain that never acknowledged
+    # it (because it crashed) is handed out again.
+    'CLAIM_TIMEOUT': 300,
+}
+
+
 CACHES = {
     'default': {
-        'BACKEND': 'django_redis.cache.RedisCache',
+        # django-redis, counting hits and misses for /metrics (cargo/metrics.py).
+        'BACKEND': 'cargo.metrics.InstrumentedRedisCache',
         'LOCATION': 'redis://127.0.0.1:6379/1',
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
         }
     }
 }
+
+
+# Two-tier (process-local LRU + Redis) cache for read-mostly catalog tables,
+# see cargo/cache.py. TIMEOUT bounds how long a process may serve a local copy;
+# TRANSPORT 'local' replaces Redis pub/sub with an in-process stand-in.
+CATALOG_CACHE = {
+    'TRANSPORT': 'redis',
+    'MAX_ENTRIES': 1024,
+    'TIMEOUT': 60,
+    'SHARED_TIMEOUT': 60 * 60,
+}
+
+
+# Memory-mapped "similar content" index written by the content similarity
+# tasks, see content/similarity.py. Must be shared by web and worker hosts.
+SIMILARITY_INDEX_DIR = BASE_DIR / 'var' / 'similarity'
+
+# Sparse engagement and co-occurrence matrices behind "also liked", see
+# content/cooccurrence.py. Only the worker running the update task uses it.
+COOCCURRENCE_STATE_PATH = BASE_DIR / 'var' / 'cooccurrence.npz'
+
+# Access to /metrics (cargo/metrics.py): scrapers send
+# "Authorization: Bearer <METRICS_TOKEN>". Without a token only clients in
+# METRICS_ALLOWED_IPS may scrape.
+METRICS_TOKEN = os.environ.get('CARGO_METRICS_TOKEN')
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+# Per-minute trending counters and the decayed top-K, see content/trending.py.
+# HALF_LIFE and WINDOW are in seconds; BACKEND 'local' keeps everything in-process.
+TRENDING = {
+    'BACKEND': 'redis',
+    'LOCATION': CELERY_BROKER_URL,
+    'HALF_LIFE': 2 * 60 * 60,
+    'WINDOW': 24 * 60 * 60,
+    'TOP_K': 100,
+}
@@ -0,0 +1,83 @@
+import re
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from cargo.cache import get_catalog_cache
+
+# "SCAN <table>" with nothing after it: SQLite reads every row of the table.
+# Index scans ("SCAN t USING INDEX ...") and subquery scans are fine.
+FULL_SCAN_RE = re.compile(r"^SCAN (\w+)$")
+
+LOCAL_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+# Keeps the caches and trending counters in process, so tests need no Redis.
+local_services = override_settings(
+    CACHES=LOCAL_CACHES,
+    CATALOG_CACHE={"TRANSPORT": "local", "MAX_ENTRIES": 1024, "TIMEOUT": 60, "SHARED_TIMEOUT": 3600},
+    TRENDING={"BACKEND": "local", "HALF_LIFE": 7200, "WINDOW": 86400, "TOP_K": 100},
+)
+
+
+def clear_caches():
+    """Forget what earlier tests cached.
+
+    Django doesn't reset caches between tests, and the invalidations that
+    run on commit never run inside a TestCase, so responses cached for an
+    earlier test's rows could be served for a later test's.
+    """
+    cache.clear()
+    get_catalog_cache().local.clear()
+
+
+@skipUnless(connection.vendor == "sqlite", "Query plans are checked with SQLite's EXPLAIN QUERY PLAN")
+@local_services
+class QueryPlanTestCase(TestCase):
+    """Asserts on the query plans of the SQL a piece of code actually runs.
+
+    The statements are captured while the code runs and each is passed
+    through EXPLAIN QUERY PLAN, so the tests follow the ORM code rather than
+    a copy of its SQL.
+    """
+
+    def query_plans(self, func):
+        """Run `func` and return [(sql, [plan detail, ...])] for each statement it ran."""
+        with CaptureQueriesContext(connection) as captured:
+            func()
+        plans = []
+        with connection.cursor() as cursor:
+            for query in captured.captured_queries:
+                sql = query["sql"]
+                if not sql.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+                    continue
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                plans.append((sql, [row[-1] for row in cursor.fetchall()]))
+        return plans
+
+    def assertNoFullScan(self, func, allowed=()):
+        """Fail if any statement run by `func` scans a whole table not in `allowed`."""
+        plans = self.query_plans(func)
+        self.assertTrue(plans, "No queries were run")
+        for sql, details in plans:
+            for detail in details:
+                match = FULL_SCAN_RE.match(detail)
+                if match and match.group(1) not in allowed:
+                    self.fail(f"Full scan of {match.group(1)}:\n{sql}\n" + "\n".join(details))
+
+    def assertNoSort(self, func):
+        """Fail if any statement run by `func` sorts its rows instead of reading them in index order."""
+        for sql, details in self.query_plans(func):
+            for detail in details:
+                if detail.startswith("USE TEMP B-TREE FOR ORDER BY"):
+                    self.fail(f"Sorted without an index:\n{sql}\n" + "\n".join(details))
+
+    def assertUsesIndex(self, func, index_name):
+        """Fail unless some statement run by `func` reads through `index_name`."""
+        plans = self.query_plans(func)
+        used = any(re.search(rf"\bINDEX {index_name}\b", detail) for _, details in plans for detail in details)
+        self.assertTrue(used, f"{index_name} is not used:\n" + "\n\n".join(
+            sql + "\n" + "\n".join(details) for sql, details in plans
+        ))
@@ -0,0 +1,50 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from cargo import metrics
+from cargo.testing import clear_caches, local_services
+from content.models import Category, Content
+
+
+@local_services
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="owner", password="password")
+        Content.objects.create(owner=cls.user, title="Item", description="Body",
+                               category=Category.objects.create(name="News"))
+
+    def setUp(self):
+        clear_caches()
+
+    def test_records_requests_and_queries_per_view(self):
+        key = ("get_contents", "GET")
+        before = metrics.collect().get(key, metrics.EndpointStats())
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get("/api/contents/").status_code, 200)
+
+        after = metrics.collect()[key]
+        self.assertEqual(after.statuses[200], before.statuses.get(200, 0) + 1)
+        self.assertGreater(after.queries, before.queries)
+        self.assertGreater(sum(after.buckets), sum(before.buckets))
+
+    def test_wraps_a_connection_once(self):
+        metrics._wrap(connection)
+        metrics._wrap(connection)
+        self.assertEqual(connection.execute_wrappers.count(metrics._time_query), 1)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_scrapes_need_the_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"cargo_http_requests_total", response.content)
+
+    @override_settings(METRICS_TOKEN=None, METRICS_ALLOWED_IPS=["127.0.0.1"])
+    def test_without_a_token_only_allowed_addresses_scrape(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 200)
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="203.0.113.7").status_code, 403)
@@ -20,6 +20,7 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi 
 from rest_framework.permissions import IsAuthenticated
+from cargo.metrics import metrics_view
 
 
 schema_view = get_schema_view(
@@ -42,6 +43,7 @@ urlpatterns = [
     path('api/users/', include('users.urls')),
     path('api/contents/', include('content.urls')),
     path('api/subscriptions/', include('subscription.urls')),
+    path('metrics', metrics_view, name='metrics'),
     
     path("swagger/", schema_view.with_ui("swagger", cache_timeout=0), name="schema-swagger-ui"),
     path("redoc/", schema_view.with_ui("redoc", cache_timeout=0), name="schema-redoc"),
@@ -0,0 +1,94 @@
+"""
+Native async variants of the hot content reads, for ASGI deployments.
+
+These are plain Django async views rather than DRF views, which are
+synchronous. Under ASGI they wait on Redis and the database without
+occupying a thread. They return the same JSON as their counterparts in
+`content.views`, and share their cache entries' format.
+
+Django 4.2's async ORM still runs each query on a worker thread. Where a
+cache miss needs several queries, such as a page with its tags, they are
+batched into one hop. Cache hits never leave the event loop.
+"""
+
+import logging
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+
+from content.cache import CONTENTS_CACHE_TIMEOUT, acontents_cache_key
+from content.pagination import contents_page
+from content.ranking import rank_feed
+from content.serializers import ContentSerializer, content_rows_by_id
+from content.views import FEED_DEFAULT_LIMIT, FEED_MAX_LIMIT
+from cargo.async_cache import get_async_cache
+from cargo.http import async_require_GET
+from users.authentication import async_authenticated
+from .models import Content
+
+logger = logging.getLogger(__name__)
+
+
+@async_require_GET
+@async_authenticated
+async def get_contents(request):
+    try:
+        user = request.user
+        cache = get_async_cache()
+        cache_key = await acontents_cache_key(user.id, 'list', request)
+        data = await cache.aget(cache_key)
+        if data is None:
+            data = await sync_to_async(contents_page)(Request(request), user)
+            await cache.aset(cache_key, data, CONTENTS_CACHE_TIMEOUT)
+        return JsonResponse(data, status=200)
+    except NotFound as e:
+        return JsonResponse({'message': str(e.detail)}, status=404)
+    except Exception as e:
+        logger.error(f"An Error occurred while trying to get the Contents {str(e)}", exc_info=True)
+        return JsonResponse({"message": f"An Error occurred while trying to get the Contents {e}"}, status=500)
+
+
+@async_require_GET
+@async_authenticated
+async def get_content_by_id(request, content_id):
+    try:
+        cache = get_async_cache()
+        cache_key = await acontents_cache_key(request.user.id, 'detail', request)
+        data = await cache.aget(cache_key)
+        if data is None:
+            content = await Content.objects.prefetch_related('tags').aget(id=content_id, owner=request.user)
+            data = ContentSerializer(content).data
+            await cache.aset(cache_key, data, CONTENTS_CACHE_TIMEOUT)
+        return JsonResponse(data, status=200)
+    except Content.DoesNotExist:
+        return JsonResponse({'message': 'Content not found or you do not have permission to access this content.'},
+                            status=404)
+    except Exception as e:
+        logger.error(f"An Error occurred while trying to get the Contents {str(e)}", exc_info=True)
+        return JsonResponse({"message": f"An Error occurred while trying to get the Content {e}"}, status=500)
+
+
+def _ranked_feed(user, limit):
+    content_ids = rank_feed(user, limit)
+    rows = content_rows_by_id(content_ids)
+    return [rows[content_id] for content_id in content_ids if content_id in rows]
+
+
+@async_require_GET
+@async_authenticated
+async def get_feed(request):
+    try:
+        limit = int(request.GET.get('limit', FEED_DEFAULT_LIMIT))
+    except ValueError:
+        return JsonResponse({'message': 'limit must be an integer.'}, status=400)
+    limit = max(1, min(limit, FEED_MAX_LIMIT))
+
+    try:
+        ranked = await sync_to_async(_ranked_feed)(request.user, limit)
+        return JsonResponse(ranked, status=200, safe=False)
+    except Exception as e:
+        logger.error(f"An Error occurred while trying to build the content feed {str(e)}", exc_info=True)
+        return JsonResponse({"message": f"An Error occurred while trying to build the content feed {e}"},
+                            status=500)
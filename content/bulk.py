@@ -0,0 +1,207 @@
+"""
+Create, update and delete content many items at a time.
+
+Each operation validates the whole batch first. Categories are looked up
+once per distinct id and tags are resolved in one go for the batch. The
+valid items are then written in one transaction with `bulk_create`,
+`bulk_update` and `DELETE ... WHERE id IN`, a batch of rows per statement.
+Invalid items are skipped and reported; they don't stop the rest.
+
+The results list lines up with the request items. Each result has a
+`status`: "created", "updated" or "deleted" with the item's `id`,
+"invalid" with the serializer `errors`, or "not_found" for ids the owner
+doesn't have.
+
+These writes bypass the per-row model signals, so the search index and
+the owner's cached responses are updated here instead, once per batch.
+"""
+
+from django.db import connections, models, router, transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from .cache import bump_contents_generation
+from .catalog import get_category
+from .models import Content
+from .search import get_search_backend, search_enabled
+from .serializers import ContentSerializer, write_content_tags
+
+BULK_MAX_ITEMS = 10000
+BULK_BATCH_SIZE = 500
+
+UPDATE_FIELDS = ('title', 'description', 'category_id')
+
+
+class BulkContentSerializer(ContentSerializer):
+    """ContentSerializer checking categories against the set resolved for the whole batch."""
+
+    def validate_category_id(self, value):
+        if value not in self.context['category_ids']:
+            raise serializers.ValidationError("Category does not exist.")
+        return value
+
+
+def _batches(items, size=BULK_BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _known_categories(items):
+    """Ids of the existing categories among the `category_id`s of `items`, one lookup each."""
+    ids = set()
+    for item in items:
+        if isinstance(item, dict):
+            try:
+                ids.add(int(item['category_id']))
+            except (KeyError, TypeError, ValueError):
+                pass
+    return {category_id for category_id in ids if get_category(category_id) is not None}
+
+
+def _validate(items, partial=False):
+    """Return ({index: validated data}, results) with results filled in for the invalid items."""
+    serializer = BulkContentSerializer(context={'category_ids': _known_categories(items)}, partial=partial)
+    valid = {}
+    results = [None] * len(items)
+    for index, item in enumerate(items):
+        try:
+            valid[index] = serializer.run_validation(item)
+        except serializers.ValidationError as e:
+            results[index] = {'status': 'invalid', 'errors': e.detail}
+    return valid, results
+
+
+def _reindex(content_ids):
+    if search_enabled():
+        backend = get_search_backend()
+        for batch in _batches(content_ids):
+            backend.index(batch)
+
+
+def _invalidate(owner):
+    owner_id = owner.id
+    transaction.on_commit(lambda: bump_contents_generation(owner_id))
+
+
+def bulk_create_contents(owner, items):
+    valid, results = _validate(items)
+    if valid:
+        contents = [
+            Content(owner=owner, title=data['title'], description=data['description'],
+                    category_id=data['category_id'])
+            for data in valid.values()
+        ]
+        with transaction.atomic():
+            Content.objects.bulk_create(contents, batch_size=BULK_BATCH_SIZE)
+            tag_names = {content.id: data['tags'] for content, data in zip(contents, valid.values())}
+            write_content_tags(tag_names, existing=False)
+            _reindex([content.id for content in contents])
+            _invalidate(owner)
+        for index, content in zip(valid, contents):
+            results[index] = {'id': content.id, 'status': 'created'}
+    return results
+
+
+def _item_id(item):
+    if isinstance(item, dict) and type(item.get('id')) is int:
+        return item['id']
+    return None
+
+
+def bulk_update_contents(owner, items):
+    """Apply partial updates; each item names the content it changes with its `id`."""
+    valid, results = _validate(items, partial=True)
+    seen = set()
+    for index in list(valid):
+        content_id = _item_id(items[index])
+        if content_id is None or content_id in seen:
+            error = 'This field is required.' if content_id is None else 'Duplicate id in this batch.'
+            results[index] = {'status': 'invalid', 'errors': {'id': [error]}}
+            del valid[index]
+        seen.add(content_id)
+
+    owned = {}
+    for batch in _batches([items[index]['id'] for index in valid]):
+        owned.update(Content.objects.filter(owner=owner, id__in=batch).only('id', *UPDATE_FIELDS).in_bulk())
+    for index in list(valid):
+        if items[index]['id'] not in owned:
+            results[index] = {'id': items[index]['id'], 'status': 'not_found'}
+            del valid[index]
+    if not valid:
+        return results
+
+    now = timezone.now()
+    contents = []
+    fields = {'updated_at'}
+    tag_names = {}
+    for index, data in valid.items():
+        content = owned[items[index]['id']]
+        for field in UPDATE_FIELDS:
+            if field in data:
+                setattr(content, field, data[field])
+                fields.add(field)
+        # bulk_update skips auto_now, and similarity.update_index picks up
+        # changed content by updated_at.
+        content.updated_at = now
+        if 'tags' in data:
+            tag_names[content.id] = data['tags']
+        contents.append(content)
+        results[index] = {'id': content.id, 'status': 'updated'}
+
+    with transaction.atomic():
+        Content.objects.bulk_update(contents, sorted(fields), batch_size=BULK_BATCH_SIZE)
+        if tag_names:
+            write_content_tags(tag_names)
+        _reindex([content.id for content in contents])
+        _invalidate(owner)
+    return results
+
+
+def _dependents():
+    """(model, field name) of every relation whose rows are deleted along with their Content."""
+    return [
+        (field.related_model, field.field.name)
+        for field in Content._meta.get_fields(include_hidden=True)
+        if field.one_to_many and field.auto_created and field.on_delete is models.CASCADE
+    ]
+
+
+def bulk_delete_contents(owner, content_ids):
+    results = []
+    wanted = set()
+    for content_id in content_ids:
+        if type(content_id) is not int:
+            results.append({'status': 'invalid', 'errors': ['A valid integer is required.']})
+        else:
+            results.append({'id': content_id})
+            wanted.add(content_id)
+
+    owned = []
+    for batch in _batches(list(wanted)):
+        owned.extend(Content.objects.filter(owner=owner, id__in=batch).values_list('id', flat=True))
+    if owned:
+        dependents = _dependents()
+        using = router.db_for_write(Content)
+        table = connections[using].ops.quote_name(Content._meta.db_table)
+        with transaction.atomic(using=using):
+            with connections[using].cursor() as cursor:
+                for batch in _batches(owned):
+                    # The cascades are deleted relation by relation, and the
+                    # content itself with one plain DELETE per batch, rather
+                    # than loading every row to send its delete signals.
+                    for model, field_name in dependents:
+                        model._base_manager.filter(**{f"{field_name}__in": batch}).delete()
+                    cursor.execute(
+                        f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(batch))})", batch,
+                    )
+            if search_enabled():
+                backend = get_search_backend()
+                for batch in _batches(owned):
+                    backend.remove(batch)
+            _invalidate(owner)
+
+    owned = set(owned)
+    for result in results:
+        if 'id' in result:
+            result['status'] = 'deleted' if result['id'] in owned else 'not_found'
+    return results
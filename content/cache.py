@@ -0,0 +1,64 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+
+from cargo.async_cache import get_async_cache
+
+CONTENTS_CACHE_TIMEOUT = 60 * 15
+
+
+def _generation_key(owner_id):
+    return f"contents_generation:{owner_id}"
+
+
+def _fresh_generation():
+    # Seeding from the clock rather than 1 means a generation counter that
+    # was evicted can never come back at a value older entries were stored
+    # under.
+    return time.time_ns() // 1000
+
+
+def contents_generation(owner_id):
+    key = _generation_key(owner_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, _fresh_generation(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_contents_generation(owner_id):
+    """Invalidate every cached content response of `owner_id` with one INCR."""
+    key = _generation_key(owner_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _fresh_generation(), timeout=None)
+
+
+def contents_cache_key(owner_id, view_name, request):
+    """Cache key for a content response, namespaced by the owner's generation."""
+    query = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f"contents:{owner_id}:{contents_generation(owner_id)}:{view_name}:{query}"
+
+
+def contents_etag(owner_id, view_name, request):
+    """Strong ETag for a content response: changes with the owner's generation, costs one cache read."""
+    return hashlib.md5(contents_cache_key(owner_id, view_name, request).encode()).hexdigest()
+
+
+async def acontents_generation(owner_id):
+    shared = get_async_cache()
+    key = _generation_key(owner_id)
+    generation = await shared.aget(key)
+    if generation is None:
+        await shared.aadd(key, _fresh_generation(), timeout=None)
+        generation = await shared.aget(key)
+    return generation
+
+
+async def acontents_cache_key(owner_id, view_name, request):
+    """`contents_cache_key` for async views."""
+    query = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f"contents:{owner_id}:{await acontents_generation(owner_id)}:{view_name}:{query}"
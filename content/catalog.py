@@ -0,0 +1,38 @@
+from cargo.cache import get_catalog_cache
+from .models import Category, Tag
+
+
+def _category_key(category_id):
+    return f"category:{category_id}"
+
+
+def _tag_key(name):
+    return f"tag:{name}"
+
+
+def get_category(category_id):
+    """Return the Category with `category_id`, or None if it doesn't exist."""
+    return get_catalog_cache().get(
+        _category_key(category_id),
+        lambda: Category.objects.filter(id=category_id).first(),
+    )
+
+
+def resolve_tags(names):
+    """`Tag.objects.resolve`, with tags already known to the catalog cache served locally."""
+    keys = {_tag_key(name): name for name in set(names)}
+
+    def load(missing):
+        tags = Tag.objects.resolve(keys[key] for key in missing)
+        return {_tag_key(name): tag for name, tag in tags.items()}
+
+    found = get_catalog_cache().get_many(list(keys), load)
+    return {keys[key]: tag for key, tag in found.items()}
+
+
+def invalidate_category(category_id):
+    get_catalog_cache().invalidate(_category_key(category_id))
+
+
+def invalidate_tag(name):
+    get_catalog_cache().invalidate(_tag_key(name))
@@ -0,0 +1,280 @@
+"""
+"Users who liked this also liked" from UserActivity co-engagement.
+
+Engagement is kept as a sparse user x content matrix X (CSR, indexed by raw
+ids), where each liked or viewed event adds its action weight, decayed
+exponentially with the event's age. A user's row is scaled down to a total
+weight of at most MAX_USER_WEIGHT, so a heavy user or a bot can't dominate
+the counts. The item-item co-occurrence matrix is C = X^T X, the sum of the
+users' own x_u^T x_u, so a full build reads the events a block of users at
+a time and adds up the blocks' products. Both are persisted in
+COOCCURRENCE_STATE_PATH.
+
+New events only touch a few rows, so they are folded in incrementally.
+Decaying the state by d and replacing the rows of the users with new events
+gives
+
+    C' = d^2 C + sum over those users of (x'_u^T x'_u - (d x_u)^T (d x_u))
+
+where x'_u is d x_u plus the user's new events, capped. This matches a
+rebuild except for users over the cap, whose capped history and new events
+are scaled together; the nightly rebuild evens that out. Neighbour
+scores are cosine similarities C_ij / sqrt(C_ii C_jj), damped by
+SHRINKAGE so that a single shared user does not make two items look
+identical. The top NEIGHBOURS per item are stored in RelatedContent. They
+are rewritten for the items whose co-occurrences changed; the nightly
+rebuild refreshes every other row.
+"""
+
+import logging
+import os
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from scipy import sparse
+
+from users.models import ActivityWatermark, UserActivity
+from .models import Content, RelatedContent
+
+logger = logging.getLogger(__name__)
+
+COOCCURRENCE_WATERMARK = "cooccurrence"
+
+ACTION_WEIGHTS = {
+    "liked": 1.0,
+    "viewed": 0.2,
+}
+HALF_LIFE = 30 * 24 * 60 * 60
+SHRINKAGE = 1.0
+NEIGHBOURS = 50
+# Upper bound on the total decayed weight of one user's row.
+MAX_USER_WEIGHT = 50.0
+EVENT_CHUNK_SIZE = 50000
+# Users whose events a full build reads and multiplies at a time.
+BUILD_USER_CHUNK_SIZE = 5000
+# Items per neighbour write; keeps the id lookups under SQLite's variable limit.
+STORE_CHUNK_SIZE = 500
+
+EVENT_DTYPE = np.dtype([
+    ("user_id", np.int64),
+    ("content_id", np.int64),
+    ("weight", np.float64),
+    ("timestamp", np.float64),
+])
+
+
+def decay(seconds):
+    return 0.5 ** (np.asarray(seconds) / HALF_LIFE)
+
+
+def _events(low, high, **filters):
+    rows = (
+        UserActivity.objects.filter(id__gt=low, id__lte=high, action__in=list(ACTION_WEIGHTS), **filters)
+        .values_list("user_id", "content_id", "action", "timestamp")
+    )
+    events = (
+        (user_id, content_id, ACTION_WEIGHTS[action], timestamp.timestamp())
+        for user_id, content_id, action, timestamp in rows.iterator(chunk_size=EVENT_CHUNK_SIZE)
+    )
+    return np.fromiter(events, dtype=EVENT_DTYPE)
+
+
+def engagement_matrix(events, now, shape):
+    """Sparse user x content matrix of decayed event weights, summed per pair."""
+    weights = events["weight"] * decay(np.maximum(now - events["timestamp"], 0))
+    matrix = sparse.coo_matrix((weights, (events["user_id"], events["content_id"])), shape=shape)
+    return matrix.tocsr()
+
+
+def capped(rows):
+    """`rows` with each row scaled down to a total weight of at most MAX_USER_WEIGHT."""
+    totals = np.asarray(rows.sum(axis=1)).ravel()
+    scale = np.minimum(1.0, MAX_USER_WEIGHT / np.maximum(totals, MAX_USER_WEIGHT))
+    return sparse.diags(scale) @ rows
+
+
+def _grown(matrix, shape):
+    if matrix.shape != shape:
+        matrix = matrix.copy()
+        matrix.resize(shape)
+    return matrix
+
+
+class CooccurrenceState:
+    """X, C and the activity id and time they are current as of."""
+
+    def __init__(self, engagement, cooccurrence, last_id, updated_at):
+        self.engagement = engagement
+        self.cooccurrence = cooccurrence
+        self.last_id = last_id
+        self.updated_at = updated_at
+
+    @classmethod
+    def build(cls, high):
+        """Build X and C from the events with `id <= high`, BUILD_USER_CHUNK_SIZE users at a time."""
+        now = time.time()
+        bounds = UserActivity.objects.filter(id__lte=high).aggregate(
+            low=Min("user_id"), high=Max("user_id"), content=Max("content_id")
+        )
+        shape = ((bounds["high"] or 0) + 1, (bounds["content"] or 0) + 1)
+        engagement = sparse.csr_matrix(shape)
+        cooccurrence = sparse.csr_matrix((shape[1], shape[1]))
+        for start in range(bounds["low"] or 0, shape[0], BUILD_USER_CHUNK_SIZE):
+            events = _events(0, high, user_id__gte=start, user_id__lt=start + BUILD_USER_CHUNK_SIZE)
+            block = capped(engagement_matrix(events, now, shape))
+            engagement = engagement + block
+            cooccurrence = cooccurrence + block.T @ block
+        return cls(engagement.tocsr(), cooccurrence.tocsr(), high, now)
+
+    def fold(self, high):
+        """Fold events with `last_id < id <= high` in; returns the content ids whose co-occurrences changed."""
+        now = time.time()
+        events = _events(self.last_id, high)
+        d = float(decay(now - self.updated_at))
+        shape = (
+            max(self.engagement.shape[0], int(events["user_id"].max(initial=0)) + 1),
+            max(self.engagement.shape[1], int(events["content_id"].max(initial=0)) + 1),
+        )
+        engagement = _grown(self.engagement, shape)
+        delta = engagement_matrix(events, now, shape)
+
+        users = np.unique(events["user_id"])
+        old_rows = d * engagement[users]
+        new_rows = capped(old_rows + delta[users])
+        change = new_rows.T @ new_rows - old_rows.T @ old_rows
+
+        # Put the new rows in place of the users' decayed ones.
+        row_change = (new_rows - old_rows).tocoo()
+        row_change = sparse.coo_matrix((row_change.data, (users[row_change.row], row_change.col)), shape=shape)
+
+        cooccurrence = _grown(self.cooccurrence, (shape[1], shape[1]))
+        self.cooccurrence = (d * d * cooccurrence + change).tocsr()
+        self.engagement = (d * engagement + row_change).tocsr()
+        self.last_id = high
+        self.updated_at = now
+        return np.flatnonzero(np.diff(change.tocsr().indptr))
+
+    def neighbours(self, content_ids):
+        """Yield (content_id, [(neighbour_id, score)]) best first for each of `content_ids`."""
+        norms = np.sqrt(self.cooccurrence.diagonal())
+        for content_id in content_ids:
+            row = self.cooccurrence.getrow(content_id)
+            others = row.indices != content_id
+            columns, values = row.indices[others], row.data[others]
+            scores = values / (norms[content_id] * norms[columns] + SHRINKAGE)
+            if len(scores) > NEIGHBOURS:
+                top = np.argpartition(-scores, NEIGHBOURS)[:NEIGHBOURS]
+                columns, scores = columns[top], scores[top]
+            order = np.argsort(-scores, kind="stable")
+            yield int(content_id), [(int(columns[i]), float(scores[i])) for i in order if scores[i] > 0]
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            engagement_data=self.engagement.data, engagement_indices=self.engagement.indices,
+            engagement_indptr=self.engagement.indptr, engagement_shape=self.engagement.shape,
+            cooccurrence_data=self.cooccurrence.data, cooccurrence_indices=self.cooccurrence.indices,
+            cooccurrence_indptr=self.cooccurrence.indptr, cooccurrence_shape=self.cooccurrence.shape,
+            last_id=self.last_id, updated_at=self.updated_at,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        try:
+            state = np.load(path)
+        except FileNotFoundError:
+            return None
+        with state:
+            matrices = {
+                name: sparse.csr_matrix(
+                    (state[f"{name}_data"], state[f"{name}_indices"], state[f"{name}_indptr"]),
+                    shape=tuple(state[f"{name}_shape"]),
+                )
+                for name in ("engagement", "cooccurrence")
+            }
+            return cls(matrices["engagement"], matrices["cooccurrence"],
+                       int(state["last_id"]), float(state["updated_at"]))
+
+
+def state_path():
+    return str(settings.COOCCURRENCE_STATE_PATH)
+
+
+def _store_chunk(state, content_ids):
+    neighbours = dict(state.neighbours(content_ids))
+    # The matrices still hold content deleted since its events were recorded.
+    referenced = set(neighbours).union(*(
+        (neighbour_id for neighbour_id, _ in pairs) for pairs in neighbours.values()
+    ))
+    existing = set(Content.objects.filter(id__in=referenced).values_list("id", flat=True))
+    rows = [
+        RelatedContent(content_id=content_id, neighbour_id=neighbour_id, score=score)
+        for content_id, pairs in neighbours.items() if content_id in existing
+        for neighbour_id, score in pairs if neighbour_id in existing
+    ]
+    RelatedContent.objects.filter(content_id__in=content_ids).delete()
+    RelatedContent.objects.bulk_create(rows)
+    return len(rows)
+
+
+def store_neighbours(state, content_ids):
+    """Replace the RelatedContent rows of `content_ids`; returns the number of rows written."""
+    content_ids = [int(content_id) for content_id in content_ids]
+    written = 0
+    with transaction.atomic():
+        for start in range(0, len(content_ids), STORE_CHUNK_SIZE):
+            written += _store_chunk(state, content_ids[start:start + STORE_CHUNK_SIZE])
+    return written
+
+
+def rebuild():
+    """Recompute X, C and every item's neighbours from all events; returns the number of items."""
+    high = UserActivity.objects.aggregate(high=Max("id"))["high"] or 0
+    state = CooccurrenceState.build(high)
+    state.save(state_path())
+    ActivityWatermark.objects.update_or_create(
+        name=COOCCURRENCE_WATERMARK, defaults={"last_id": high, "updated_at": timezone.now()}
+    )
+
+    content_ids = np.flatnonzero(np.diff(state.cooccurrence.indptr))
+    with transaction.atomic():
+        RelatedContent.objects.all().delete()
+        store_neighbours(state, content_ids)
+    return len(content_ids)
+
+
+def update():
+    """Fold events past the watermark into the saved state; returns the number of items whose neighbours changed.
+
+    The id range is claimed with a compare-and-set on the watermark, as in
+    `users.rollups`. Should the saved state not match the watermark (no state
+    yet, or a run that died before saving) everything is rebuilt instead.
+    """
+    watermark, _ = ActivityWatermark.objects.get_or_create(name=COOCCURRENCE_WATERMARK)
+    low = watermark.last_id
+    high = UserActivity.objects.aggregate(high=Max("id"))["high"] or 0
+    if high <= low:
+        return 0
+
+    state = CooccurrenceState.load(state_path())
+    if state is None or state.last_id != low:
+        logger.warning("Co-occurrence state is missing or out of step with its watermark; rebuilding")
+        return rebuild()
+
+    claimed = ActivityWatermark.objects.filter(name=COOCCURRENCE_WATERMARK, last_id=low).update(
+        last_id=high, updated_at=timezone.now()
+    )
+    if not claimed:
+        return 0
+
+    changed = state.fold(high)
+    state.save(state_path())
+    store_neighbours(state, changed)
+    return len(changed)
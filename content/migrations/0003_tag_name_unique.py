@@ -0,0 +1,35 @@
+# Generated by Django 4.2.20 on 2026-10-18 18:06
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_tags(apps, schema_editor):
+    """Fold every duplicate tag name into its oldest row before adding the constraint."""
+    Tag = apps.get_model('content', 'Tag')
+    ContentTag = apps.get_model('content', 'Content').tags.through
+
+    duplicates = Tag.objects.values('name').annotate(keep=Min('id'), copies=Count('id')).filter(copies__gt=1)
+    for duplicate in duplicates:
+        keep = duplicate['keep']
+        extra_ids = list(Tag.objects.filter(name=duplicate['name']).exclude(id=keep).values_list('id', flat=True))
+        tagged = set(ContentTag.objects.filter(tag_id=keep).values_list('content_id', flat=True))
+        moved = set(ContentTag.objects.filter(tag_id__in=extra_ids).values_list('content_id', flat=True)) - tagged
+        ContentTag.objects.bulk_create([ContentTag(content_id=content_id, tag_id=keep) for content_id in moved])
+        Tag.objects.filter(id__in=extra_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0002_tag_alter_content_ai_relevance_score_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_tags, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tag',
+            name='name',
+            field=models.CharField(max_length=200, unique=True),
+        ),
+    ]
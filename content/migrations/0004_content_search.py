@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE content_search USING fts5("
+        "title, description, tags, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        "INSERT INTO content_search (rowid, title, description, tags) "
+        "SELECT c.id, c.title, c.description, COALESCE(("
+        "  SELECT group_concat(t.name, ' ') FROM content_content_tags ct "
+        "  JOIN content_tag t ON t.id = ct.tag_id WHERE ct.content_id = c.id"
+        "), '') FROM content_content c"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS content_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0003_tag_name_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
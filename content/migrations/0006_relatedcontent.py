@@ -0,0 +1,30 @@
+# Generated by Django 4.2.20 on 2026-10-18 18:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0005_content_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedContent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('content', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related', to='content.content')),
+                ('neighbour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='content.content')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['content', '-score'], name='related_content_score_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='relatedcontent',
+            constraint=models.UniqueConstraint(fields=('content', 'neighbour'), name='unique_related_content'),
+        ),
+    ]
@@ -8,8 +8,29 @@ class Category(models.Model):
     def __str__(self):
         return self.name
     
+class TagManager(models.Manager):
+    def resolve(self, names):
+        """Return {name: Tag} for `names`, creating the ones that don't exist yet.
+
+        Costs one lookup when every tag exists and three queries otherwise.
+        Tags created concurrently by another request are picked up by the
+        second lookup instead of being duplicated.
+        """
+        names = set(names)
+        if not names:
+            return {}
+        tags = {tag.name: tag for tag in self.filter(name__in=names)}
+        missing = names - tags.keys()
+        if missing:
+            self.bulk_create([Tag(name=name) for name in missing], ignore_conflicts=True)
+            tags.update({tag.name: tag for tag in self.filter(name__in=missing)})
+        return tags
+
+
 class Tag(models.Model):
-    name = models.CharField(max_length=200)
+    name = models.CharField(max_length=200, unique=True)
+
+    objects = TagManager()
     
     def __str__(self):
         return self.name
@@ -23,6 +44,25 @@ class Content(models.Model):
     category = models.ForeignKey(Category, on_delete = models.CASCADE, related_name='contents')
     tags = models.ManyToManyField(Tag, related_name='contents')
     ai_relevance_score = models.FloatField(default=0.0)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return self.title
+
+class RelatedContent(models.Model):
+    """Top neighbours of a content item by user co-engagement, maintained by `content.cooccurrence`."""
+
+    content = models.ForeignKey(Content, on_delete=models.CASCADE, related_name='related')
+    neighbour = models.ForeignKey(Content, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['content', 'neighbour'], name='unique_related_content'),
+        ]
+        indexes = [
+            models.Index(fields=['content', '-score'], name='related_content_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"content {self.content_id} ~ {self.neighbour_id}"
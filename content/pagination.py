@@ -0,0 +1,27 @@
+from rest_framework.pagination import CursorPagination
+
+from .models import Content
+from .serializers import CONTENT_FIELDS, attach_tags
+
+
+class ContentCursorPagination(CursorPagination):
+    """Keyset pagination on Content.id.
+
+    Each page is a `WHERE id > <cursor> ORDER BY id LIMIT n` range scan, so
+    page 1000 costs the same as page 1.
+    """
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+def contents_page(request, owner):
+    """The page of `owner`'s content selected by `request` (a DRF Request), with its links.
+
+    Raises NotFound for an invalid cursor.
+    """
+    contents = Content.objects.filter(owner=owner).values(*CONTENT_FIELDS)
+    paginator = ContentCursorPagination()
+    page = paginator.paginate_queryset(contents, request)
+    return paginator.get_paginated_response(attach_tags(page)).data
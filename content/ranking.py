@@ -0,0 +1,218 @@
+import logging
+import threading
+import time
+
+import numpy as np
+from django.db import connections
+from django.db.models import Count
+
+from users.models import UserActivity, UserCategoryActivity
+from .models import Content
+
+logger = logging.getLogger(__name__)
+
+# How much each kind of interaction moves a user's affinity for the
+# categories and tags of the content it was recorded against.
+ACTION_WEIGHTS = {
+    "liked": 1.0,
+    "viewed": 0.3,
+    "skipped": -0.5,
+}
+
+RELEVANCE_WEIGHT = 1.0
+CATEGORY_WEIGHT = 1.0
+TAG_WEIGHT = 0.5
+
+# The catalogue snapshot is shared by every request served by this process
+# and rebuilt in the background at most once per TTL.
+CATALOGUE_TTL = 60
+
+CATALOGUE_DTYPE = np.dtype([
+    ("id", np.int64),
+    ("owner_id", np.int64),
+    ("category_id", np.int64),
+    ("ai_relevance_score", np.float64),
+])
+TAG_PAIR_DTYPE = np.dtype([("content_id", np.int64), ("tag_id", np.int64)])
+
+
+class Catalogue:
+    """Column-oriented snapshot of every Content row, sorted by id.
+
+    Tag membership is kept as two parallel arrays (`tag_rows`, `tag_ids`), one
+    entry per content/tag pair, so per-item tag scores reduce to a single
+    `np.bincount` over the whole catalogue.
+    """
+
+    def __init__(self, ids, owner_ids, category_ids, relevance, tag_rows, tag_ids):
+        self.ids = ids
+        self.owner_ids = owner_ids
+        self.category_ids = category_ids
+        self.relevance = relevance
+        self.tag_rows = tag_rows
+        self.tag_ids = tag_ids
+        self.tag_counts = np.bincount(tag_rows, minlength=len(ids))
+        self.category_size = int(category_ids.max()) + 1 if len(ids) else 1
+        self.tag_size = int(tag_ids.max()) + 1 if len(tag_ids) else 1
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def load(cls):
+        rows = Content.objects.order_by("id").values_list(
+            "id", "owner_id", "category_id", "ai_relevance_score"
+        )
+        columns = np.fromiter(rows.iterator(chunk_size=10000), dtype=CATALOGUE_DTYPE)
+        ids = columns["id"]
+
+        pairs = Content.tags.through.objects.values_list("content_id", "tag_id")
+        pairs = np.fromiter(pairs.iterator(chunk_size=10000), dtype=TAG_PAIR_DTYPE)
+        tag_rows = np.searchsorted(ids, pairs["content_id"])
+        # Drop pairs whose content was created after the id snapshot was taken.
+        known = tag_rows < len(ids)
+        known[known] = ids[tag_rows[known]] == pairs["content_id"][known]
+
+        return cls(
+            ids=ids,
+            owner_ids=columns["owner_id"],
+            category_ids=columns["category_id"],
+            relevance=columns["ai_relevance_score"],
+            tag_rows=tag_rows[known],
+            tag_ids=pairs["tag_id"][known],
+        )
+
+    def rows_for(self, content_ids):
+        """Map content ids to catalogue row positions, dropping unknown ids."""
+        content_ids = np.asarray(content_ids, dtype=np.int64)
+        if not len(self.ids) or not len(content_ids):
+            return np.empty(0, dtype=np.int64)
+        rows = np.searchsorted(self.ids, content_ids)
+        rows = rows[rows < len(self.ids)]
+        return rows[np.isin(self.ids[rows], content_ids)]
+
+
+_catalogue = None
+_catalogue_loaded_at = 0.0
+_catalogue_lock = threading.Lock()
+_refresh_thread = None
+
+
+def _refresh_catalogue():
+    global _catalogue, _catalogue_loaded_at
+
+    try:
+        _catalogue = Catalogue.load()
+    except Exception as e:
+        # Keep serving the previous snapshot and try again after another TTL.
+        logger.error(f"Reloading the feed catalogue failed: {e}", exc_info=True)
+    finally:
+        _catalogue_loaded_at = time.monotonic()
+        connections.close_all()
+
+
+def get_catalogue():
+    """The catalogue snapshot of this process.
+
+    Only the very first call waits for a load. Once the snapshot is older
+    than CATALOGUE_TTL, the next call starts a reload on a background
+    thread, and every call keeps getting the previous snapshot until the
+    new one replaces it.
+    """
+    global _catalogue, _catalogue_loaded_at, _refresh_thread
+
+    catalogue = _catalogue
+    if catalogue is None:
+        with _catalogue_lock:
+            if _catalogue is None:
+                _catalogue = Catalogue.load()
+                _catalogue_loaded_at = time.monotonic()
+            return _catalogue
+    if time.monotonic() - _catalogue_loaded_at > CATALOGUE_TTL:
+        with _catalogue_lock:
+            stale = time.monotonic() - _catalogue_loaded_at > CATALOGUE_TTL
+            if stale and (_refresh_thread is None or not _refresh_thread.is_alive()):
+                _refresh_thread = threading.Thread(target=_refresh_catalogue, name="catalogue-refresh", daemon=True)
+                _refresh_thread.start()
+    return catalogue
+
+
+def _affinity(rows, key, size):
+    """Fold (key, action, count) aggregates into a normalised affinity vector."""
+    affinity = np.zeros(size, dtype=np.float64)
+    total = 0
+    for row in rows:
+        index = row[key]
+        total += row["n"]
+        if index is None or index >= size:
+            continue
+        affinity[index] += ACTION_WEIGHTS.get(row["action"], 0.0) * row["n"]
+    if total:
+        affinity /= total
+    return affinity
+
+
+def _category_rows(user):
+    """Per-category counts from the rollup table, in the shape `_affinity` expects."""
+    for row in UserCategoryActivity.objects.filter(user=user).values("category_id", *ACTION_WEIGHTS):
+        for action in ACTION_WEIGHTS:
+            yield {"category_id": row["category_id"], "action": action, "n": row[action]}
+
+
+def user_affinities(user, catalogue):
+    tag_rows = (
+        UserActivity.objects.filter(user=user)
+        .values("content__tags", "action")
+        .annotate(n=Count("id"))
+        .order_by()
+    )
+
+    return (
+        _affinity(_category_rows(user), "category_id", catalogue.category_size),
+        _affinity(tag_rows, "content__tags", catalogue.tag_size),
+    )
+
+
+def score_catalogue(catalogue, category_affinity, tag_affinity):
+    """Score every item in the catalogue in one pass of vector operations."""
+    tag_scores = np.bincount(
+        catalogue.tag_rows,
+        weights=tag_affinity[catalogue.tag_ids],
+        minlength=len(catalogue),
+    ) / np.maximum(catalogue.tag_counts, 1)
+
+    return (
+        RELEVANCE_WEIGHT * catalogue.relevance
+        + CATEGORY_WEIGHT * category_affinity[catalogue.category_ids]
+        + TAG_WEIGHT * tag_scores
+    )
+
+
+def top_k(scores, k):
+    """Indices of the k highest finite scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+    return candidates[np.isfinite(scores[candidates])]
+
+
+def rank_feed(user, limit):
+    """Return the ids of the `limit` best-ranked Content items for `user`.
+
+    The user's own content and anything they have already interacted with
+    are excluded from the candidate set.
+    """
+    catalogue = get_catalogue()
+    if not len(catalogue):
+        return []
+
+    category_affinity, tag_affinity = user_affinities(user, catalogue)
+    scores = score_catalogue(catalogue, category_affinity, tag_affinity)
+
+    scores[catalogue.owner_ids == user.id] = -np.inf
+    seen = UserActivity.objects.filter(user=user).values_list("content_id", flat=True).distinct()
+    scores[catalogue.rows_for(list(seen))] = -np.inf
+
+    return catalogue.ids[top_k(scores, limit)].tolist()
@@ -0,0 +1,159 @@
+import re
+import threading
+import weakref
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+from .models import Content
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# Text matches ranked by the blend; deeper results are not returned.
+SEARCH_CANDIDATES = 1000
+
+
+def _documents(content_ids):
+    """Yield (id, title, description, tag names) for the given content."""
+    tags = {}
+    for content_id, name in Content.tags.through.objects.filter(
+        content_id__in=content_ids
+    ).values_list("content_id", "tag__name"):
+        tags.setdefault(content_id, []).append(name)
+
+    for content_id, title, description in Content.objects.filter(
+        id__in=content_ids
+    ).values_list("id", "title", "description"):
+        yield content_id, title, description, " ".join(tags.get(content_id, []))
+
+
+class SearchBackend:
+    """Interface every content search backend implements.
+
+    Backends keep their index in step with Content through `index` and
+    `remove`. content.signals batches the changed rows with
+    `reindex_on_commit`, so each is indexed once per transaction.
+    """
+
+    def index(self, content_ids):
+        raise NotImplementedError
+
+    def remove(self, content_ids):
+        raise NotImplementedError
+
+    def search(self, query, limit, offset=0, blend=0.0):
+        """Return [(content_id, score)] best first.
+
+        `blend` (0..1) mixes `ai_relevance_score` into the text relevance,
+        which is scaled to 0..1 over the query's matches first.
+        """
+        raise NotImplementedError
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """BM25-ranked search over an FTS5 virtual table keyed by Content id.
+
+    The table lives in the same database as Content, so index writes are
+    part of the transaction that changed the content.
+    """
+    table = "content_search"
+    # bm25() column weights for title, description and tags.
+    weights = (10.0, 1.0, 5.0)
+
+    def index(self, content_ids):
+        content_ids = list(content_ids)
+        if not content_ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.table} WHERE rowid = %s", [(i,) for i in content_ids])
+            cursor.executemany(
+                f"INSERT INTO {self.table} (rowid, title, description, tags) VALUES (%s, %s, %s, %s)",
+                list(_documents(content_ids)),
+            )
+
+    def remove(self, content_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.table} WHERE rowid = %s", [(i,) for i in content_ids])
+
+    @staticmethod
+    def match_expression(query):
+        """Turn free text into an FTS5 query: every word must match, the last as a prefix."""
+        tokens = TOKEN_RE.findall(query)
+        if not tokens:
+            return None
+        return " ".join(f'"{token}"' for token in tokens) + "*"
+
+    def search(self, query, limit, offset=0, blend=0.0):
+        match = self.match_expression(query)
+        if match is None:
+            return []
+        weights = ", ".join(str(weight) for weight in self.weights)
+        # BM25 is unbounded, so it is min-max scaled over the top
+        # SEARCH_CANDIDATES matches (the same set for every page), with the
+        # bounds computed once, before being blended with the 0..1 relevance.
+        sql = (
+            f"WITH hits AS ("
+            f"SELECT rowid AS id, -bm25({self.table}, {weights}) AS bm25 FROM {self.table} "
+            f"WHERE {self.table} MATCH %s ORDER BY bm25({self.table}, {weights}) LIMIT %s), "
+            f"bounds AS (SELECT MIN(bm25) AS low, MAX(bm25) - MIN(bm25) AS spread FROM hits) "
+            f"SELECT c.id, (1 - %s) * COALESCE((hits.bm25 - bounds.low) / NULLIF(bounds.spread, 0), 1.0)"
+            f" + %s * c.ai_relevance_score AS score "
+            f"FROM hits CROSS JOIN bounds JOIN {Content._meta.db_table} c ON c.id = hits.id "
+            f"ORDER BY score DESC, c.id LIMIT %s OFFSET %s"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [match, SEARCH_CANDIDATES, blend, blend, limit, offset])
+            return cursor.fetchall()
+
+
+# Default backend per database vendor. A Postgres tsvector backend would be
+# registered here, or selected with the CONTENT_SEARCH_BACKEND setting.
+SEARCH_BACKENDS = {
+    "sqlite": SQLiteFTS5Backend,
+}
+
+
+class _Reindex:
+    """The content ids to reindex when one transaction commits."""
+
+    def __init__(self):
+        self.content_ids = set()
+
+    def __call__(self):
+        _pending.batch = None
+        get_search_backend().index(self.content_ids)
+
+
+_pending = threading.local()
+
+
+def reindex_on_commit(content_ids):
+    """Reindex `content_ids` when the current transaction commits, each once however often it changed.
+
+    The batch is only referenced by its on_commit callback, so a rollback,
+    which discards the callback, also drops the batch and the next change
+    starts a new one.
+    """
+    ref = getattr(_pending, "batch", None)
+    batch = ref() if ref is not None else None
+    if batch is None:
+        batch = _Reindex()
+        batch.content_ids.update(content_ids)
+        _pending.batch = weakref.ref(batch)
+        transaction.on_commit(batch)
+    else:
+        batch.content_ids.update(content_ids)
+
+
+def search_enabled():
+    return bool(getattr(settings, "CONTENT_SEARCH_BACKEND", None)) or connection.vendor in SEARCH_BACKENDS
+
+
+def get_search_backend():
+    backend_path = getattr(settings, "CONTENT_SEARCH_BACKEND", None)
+    if backend_path:
+        return import_string(backend_path)()
+    if connection.vendor not in SEARCH_BACKENDS:
+        raise ImproperlyConfigured(f"No content search backend for database vendor '{connection.vendor}'.")
+    return SEARCH_BACKENDS[connection.vendor]()
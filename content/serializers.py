@@ -1,5 +1,10 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed
 from rest_framework import serializers
 from users.serializers import UserSerializer
+from .catalog import get_category, resolve_tags
 from .models import Category, Content, Tag
 
 
@@ -10,6 +15,69 @@ class CategorySerializer(serializers.ModelSerializer):
 
 
 
+# Rows per statement when writing the tags of many content items at once.
+TAG_WRITE_BATCH_SIZE = 500
+
+
+def write_content_tags(tag_names, existing=True):
+    """Make the names in `tag_names` ({content id: [name, ...]}) the exact tag sets of those items.
+
+    Only the difference is written. Returns ({content id: removed tag ids},
+    {content id: added tag ids}). Pass `existing=False` for freshly created
+    content to skip reading the current tags.
+    """
+    ContentTag = Content.tags.through
+    tags = resolve_tags(name for names in tag_names.values() for name in names)
+    wanted = {content_id: {tags[name].id for name in names} for content_id, names in tag_names.items()}
+
+    current = defaultdict(set)
+    removed = defaultdict(set)
+    if existing:
+        content_ids = list(wanted)
+        stale_rows = []
+        for start in range(0, len(content_ids), TAG_WRITE_BATCH_SIZE):
+            for row_id, content_id, tag_id in ContentTag.objects.filter(
+                content_id__in=content_ids[start:start + TAG_WRITE_BATCH_SIZE]
+            ).values_list('id', 'content_id', 'tag_id'):
+                if tag_id in wanted[content_id]:
+                    current[content_id].add(tag_id)
+                else:
+                    removed[content_id].add(tag_id)
+                    stale_rows.append(row_id)
+        for start in range(0, len(stale_rows), TAG_WRITE_BATCH_SIZE):
+            ContentTag.objects.filter(id__in=stale_rows[start:start + TAG_WRITE_BATCH_SIZE]).delete()
+
+    added = {content_id: tag_ids - current[content_id] for content_id, tag_ids in wanted.items()}
+    added = {content_id: tag_ids for content_id, tag_ids in added.items() if tag_ids}
+    ContentTag.objects.bulk_create(
+        [ContentTag(content_id=content_id, tag_id=tag_id) for content_id, tag_ids in added.items() for tag_id in tag_ids],
+        batch_size=TAG_WRITE_BATCH_SIZE, ignore_conflicts=True,
+    )
+    return removed, added
+
+
+def set_content_tags(content, names, existing=True):
+    """Make `names` the exact tag set of `content`, writing only the difference.
+
+    Pass `existing=False` for freshly created content to skip reading the
+    current tags.
+    """
+    removed, added = write_content_tags({content.id: names}, existing)
+    if content.id in removed:
+        _tags_changed(content, 'post_remove', removed[content.id])
+    if content.id in added:
+        _tags_changed(content, 'post_add', added[content.id])
+
+
+def _tags_changed(content, action, tag_ids):
+    # The through rows are written directly, so announce the change the way
+    # content.tags.add()/remove() would for listeners such as the search index.
+    m2m_changed.send(
+        sender=Content.tags.through, instance=content, action=action,
+        reverse=False, model=Tag, pk_set=tag_ids, using=content._state.db,
+    )
+
+
 class ContentSerializer(serializers.ModelSerializer):
     category_id = serializers.IntegerField(required= True)
     tags = serializers.ListField(child=serializers.CharField(), write_only=True )
@@ -22,34 +90,64 @@ class ContentSerializer(serializers.ModelSerializer):
         
         
         
+    def validate_category_id(self, value):
+        if get_category(value) is None:
+            raise serializers.ValidationError("Category does not exist.")
+        return value
+
     def create(self, validated_data):
         tags = validated_data.pop('tags', [])
         category_id = validated_data.pop('category_id')
-        category = Category.objects.get(id = category_id)
-        content = Content.objects.create(category = category, **validated_data)
-        for tag in tags:
-            tag, created = Tag.objects.get_or_create(name=tag)
-            content.tags.add(tag)
+        category = get_category(category_id)
+        with transaction.atomic():
+            content = Content.objects.create(category = category, **validated_data)
+            set_content_tags(content, tags, existing=False)
         
         return content
     
     def update(self, instance, validated_data):
-        tags_data = validated_data.pop('tags', [])
+        tags_data = validated_data.pop('tags', None)
         instance.title = validated_data.get('title', instance.title)
         instance.description = validated_data.get('description', instance.description)
-        instance.category = validated_data.get('category', instance.category)
+        if 'category_id' in validated_data:
+            instance.category = get_category(validated_data['category_id'])
         instance.ai_relevance_score = validated_data.get('ai_relevance_score', instance.ai_relevance_score)
-        instance.save()
-
-        
-        instance.tags.clear()
-        for tag in tags_data:
-            tag, created = Tag.objects.get_or_create(name=tag)
-            instance.tags.add(tag)
+        with transaction.atomic():
+            instance.save()
+            if tags_data is not None:
+                set_content_tags(instance, tags_data)
 
         return instance
     
     def to_representation(self, instance):
         data = super().to_representation(instance)
         data['tags'] = [tag.name for tag in instance.tags.all()] 
-        return data
\ No newline at end of file
+        return data
+
+
+# Read-only fast path. Builds the same dicts as ContentSerializer(...).data
+# straight from .values() rows, with every row's tags read in one query, so
+# large lists skip the per-row model and field machinery.
+CONTENT_FIELDS = ('id', 'title', 'description', 'category_id', 'ai_relevance_score')
+
+
+def attach_tags(rows):
+    """Add each row's `tags` (tag names) to `rows`, dicts with an `id`, in place; returns `rows`."""
+    tags = defaultdict(list)
+    for content_id, name in Content.tags.through.objects.filter(
+        content_id__in=[row['id'] for row in rows]
+    ).values_list('content_id', 'tag__name'):
+        tags[content_id].append(name)
+    for row in rows:
+        row['tags'] = tags.get(row['id'], [])
+    return rows
+
+
+def content_rows(queryset):
+    """The rows of a Content `queryset` in their order, shaped like ContentSerializer(many=True).data."""
+    return attach_tags(list(queryset.values(*CONTENT_FIELDS)))
+
+
+def content_rows_by_id(content_ids):
+    """{id: row} for the Content items in `content_ids`, for rendering ranked lists."""
+    return {row['id']: row for row in content_rows(Content.objects.filter(id__in=content_ids))}
@@ -1,9 +1,69 @@
-from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
-from django.core.cache import cache
-from .models import Content
+from .cache import bump_contents_generation
+from .catalog import invalidate_category, invalidate_tag
+from .models import Category, Content, Tag
+from .search import reindex_on_commit, search_enabled
 
 @receiver([post_save, post_delete], sender = Content )
-def invalidate_contents_list_cache(sender, instance, created, **kwargs):
-    cache.delete_pattern('contents_list')
+def invalidate_contents_cache(sender, instance, **kwargs):
+    # After commit: a read between the bump and the commit would cache the
+    # old rows under the new generation.
+    owner_id = instance.owner_id
+    transaction.on_commit(lambda: bump_contents_generation(owner_id))
 
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_cached_category(sender, instance, **kwargs):
+    category_id = instance.id
+    transaction.on_commit(lambda: invalidate_category(category_id))
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def invalidate_cached_tag(sender, instance, **kwargs):
+    name = instance.name
+    transaction.on_commit(lambda: invalidate_tag(name))
+
+
+@receiver([post_save, pre_delete], sender=Tag)
+def invalidate_tagged_contents(sender, instance, created=False, **kwargs):
+    # Cached content responses carry tag names. On delete the links are gone
+    # by post_delete, so the owners are looked up before.
+    if created:
+        return
+    owner_ids = list(Content.objects.filter(tags=instance).values_list('owner_id', flat=True).distinct())
+
+    def bump():
+        for owner_id in owner_ids:
+            bump_contents_generation(owner_id)
+
+    transaction.on_commit(bump)
+
+
+@receiver([post_save, post_delete], sender=Content)
+def index_content(sender, instance, **kwargs):
+    # Indexing a deleted row removes it from the index.
+    if search_enabled():
+        reindex_on_commit([instance.id])
+
+
+@receiver(m2m_changed, sender=Content.tags.through)
+def reindex_content_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if not search_enabled():
+        return
+    if reverse and action == 'pre_clear':
+        # post_clear has no pk_set, so note the content the tag is about to leave.
+        instance._cleared_content_ids = list(instance.contents.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # `instance` is a Tag; pk_set holds the content ids it was added to or removed from.
+        if action == 'post_clear':
+            content_ids = instance.__dict__.pop('_cleared_content_ids', [])
+        else:
+            content_ids = pk_set
+    else:
+        content_ids = [instance.id]
+    reindex_on_commit(content_ids)
@@ -0,0 +1,345 @@
+"""
+"More like this" over the whole catalogue.
+
+Each Content item is reduced to a 64-bit SimHash signature, which is
+random-projection LSH over a hashed bag of features: its tags, its category
+and the words of its title and description. Every feature is hashed locally
+to 64 pseudo-random hyperplane signs, so nothing is downloaded or trained.
+Signatures of similar items differ in few bits and the Hamming distance
+between two signatures estimates the angle between their feature vectors.
+
+The index is written by `build_index` as plain .npy files under
+SIMILARITY_INDEX_DIR and memory-mapped by the serving processes:
+
+    ids.npy, signatures.npy     signature per content id, sorted by id
+    band<b>_keys.npy            16-bit slice <b> of every signature, sorted
+    band<b>_rows.npy            row each sorted key came from
+
+A lookup gathers the rows sharing at least one band with the query and
+ranks only those by Hamming distance, so any two items at most three bits
+apart are always found. Content changed since the build is hashed again by
+`update_index` into a small delta file that overrides the base; once the
+delta grows past DELTA_COMPACT_SIZE the base is rebuilt. meta.json names
+the current base directory and delta file and is swapped atomically, so
+readers never see a half-written index. Deleted content is only dropped
+from the index by the next build; `similar_content` skips it meanwhile.
+"""
+
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from hashlib import blake2b
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Content
+
+SIGNATURE_BITS = 64
+BANDS = 4
+BAND_BITS = SIGNATURE_BITS // BANDS
+BAND_MASK = np.uint64((1 << BAND_BITS) - 1)
+
+# Feature weights: sharing a tag says more than sharing a description word.
+TAG_WEIGHT = 3.0
+CATEGORY_WEIGHT = 2.0
+TITLE_WEIGHT = 1.5
+WORD_WEIGHT = 1.0
+
+BUILD_CHUNK_SIZE = 10000
+DELTA_COMPACT_SIZE = 50000
+# Upper bound on the candidates kept for one query, should a band be very
+# popular; the closest by Hamming distance are kept.
+MAX_CANDIDATES = 20000
+
+WORD_RE = re.compile(r"\w{3,}", re.UNICODE)
+BIT_POSITIONS = np.arange(SIGNATURE_BITS, dtype=np.uint64)
+POPCOUNT = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+
+
+def _feature_hash(feature):
+    return int.from_bytes(blake2b(feature.encode(), digest_size=8).digest(), "little")
+
+
+def features(title, description, category_id, tag_names):
+    """Return {feature: weight} for one content item."""
+    weights = {}
+    for word in WORD_RE.findall(description.lower()):
+        weights[f"w:{word}"] = WORD_WEIGHT
+    for word in WORD_RE.findall(title.lower()):
+        weights[f"w:{word}"] = TITLE_WEIGHT
+    weights[f"c:{category_id}"] = CATEGORY_WEIGHT
+    for name in tag_names:
+        weights[f"t:{name.lower()}"] = TAG_WEIGHT
+    return weights
+
+
+def signature(weights):
+    """SimHash of a weighted feature set: bit i is set when the weighted vote of feature bit i is positive."""
+    hashes = np.fromiter((_feature_hash(feature) for feature in weights), dtype=np.uint64, count=len(weights))
+    values = np.fromiter(weights.values(), dtype=np.float64, count=len(weights))
+    bits = ((hashes[:, None] >> BIT_POSITIONS) & np.uint64(1)).astype(np.float64)
+    votes = values @ (2 * bits - 1)
+    return int(np.sum(np.left_shift(np.uint64(1), BIT_POSITIONS[votes > 0])))
+
+
+def hamming(signatures, query):
+    """Number of differing bits between each of `signatures` and `query`."""
+    differing = np.bitwise_xor(signatures, np.uint64(query))
+    return POPCOUNT[differing.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def band_keys(signatures, band):
+    return (np.asarray(signatures, dtype=np.uint64) >> np.uint64(band * BAND_BITS)) & BAND_MASK
+
+
+def compute_signatures(queryset):
+    """Yield (content_id, signature) for every row of `queryset`, in its order, reading it in chunks."""
+    rows = queryset.values_list("id", "title", "description", "category_id")
+    chunk = []
+    for row in rows.iterator(chunk_size=BUILD_CHUNK_SIZE):
+        chunk.append(row)
+        if len(chunk) == BUILD_CHUNK_SIZE:
+            yield from _chunk_signatures(chunk)
+            chunk = []
+    yield from _chunk_signatures(chunk)
+
+
+def _chunk_signatures(rows):
+    if not rows:
+        return
+    tags = {}
+    for content_id, name in Content.tags.through.objects.filter(
+        content_id__in=[row[0] for row in rows]
+    ).values_list("content_id", "tag__name"):
+        tags.setdefault(content_id, []).append(name)
+    for content_id, title, description, category_id in rows:
+        yield content_id, signature(features(title, description, category_id, tags.get(content_id, [])))
+
+
+def _signature_arrays(pairs):
+    pairs = list(pairs)
+    ids = np.fromiter((content_id for content_id, _ in pairs), dtype=np.int64, count=len(pairs))
+    signatures = np.fromiter((sig for _, sig in pairs), dtype=np.uint64, count=len(pairs))
+    return ids, signatures
+
+
+class SimilarityIndex:
+    """A loaded index: memory-mapped base arrays plus the in-memory delta."""
+
+    def __init__(self, ids, signatures, bands, delta_ids, delta_signatures):
+        self.ids = ids
+        self.signatures = signatures
+        self.bands = bands
+        self.delta_ids = delta_ids
+        self.delta_signatures = delta_signatures
+
+    @classmethod
+    def load(cls, directory, meta):
+        base = os.path.join(directory, meta["base"])
+        load = lambda name: np.load(os.path.join(base, name), mmap_mode="r")
+        bands = [(load(f"band{band}_keys.npy"), load(f"band{band}_rows.npy")) for band in range(BANDS)]
+        delta_ids = np.empty(0, dtype=np.int64)
+        delta_signatures = np.empty(0, dtype=np.uint64)
+        if meta.get("delta"):
+            with np.load(os.path.join(directory, meta["delta"])) as delta:
+                delta_ids, delta_signatures = delta["ids"], delta["signatures"]
+        return cls(load("ids.npy"), load("signatures.npy"), bands, delta_ids, delta_signatures)
+
+    def signature_of(self, content_id):
+        """The indexed signature for `content_id`, or None if it isn't indexed."""
+        for ids, signatures in ((self.delta_ids, self.delta_signatures), (self.ids, self.signatures)):
+            row = np.searchsorted(ids, content_id)
+            if row < len(ids) and ids[row] == content_id:
+                return int(signatures[row])
+        return None
+
+    def candidates(self, query):
+        """(ids, signatures) of every item sharing at least one band with `query`."""
+        rows = []
+        for band, (keys, key_rows) in enumerate(self.bands):
+            key = band_keys(query, band)
+            low, high = np.searchsorted(keys, key, "left"), np.searchsorted(keys, key, "right")
+            rows.append(key_rows[low:high])
+        rows = np.unique(np.concatenate(rows))
+        ids, signatures = self.ids[rows], np.array(self.signatures[rows])
+
+        if len(self.delta_ids):
+            # Changed items: take the delta's signature, and add new items from the delta.
+            positions = np.searchsorted(self.delta_ids, ids).clip(max=len(self.delta_ids) - 1)
+            changed = self.delta_ids[positions] == ids
+            signatures[changed] = self.delta_signatures[positions[changed]]
+            matches = np.zeros(len(self.delta_ids), dtype=bool)
+            for band in range(BANDS):
+                matches |= band_keys(self.delta_signatures, band) == band_keys(query, band)
+            added = matches & ~np.isin(self.delta_ids, ids)
+            ids = np.concatenate([ids, self.delta_ids[added]])
+            signatures = np.concatenate([signatures, self.delta_signatures[added]])
+
+        if len(ids) > MAX_CANDIDATES:
+            closest = np.argpartition(hamming(signatures, query), MAX_CANDIDATES - 1)[:MAX_CANDIDATES]
+            ids, signatures = ids[closest], signatures[closest]
+        return ids, signatures
+
+    def ranked(self, content_id, query):
+        """(ids, similarities) of the candidates for `query`, nearest first, excluding `content_id`."""
+        ids, signatures = self.candidates(query)
+        distances = hamming(signatures, query)
+        keep = ids != content_id
+        ids, distances = ids[keep], distances[keep]
+        order = np.lexsort((ids, distances))
+        return ids[order], 1.0 - distances[order] / SIGNATURE_BITS
+
+    def similar(self, content_id, query, limit):
+        """Return [(content_id, similarity)] nearest `query` first, excluding `content_id`."""
+        ids, similarities = self.ranked(content_id, query)
+        return [(int(hit_id), float(similarity)) for hit_id, similarity in zip(ids[:limit], similarities[:limit])]
+
+
+def index_dir():
+    return str(settings.SIMILARITY_INDEX_DIR)
+
+
+def read_meta(directory=None):
+    try:
+        with open(os.path.join(directory or index_dir(), "meta.json")) as meta_file:
+            return json.load(meta_file)
+    except FileNotFoundError:
+        return None
+
+
+def _write_meta(directory, meta):
+    path = os.path.join(directory, "meta.json")
+    with open(path + ".tmp", "w") as meta_file:
+        json.dump(meta, meta_file)
+    os.replace(path + ".tmp", path)
+
+
+def _prune(directory, meta):
+    """Remove base directories and delta files no longer named by meta.json."""
+    current = {meta["base"], meta.get("delta")}
+    for name in os.listdir(directory):
+        if name.startswith(("base-", "delta-")) and name not in current:
+            path = os.path.join(directory, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+
+
+def build_index():
+    """Hash the whole catalogue and write a fresh base index; returns the number of items indexed."""
+    directory = index_dir()
+    os.makedirs(directory, exist_ok=True)
+    # Anything saved while the build runs is picked up by the next update.
+    started_at = timezone.now()
+    ids, signatures = _signature_arrays(compute_signatures(Content.objects.order_by("id")))
+
+    name = f"base-{time.time_ns()}"
+    base = os.path.join(directory, name)
+    os.makedirs(base)
+    np.save(os.path.join(base, "ids.npy"), ids)
+    np.save(os.path.join(base, "signatures.npy"), signatures)
+    for band in range(BANDS):
+        keys = band_keys(signatures, band).astype(np.uint16)
+        rows = np.argsort(keys, kind="stable")
+        np.save(os.path.join(base, f"band{band}_keys.npy"), keys[rows])
+        np.save(os.path.join(base, f"band{band}_rows.npy"), rows)
+
+    meta = {"base": name, "delta": None, "updated_through": started_at.isoformat(), "count": len(ids)}
+    _write_meta(directory, meta)
+    _prune(directory, meta)
+    return len(ids)
+
+
+def update_index():
+    """Re-hash content saved since the last build or update into the delta.
+
+    Builds the index from scratch if there is none yet or the delta has
+    grown too large. Returns the number of items (re)indexed.
+    """
+    directory = index_dir()
+    meta = read_meta(directory)
+    if meta is None:
+        return build_index()
+
+    started_at = timezone.now()
+    # Read through the updated_at index; the merged delta is sorted by id below.
+    changed = Content.objects.filter(updated_at__gt=parse_datetime(meta["updated_through"])).order_by("updated_at")
+    new_ids, new_signatures = _signature_arrays(compute_signatures(changed))
+    if not len(new_ids):
+        return 0
+
+    merged = {}
+    if meta.get("delta"):
+        with np.load(os.path.join(directory, meta["delta"])) as delta:
+            merged.update(zip(delta["ids"].tolist(), delta["signatures"].tolist()))
+    merged.update(zip(new_ids.tolist(), new_signatures.tolist()))
+    if len(merged) > DELTA_COMPACT_SIZE:
+        return build_index()
+
+    ids, signatures = _signature_arrays(sorted(merged.items()))
+    name = f"delta-{time.time_ns()}.npz"
+    np.savez(os.path.join(directory, name), ids=ids, signatures=signatures)
+    meta = {**meta, "delta": name, "updated_through": started_at.isoformat()}
+    _write_meta(directory, meta)
+    _prune(directory, meta)
+    return len(new_ids)
+
+
+_index = None
+_index_meta = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """The current index for this process, reloaded whenever meta.json changes; None if never built."""
+    global _index, _index_meta
+
+    directory = index_dir()
+    meta = read_meta(directory)
+    if meta is None:
+        return None
+    if meta != _index_meta:
+        with _index_lock:
+            if meta != _index_meta:
+                try:
+                    _index = SimilarityIndex.load(directory, meta)
+                    _index_meta = meta
+                except FileNotFoundError:
+                    # Superseded and pruned between reading meta.json and loading;
+                    # keep serving the previous index until the next request.
+                    pass
+    return _index
+
+
+def similar_content(content, limit):
+    """Return [(content_id, similarity)] for the items most like `content`, best first."""
+    index = get_index()
+    if index is None:
+        return []
+    query = index.signature_of(content.id)
+    if query is None:
+        # Saved after the last index update; hash it on the fly.
+        query = dict(_chunk_signatures([(content.id, content.title, content.description, content.category_id)]))[content.id]
+
+    # Deleted content stays in the index until the next build, so the ranked
+    # hits are checked against the table a page at a time.
+    ids, similarities = index.ranked(content.id, query)
+    hits = []
+    for start in range(0, len(ids), limit):
+        page = ids[start:start + limit].tolist()
+        existing = set(Content.objects.filter(id__in=page).values_list("id", flat=True))
+        hits.extend(
+            (hit_id, float(similarity))
+            for hit_id, similarity in zip(page, similarities[start:start + limit])
+            if hit_id in existing
+        )
+        if len(hits) >= limit:
+            break
+    return hits[:limit]
@@ -0,0 +1,164 @@
+import logging
+from itertools import islice
+
+from celery import shared_task
+from django.db import OperationalError
+from django.db.models import Sum
+from users.models import ActivityWatermark, DailyContentActivity, UserActivity
+from users.rollups import ROLLUP_WATERMARK, fold_new_activity
+from . import cooccurrence, similarity, trending
+from .cache import bump_contents_generation
+from .models import Content
+
+logger = logging.getLogger(__name__)
+
+RESCORE_WATERMARK = "content_relevance"
+RESCORE_CHUNK_SIZE = 2000
+
+LIKE_WEIGHT = 1.0
+VIEW_WEIGHT = 0.2
+SKIP_WEIGHT = 0.5
+# Pseudo-count of neutral interactions, so a single like doesn't outrank
+# content that has been liked hundreds of times.
+SCORE_PRIOR = 10
+
+
+def relevance_score(viewed, liked, skipped):
+    total = viewed + liked + skipped
+    if not total:
+        return 0.0
+    raw = LIKE_WEIGHT * liked + VIEW_WEIGHT * viewed - SKIP_WEIGHT * skipped
+    return max(0.0, raw / (total + SCORE_PRIOR))
+
+
+def activity_counts(content_ids):
+    """Return {content_id: (viewed, liked, skipped)} from the daily rollups."""
+    rows = (
+        DailyContentActivity.objects.filter(content_id__in=content_ids)
+        .values("content_id")
+        .annotate(viewed=Sum("viewed"), liked=Sum("liked"), skipped=Sum("skipped"))
+        .order_by()
+    )
+    return {row["content_id"]: (row["viewed"], row["liked"], row["skipped"]) for row in rows}
+
+
+def _chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _dispatch(content_ids):
+    """Queue one rescore task per fixed-size chunk of ids; returns the chunk count."""
+    chunks = 0
+    for chunk in _chunked(content_ids, RESCORE_CHUNK_SIZE):
+        rescore_content_chunk.delay(chunk)
+        chunks += 1
+    return chunks
+
+
+def _folded_high():
+    """Bring the rollups up to date and return the last activity id they cover.
+
+    Scores are computed from the rollups, so rescoring must never get ahead
+    of them.
+    """
+    fold_new_activity()
+    return ActivityWatermark.objects.get(name=ROLLUP_WATERMARK).last_id
+
+
+@shared_task(autoretry_for=(OperationalError,), retry_backoff=True, max_retries=5)
+def rescore_content_chunk(content_ids):
+    counts = activity_counts(content_ids)
+    contents = [
+        Content(id=content_id, ai_relevance_score=relevance_score(*counts.get(content_id, (0, 0, 0))))
+        for content_id in content_ids
+    ]
+    Content.objects.bulk_update(contents, ["ai_relevance_score"])
+    # Scores are part of the cached responses and of their ETags.
+    owner_ids = Content.objects.filter(id__in=content_ids).values_list("owner_id", flat=True).distinct()
+    for owner_id in owner_ids:
+        bump_contents_generation(owner_id)
+    return len(contents)
+
+
+@shared_task
+def rescore_recent_content():
+    """Rescore only the content that received activity since the last run."""
+    watermark, _ = ActivityWatermark.objects.get_or_create(name=RESCORE_WATERMARK)
+    high = _folded_high()
+    if high <= watermark.last_id:
+        return "No new activity to score."
+
+    content_ids = (
+        UserActivity.objects.filter(id__gt=watermark.last_id, id__lte=high)
+        .order_by("content_id")
+        .values_list("content_id", flat=True)
+        .distinct()
+        .iterator(chunk_size=RESCORE_CHUNK_SIZE)
+    )
+    chunks = _dispatch(content_ids)
+
+    watermark.last_id = high
+    watermark.save(update_fields=["last_id", "updated_at"])
+    logger.info(f"Queued {chunks} rescore chunks for activity up to id {high}")
+    return f"Queued {chunks} rescore chunks for activity up to id {high}."
+
+
+@shared_task
+def rescore_all_content():
+    """Rescore the whole catalogue, e.g. after the scoring weights change."""
+    high = _folded_high()
+    content_ids = (
+        Content.objects.order_by("id")
+        .values_list("id", flat=True)
+        .iterator(chunk_size=RESCORE_CHUNK_SIZE)
+    )
+    chunks = _dispatch(content_ids)
+
+    ActivityWatermark.objects.update_or_create(name=RESCORE_WATERMARK, defaults={"last_id": high})
+    logger.info(f"Queued {chunks} rescore chunks for the full catalogue")
+    return f"Queued {chunks} rescore chunks for the full catalogue."
+
+
+@shared_task
+def update_similarity_index():
+    """Re-hash content changed since the last run into the similarity index."""
+    indexed = similarity.update_index()
+    if indexed:
+        logger.info(f"Updated the similarity index with {indexed} changed content items")
+    return f"Indexed {indexed} changed content items."
+
+
+@shared_task
+def build_similarity_index():
+    """Rebuild the similarity index from scratch, folding in the accumulated delta."""
+    indexed = similarity.build_index()
+    logger.info(f"Rebuilt the similarity index with {indexed} content items")
+    return f"Rebuilt the similarity index with {indexed} content items."
+
+
+@shared_task
+def update_related_content():
+    """Fold new likes and views into the co-occurrence matrix and refresh the affected neighbours."""
+    changed = cooccurrence.update()
+    if changed:
+        logger.info(f"Refreshed related content for {changed} content items")
+    return f"Refreshed related content for {changed} content items."
+
+
+@shared_task
+def rebuild_related_content():
+    """Recompute the co-occurrence matrix and every item's neighbours from scratch."""
+    items = cooccurrence.rebuild()
+    logger.info(f"Rebuilt related content for {items} content items")
+    return f"Rebuilt related content for {items} content items."
+
+
+@shared_task
+def refresh_trending():
+    """Merge the trending counters of the last minute(s) into the decayed top-K."""
+    size = trending.refresh()
+    if size is None:
+        return "Trending is up to date."
+    return f"Stored {size} trending content items."
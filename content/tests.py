@@ -1,3 +1,657 @@
-from django.test import TestCase
+import json
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import AsyncClient, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from cargo import db_router
+from cargo.cache import get_catalog_cache
+from cargo.renderers import ORJSONRenderer
+from cargo.testing import QueryPlanTestCase, clear_caches, local_services
+from content import cooccurrence, ranking, search, similarity, transfer, trending
+from content.cache import contents_generation
+from content.catalog import resolve_tags
+from content.models import Category, Content, RelatedContent, Tag
+from content.search import get_search_backend
+from content.serializers import ContentSerializer, content_rows_by_id
+from content.tasks import activity_counts, rescore_content_chunk
+from users.models import UserActivity
+from users.rollups import fold_new_activity
+
+
+class HotQueryPlanTests(QueryPlanTestCase):
+    """The content queries served on every request must stay on an index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="owner", password="password")
+        other = User.objects.create_user(username="other", password="password")
+        category = Category.objects.create(name="News")
+        cls.contents = [
+            Content.objects.create(owner=owner, title=f"Item {i}", description="Body", category=category)
+            for i, owner in enumerate([cls.user, other] * 3)
+        ]
+        RelatedContent.objects.create(content=cls.contents[0], neighbour=cls.contents[1], score=0.5)
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+    def test_content_list_pages(self):
+        # SQLite's owner_id index also holds the rowid, so it serves
+        # `owner_id = ? ORDER BY id` without a sort.
+        first = lambda: self.client.get("/api/contents/", {"page_size": 2})
+        self.assertNoFullScan(first)
+        self.assertNoSort(first)
+
+        cursor = first().data["next"]
+        self.assertNoFullScan(lambda: self.client.get(cursor))
+        self.assertNoSort(lambda: self.client.get(cursor))
+
+    def test_content_detail(self):
+        self.assertNoFullScan(lambda: self.client.get(f"/api/contents/{self.contents[0].id}/"))
+
+    def test_also_liked(self):
+        fetch = lambda: self.client.get(f"/api/contents/{self.contents[0].id}/also_liked/")
+        self.assertUsesIndex(fetch, "related_content_score_idx")
+        self.assertNoFullScan(fetch)
+
+    def test_activity_counts_for_rescoring(self):
+        self.assertNoFullScan(lambda: activity_counts([content.id for content in self.contents]))
+
+    def test_similarity_index_update(self):
+        since = timezone.now() - timedelta(minutes=5)
+        self.assertNoFullScan(
+            lambda: list(similarity.compute_signatures(
+                Content.objects.filter(updated_at__gt=since).order_by("updated_at")
+            ))
+        )
+
+
+@local_services
+class FeedRankingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username="reader", password="password")
+        writer = User.objects.create_user(username="writer", password="password")
+        news, sport = Category.objects.create(name="News"), Category.objects.create(name="Sport")
+        python = Tag.objects.create(name="python")
+
+        create = lambda owner, category, score=0.0: Content.objects.create(
+            owner=owner, title="Item", description="Body", category=category, ai_relevance_score=score)
+        cls.liked = create(writer, news)
+        cls.liked.tags.add(python)
+        cls.own = create(cls.reader, news)
+        cls.news = create(writer, news)
+        cls.tagged = create(writer, sport)
+        cls.tagged.tags.add(python)
+        cls.popular = create(writer, sport, score=0.2)
+        cls.plain = create(writer, sport)
+        UserActivity.objects.create(user=cls.reader, content=cls.liked, action="liked")
+        fold_new_activity()
+
+    def rank(self, limit=10):
+        with mock.patch("content.ranking.get_catalogue", ranking.Catalogue.load):
+            return ranking.rank_feed(self.reader, limit)
+
+    def test_ranks_by_affinity_and_relevance(self):
+        # Liking News content tagged python: the category counts most, then
+        # the tag, then the item's own relevance score.
+        self.assertEqual(self.rank(), [self.news.id, self.tagged.id, self.popular.id, self.plain.id])
+        self.assertEqual(self.rank(limit=2), [self.news.id, self.tagged.id])
+
+    def test_excludes_own_and_seen_content(self):
+        ranked = self.rank()
+        self.assertNotIn(self.own.id, ranked)
+        self.assertNotIn(self.liked.id, ranked)
+
+    def test_stale_catalogue_is_reloaded_in_the_background(self):
+        old, new = object(), object()
+        with mock.patch.object(ranking, "_catalogue", old), \
+                mock.patch.object(ranking, "_catalogue_loaded_at", 0.0), \
+                mock.patch.object(ranking.Catalogue, "load", return_value=new) as load:
+            self.assertIs(ranking.get_catalogue(), old)
+            ranking._refresh_thread.join()
+            self.assertEqual(load.call_count, 1)
+            self.assertIs(ranking.get_catalogue(), new)
+
+
+@local_services
+class ConditionalGetTests(TestCase):
+    """Content reads answer If-None-Match with a 304 until the owner's content changes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="owner", password="password")
+        category = Category.objects.create(name="News")
+        cls.content = Content.objects.create(owner=cls.user, title="Item", description="Body", category=category)
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+    def test_not_modified_until_content_changes(self):
+        for url in ["/api/contents/", f"/api/contents/{self.content.id}/"]:
+            etag = self.client.get(url)["ETag"]
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+            rescore_content_chunk([self.content.id])
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["ETag"], etag)
+
+    def test_saves_invalidate_on_commit(self):
+        generation = contents_generation(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            Content.objects.create(owner=self.user, title="New", description="Body", category=self.content.category)
+            self.assertEqual(contents_generation(self.user.id), generation)
+        self.assertNotEqual(contents_generation(self.user.id), generation)
+
+    def test_tag_changes_invalidate_the_owners_of_tagged_content(self):
+        tag = Tag.objects.create(name="python")
+        self.content.tags.add(tag)
+        other = User.objects.create_user(username="other", password="password")
+        Content.objects.create(owner=other, title="Untagged", description="Body", category=self.content.category)
+        etag = self.client.get("/api/contents/")["ETag"]
+        other_generation = contents_generation(other.id)
+
+        tag.name = "django"
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.save()
+        response = self.client.get("/api/contents/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"][0]["tags"], ["django"])
+        self.assertEqual(contents_generation(other.id), other_generation)
+
+        generation = contents_generation(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.delete()
+        self.assertNotEqual(contents_generation(self.user.id), generation)
+        self.assertEqual(contents_generation(other.id), other_generation)
+
+    def test_etag_is_per_user(self):
+        etag = self.client.get("/api/contents/")["ETag"]
+        other = User.objects.create_user(username="other", password="password")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(other).access_token}")
+        self.assertEqual(self.client.get("/api/contents/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@local_services
+class AsyncViewTests(TestCase):
+    """The async routes answer like the sync views they mirror."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="owner", password="password")
+        category = Category.objects.create(name="News")
+        cls.content = Content.objects.create(owner=cls.user, title="Item", description="Body", category=category)
+        cls.content.tags.add(*resolve_tags(["alpha", "beta"]).values())
+        Content.objects.create(owner=cls.user, title="Other", description="Body", category=category)
+        cls.headers = {"Authorization": f"Bearer {RefreshToken.for_user(cls.user).access_token}"}
+
+    def setUp(self):
+        clear_caches()
+
+    async def test_same_bodies_as_the_sync_views(self):
+        routes = [
+            ("/api/contents/async/", "/api/contents/"),
+            (f"/api/contents/async/{self.content.id}/", f"/api/contents/{self.content.id}/"),
+            ("/api/contents/async/feed/", "/api/contents/feed/"),
+        ]
+        client = AsyncClient()
+        for async_url, sync_url in routes:
+            with self.subTest(async_url):
+                async_response = await client.get(async_url, headers=self.headers)
+                sync_response = await client.get(sync_url, headers=self.headers)
+                self.assertEqual(async_response.status_code, 200)
+                self.assertEqual(sync_response.status_code, 200)
+                self.assertEqual(json.loads(async_response.content), json.loads(sync_response.content))
+
+    async def test_same_401_as_the_sync_views(self):
+        client = AsyncClient()
+        for async_url, sync_url in [("/api/contents/async/", "/api/contents/"),
+                                    (f"/api/contents/async/{self.content.id}/", f"/api/contents/{self.content.id}/")]:
+            for headers in [{}, {"Authorization": "Bearer not-a-token"}]:
+                with self.subTest(async_url, **headers):
+                    async_response = await client.get(async_url, headers=headers)
+                    sync_response = await client.get(sync_url, headers=headers)
+                    self.assertEqual(async_response.status_code, 401)
+                    self.assertEqual(sync_response.status_code, 401)
+                    self.assertEqual(async_response["WWW-Authenticate"], sync_response["WWW-Authenticate"])
+                    self.assertEqual(json.loads(async_response.content), json.loads(sync_response.content))
+
+
+@local_services
+class ContentListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="owner", password="password")
+        other = User.objects.create_user(username="other", password="password")
+        categories = [Category.objects.create(name="News"), Category.objects.create(name="Sport")]
+        tags = list(resolve_tags(["alpha", "beta", "gamma"]).values())
+        for i in range(8):
+            # Interleave another owner's rows, so the pages have gaps in their ids.
+            for owner in (cls.user, other):
+                content = Content.objects.create(owner=owner, title=f"Item {i}", description="Body",
+                                                 category=categories[i % 2])
+                content.tags.add(*tags[:i % 4])
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_pages_hold_the_same_rows_in_the_same_order_as_the_unpaginated_query(self):
+        expected = json.loads(JSONRenderer().render(
+            ContentSerializer(Content.objects.filter(owner=self.user).order_by("id"), many=True).data))
+
+        pages, url = [], "/api/contents/?page_size=3"
+        while url:
+            page = json.loads(self.client.get(url).content)
+            pages.append(page["results"])
+            url = page["next"]
+        self.assertEqual([len(page) for page in pages], [3, 3, 2])
+        self.assertEqual([row for page in pages for row in page], expected)
+
+        # Walking back from the last page gives the same pages again.
+        backwards, url = [], self.client.get("/api/contents/?page_size=3").data["next"]
+        url = json.loads(self.client.get(url).content)["next"]
+        while url:
+            page = json.loads(self.client.get(url).content)
+            backwards.append(page["results"])
+            url = page["previous"]
+        self.assertEqual(backwards, pages[::-1])
+
+        for row in expected:
+            self.assertEqual(json.loads(self.client.get(f"/api/contents/{row['id']}/").content), row)
+
+
+@local_services
+class RescoreTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner", password="password")
+        reader = User.objects.create_user(username="reader", password="password")
+        category = Category.objects.create(name="News")
+        create = lambda: Content.objects.create(owner=cls.owner, title="Item", description="Body",
+                                                category=category, ai_relevance_score=0.7)
+        cls.liked, cls.skipped, cls.idle, cls.untouched = create(), create(), create(), create()
+        for content, action, times in [(cls.liked, "liked", 2), (cls.liked, "viewed", 1),
+                                       (cls.skipped, "skipped", 3), (cls.untouched, "liked", 1)]:
+            for _ in range(times):
+                UserActivity.objects.create(user=reader, content=content, action=action)
+        fold_new_activity()
+
+    def setUp(self):
+        clear_caches()
+
+    def test_chunk_stores_the_new_scores(self):
+        generation = contents_generation(self.owner.id)
+        self.assertEqual(rescore_content_chunk([self.liked.id, self.skipped.id, self.idle.id]), 3)
+
+        scores = dict(Content.objects.values_list("id", "ai_relevance_score"))
+        self.assertAlmostEqual(scores[self.liked.id], (2 * 1.0 + 0.2) / (3 + 10))
+        # Skips can't push a score below zero.
+        self.assertEqual(scores[self.skipped.id], 0.0)
+        # Content without activity falls back to zero.
+        self.assertEqual(scores[self.idle.id], 0.0)
+        # Content outside the chunk keeps its score.
+        self.assertEqual(scores[self.untouched.id], 0.7)
+        self.assertNotEqual(contents_generation(self.owner.id), generation)
+
+
+@local_services
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        clear_caches()
+
+    def test_rows_from_a_rolled_back_transaction_are_not_cached(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            resolve_tags(["ghost"])
+            raise RuntimeError
+        # Takes the id the rolled back "ghost" had.
+        Tag.objects.create(name="other")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag = resolve_tags(["ghost"])["ghost"]
+        self.assertEqual(Tag.objects.get(id=tag.id).name, "ghost")
+        self.assertEqual(resolve_tags(["ghost"])["ghost"].id, tag.id)
+
+    def test_loaders_read_from_the_primary(self):
+        # Under a request routed to the replica, a cache miss must still
+        # load from the primary, or replica lag would be cached.
+        router = db_router.ReadReplicaRouter()
+        token = db_router._use_replica.set(True)
+        try:
+            self.assertEqual(router.db_for_read(Tag), "replica")
+            loaded = get_catalog_cache().get("probe", lambda: router.db_for_read(Tag))
+        finally:
+            db_router._use_replica.reset(token)
+        self.assertEqual(loaded, "default")
+
+
+@local_services
+class SearchTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        owner = User.objects.create_user(username="owner")
+        self.category = Category.objects.create(name="News")
+        create = lambda title, description, score: Content.objects.create(
+            owner=owner, title=title, description=description, category=self.category, ai_relevance_score=score)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.in_title = create("Harbour cranes", "Cargo", 0.0)
+            self.in_description = create("Ships", "The harbour", 0.9)
+            for _ in range(3):
+                create("Trains", "Rail freight", 0.5)
+
+    def test_blend_scales_text_relevance(self):
+        backend = get_search_backend()
+        self.assertEqual(backend.search("harbour", 10), [(self.in_title.id, 1.0), (self.in_description.id, 0.0)])
+        hits = backend.search("harbour", 10, blend=0.6)
+        self.assertEqual([hit_id for hit_id, _ in hits], [self.in_description.id, self.in_title.id])
+        self.assertAlmostEqual(hits[0][1], 0.54)
+        self.assertAlmostEqual(hits[1][1], 0.4)
+
+    def test_clearing_a_tag_reindexes_its_content(self):
+        tag = Tag.objects.create(name="ferries")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.in_title.tags.add(tag)
+        self.assertEqual(get_search_backend().search("ferries", 10), [(self.in_title.id, 1.0)])
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.contents.clear()
+        self.assertEqual(get_search_backend().search("ferries", 10), [])
+
+    def test_each_changed_row_is_reindexed_once_on_commit(self):
+        serializer = ContentSerializer(self.in_title, data={
+            "title": "Harbour tugs", "description": "Cargo", "category_id": self.category.id, "tags": ["boats"],
+        })
+        serializer.is_valid(raise_exception=True)
+        with self.captureOnCommitCallbacks() as callbacks:
+            serializer.save()
+            serializer.save()
+            self.assertEqual(get_search_backend().search("tugs", 10), [])
+        reindexes = [callback for callback in callbacks if isinstance(callback, search._Reindex)]
+        self.assertEqual(len(reindexes), 1)
+        self.assertEqual(reindexes[0].content_ids, {self.in_title.id})
+        for callback in callbacks:
+            callback()
+        self.assertEqual(get_search_backend().search("tugs boats", 10), [(self.in_title.id, 1.0)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.in_title.delete()
+        self.assertEqual(get_search_backend().search("tugs", 10), [])
+
+    def test_rolled_back_changes_do_not_hold_up_the_next_batch(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.in_title.save()
+                raise RuntimeError
+            self.in_description.title = "Tugs"
+            self.in_description.save()
+        self.assertEqual(get_search_backend().search("tugs", 10), [(self.in_description.id, 1.0)])
+
+
+class SimilarityIndexTests(TestCase):
+    def test_keeps_the_closest_candidates(self):
+        # Both share band 0 with the query; the lower row is 48 bits away, the other 1.
+        signatures = np.array([0xFFFF_FFFF_FFFF_0000, 0b1], dtype=np.uint64)
+        bands = []
+        for band in range(similarity.BANDS):
+            keys = similarity.band_keys(signatures, band).astype(np.uint16)
+            rows = np.argsort(keys, kind="stable")
+            bands.append((keys[rows], rows))
+        index = similarity.SimilarityIndex(np.array([1, 2]), signatures, bands,
+                                           np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint64))
+        with mock.patch.object(similarity, "MAX_CANDIDATES", 1):
+            self.assertEqual(index.similar(0, 0, 10), [(2, 1.0 - 1 / similarity.SIGNATURE_BITS)])
+
+    def test_skips_deleted_content(self):
+        owner = User.objects.create_user(username="owner")
+        category = Category.objects.create(name="News")
+        contents = [
+            Content.objects.create(owner=owner, title="Harbour cranes", description="Cargo ships unloading",
+                                   category=category)
+            for _ in range(3)
+        ]
+        with tempfile.TemporaryDirectory() as directory, override_settings(SIMILARITY_INDEX_DIR=directory):
+            similarity.build_index()
+            contents[1].delete()
+            self.assertEqual(similarity.similar_content(contents[0], 1), [(contents[2].id, 1.0)])
+
+
+class CooccurrenceTests(TestCase):
+    def test_fold_matches_rebuild(self):
+        users = [User.objects.create_user(username=f"user{i}") for i in range(4)]
+        category = Category.objects.create(name="News")
+        contents = [
+            Content.objects.create(owner=users[0], title="Item", description="Body", category=category)
+            for _ in range(5)
+        ]
+        start = timezone.now() - timedelta(days=10)
+        activity = lambda user, content, action, days: UserActivity.objects.create(
+            user=user, content=content, action=action, timestamp=start + timedelta(days=days)).id
+
+        for i, user in enumerate(users[:3]):
+            activity(user, contents[i], "liked", 0)
+            middle = activity(user, contents[i + 1], "viewed", 1)
+        # Later events from known and new users, on known and new pairs.
+        activity(users[0], contents[1], "liked", 5)
+        activity(users[3], contents[4], "liked", 6)
+        last = activity(users[3], contents[0], "viewed", 7)
+
+        now = start.timestamp() + 8 * 24 * 60 * 60
+        with mock.patch("content.cooccurrence.time") as clock:
+            clock.time.return_value = now - 60 * 60
+            state = cooccurrence.CooccurrenceState.build(middle)
+            clock.time.return_value = now
+            changed = state.fold(last)
+            rebuilt = cooccurrence.CooccurrenceState.build(last)
+
+        self.assertEqual(set(changed), {contents[0].id, contents[1].id, contents[4].id})
+        for folded, full in [(state.engagement, rebuilt.engagement), (state.cooccurrence, rebuilt.cooccurrence)]:
+            self.assertEqual(folded.shape, full.shape)
+            np.testing.assert_allclose(folded.toarray(), full.toarray())
+
+        # Building a user at a time sums to the same matrices.
+        with mock.patch("content.cooccurrence.time") as clock, \
+                mock.patch.object(cooccurrence, "BUILD_USER_CHUNK_SIZE", 1):
+            clock.time.return_value = now
+            chunked = cooccurrence.CooccurrenceState.build(last)
+        np.testing.assert_allclose(chunked.cooccurrence.toarray(), rebuilt.cooccurrence.toarray())
+
+    def test_caps_the_weight_of_one_user(self):
+        owner, bot = User.objects.create_user(username="owner"), User.objects.create_user(username="bot")
+        category = Category.objects.create(name="News")
+        for _ in range(4):
+            content = Content.objects.create(owner=owner, title="Item", description="Body", category=category)
+            UserActivity.objects.create(user=bot, content=content, action="liked")
+
+        with mock.patch.object(cooccurrence, "MAX_USER_WEIGHT", 2.0):
+            state = cooccurrence.CooccurrenceState.build(UserActivity.objects.latest("id").id)
+        self.assertAlmostEqual(state.engagement.getrow(bot.id).sum(), 2.0)
+        # Four likes of 0.5 each: every pair co-occurs with 0.25.
+        self.assertAlmostEqual(state.cooccurrence.sum(), 4.0)
+
+
+@override_settings(TRENDING={"BACKEND": "local", "HALF_LIFE": 300, "WINDOW": 600, "TOP_K": 3})
+class TrendingTests(TestCase):
+    def test_incremental_refresh_matches_full_recompute(self):
+        owner = User.objects.create_user(username="owner")
+        category = Category.objects.create(name="News")
+        ids = [
+            Content.objects.create(owner=owner, title="Item", description="Body", category=category).id
+            for _ in range(5)
+        ]
+        incremental, full = trending.LocalTrendingStore(), trending.LocalTrendingStore()
+
+        # Half an hour of activity through a ten-minute window, refreshing every minute.
+        for minute in range(1000, 1030):
+            counts = {ids[(minute * 7 + i) % 5]: float(1 + (minute + i) % 4) for i in range(minute % 3 + 1)}
+            incremental.add(minute, counts)
+            full.add(minute, counts)
+            with mock.patch.object(trending, "get_trending_store", return_value=incremental), \
+                    mock.patch.object(trending, "current_minute", return_value=minute + 1):
+                trending.refresh()
+        with mock.patch.object(trending, "get_trending_store", return_value=full), \
+                mock.patch.object(trending, "current_minute", return_value=1030):
+            trending.refresh()
+
+        (as_of, scores), (full_as_of, full_scores) = incremental.load_state(), full.load_state()
+        self.assertEqual(as_of, full_as_of)
+        self.assertEqual(scores.keys(), full_scores.keys())
+        for content_id, score in full_scores.items():
+            self.assertAlmostEqual(scores[content_id], score)
+        self.assertEqual([row["id"] for row in incremental.top()], [row["id"] for row in full.top()])
+
+
+@local_services
+class ContentWriteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="owner", password="password")
+        cls.news, cls.sport = Category.objects.create(name="News"), Category.objects.create(name="Sport")
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+    def test_tags_are_written_set_wise(self):
+        serializer = ContentSerializer(data={
+            "title": "Item", "description": "Body", "category_id": self.news.id,
+            "tags": [f"tag{i}" for i in range(20)],
+        })
+        with self.captureOnCommitCallbacks(execute=True):
+            serializer.is_valid(raise_exception=True)
+        # Savepoint, content insert, tag lookup, tag insert, tag re-read,
+        # through rows insert and the savepoint release.
+        with self.assertNumQueries(7):
+            content = serializer.save(owner=self.user)
+        self.assertEqual(content.tags.count(), 20)
+
+        serializer = ContentSerializer(content, data={"tags": ["tag0", "new"]}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        # Savepoint, content update, tag lookup, tag insert, tag re-read,
+        # current rows, removed rows, added rows and the release.
+        with self.assertNumQueries(9):
+            serializer.save()
+        self.assertEqual(set(content.tags.values_list("name", flat=True)), {"tag0", "new"})
+
+    def test_fast_path_rows_match_the_serializer(self):
+        content = Content.objects.create(owner=self.user, title="Item", description="Body", category=self.news,
+                                         ai_relevance_score=0.25)
+        content.tags.add(*resolve_tags(["b", "a"]).values())
+        bare = Content.objects.create(owner=self.user, title="Bare", description="", category=self.sport)
+
+        rows = content_rows_by_id([content.id, bare.id])
+        expected = [ContentSerializer(item).data for item in (content, bare)]
+        self.assertEqual([rows[content.id], rows[bare.id]], expected)
+        self.assertEqual(ORJSONRenderer().render(list(rows.values())), JSONRenderer().render(expected))
+
+    def test_update_changes_the_category(self):
+        content = Content.objects.create(owner=self.user, title="Item", description="Body", category=self.news)
+        response = self.client.put(f"/api/contents/update/{content.id}/", {"category_id": self.sport.id},
+                                   format="json")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(Content.objects.get(id=content.id).category_id, self.sport.id)
+
+
+@local_services
+class BulkContentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="owner", password="password")
+        cls.category = Category.objects.create(name="News")
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+    def test_create_update_delete(self):
+        items = [
+            {"title": f"Item {i}", "description": "Body", "category_id": self.category.id, "tags": ["a", f"t{i}"]}
+            for i in range(20)
+        ]
+        items.append({"title": "Bad", "description": "Body", "category_id": self.category.id + 1, "tags": []})
+        # Statements don't grow with the number of items.
+        with self.assertNumQueries(14):
+            results = self.client.post("/api/contents/bulk/create/", items, format="json").data["results"]
+        self.assertEqual([result["status"] for result in results], ["created"] * 20 + ["invalid"])
+        ids = [result["id"] for result in results[:20]]
+        self.assertEqual(set(Content.objects.get(id=ids[3]).tags.values_list("name", flat=True)), {"a", "t3"})
+
+        other = Content.objects.create(owner=User.objects.create_user(username="other"), title="Other",
+                                       description="Body", category=self.category)
+        results = self.client.put("/api/contents/bulk/update/", [
+            {"id": ids[0], "title": "Renamed", "tags": ["b"]},
+            {"id": other.id, "title": "Stolen"},
+        ], format="json").data["results"]
+        self.assertEqual([result["status"] for result in results], ["updated", "not_found"])
+        renamed = Content.objects.get(id=ids[0])
+        self.assertEqual(renamed.title, "Renamed")
+        self.assertEqual(list(renamed.tags.values_list("name", flat=True)), ["b"])
+        self.assertGreater(renamed.updated_at, Content.objects.get(id=ids[1]).updated_at)
+        self.assertEqual(Content.objects.get(id=other.id).title, "Other")
+
+        results = self.client.delete("/api/contents/bulk/delete/", ids + [other.id], format="json").data["results"]
+        self.assertEqual([result["status"] for result in results], ["deleted"] * 20 + ["not_found"])
+        self.assertFalse(Content.objects.filter(id__in=ids).exists())
+        self.assertFalse(Content.tags.through.objects.filter(content_id__in=ids).exists())
+
+    def test_update_writes_only_changed_tags_and_delete_cascades(self):
+        results = self.client.post("/api/contents/bulk/create/", [
+            {"title": "Item", "description": "Body", "category_id": self.category.id, "tags": ["keep", "drop"]},
+        ], format="json").data["results"]
+        content_id = results[0]["id"]
+        ContentTag = Content.tags.through
+        kept = ContentTag.objects.get(content_id=content_id, tag__name="keep")
+
+        generation = contents_generation(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put("/api/contents/bulk/update/", [{"id": content_id, "tags": ["keep", "new"]}],
+                            format="json")
+        self.assertGreater(contents_generation(self.user.id), generation)
+        rows = ContentTag.objects.filter(content_id=content_id)
+        self.assertEqual(set(rows.values_list("tag__name", flat=True)), {"keep", "new"})
+        self.assertTrue(rows.filter(id=kept.id).exists())
+
+        UserActivity.objects.create(user=self.user, content_id=content_id, action="liked")
+        self.client.delete("/api/contents/bulk/delete/", [content_id], format="json")
+        self.assertFalse(Content.objects.filter(id=content_id).exists())
+        self.assertFalse(UserActivity.objects.filter(content_id=content_id).exists())
+
+    def test_export_import_round_trip(self):
+        owner = User.objects.create_user(username="exporter")
+        for i in range(5):
+            content = Content.objects.create(owner=owner, title=f"Item {i}", description="Body",
+                                             category=self.category)
+            content.tags.add(*resolve_tags([f"t{i}"]).values())
+
+        # Small chunks, so the export spans several of them.
+        with mock.patch.object(transfer, "EXPORT_CHUNK_SIZE", 2):
+            body = b"".join(transfer.export_lines(owner))
+        lines = body.splitlines()
+        self.assertEqual(len(lines), 5)
+
+        response = self.client.post("/api/contents/import/", data=body + b"not json\n",
+                                    content_type="application/x-ndjson")
+        self.assertEqual(response.data["created"], 5)
+        self.assertEqual(response.data["errors"][0]["line"], 6)
+        imported = self.client.get("/api/contents/export/")
+        self.assertEqual(imported["Content-Type"], "application/x-ndjson")
+        self.assertEqual(
+            [{**json.loads(line), "id": None} for line in b"".join(imported.streaming_content).splitlines()],
+            [{**json.loads(line), "id": None} for line in lines],
+        )
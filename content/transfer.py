@@ -0,0 +1,71 @@
+"""
+Move a user's whole catalogue in and out as newline-delimited JSON.
+
+Both directions run in constant memory, whatever the size of the
+catalogue. `export_lines` walks the owner's content in id order with a
+chunked iterator. For each chunk it reads the tags in one query and yields
+the chunk's lines, shaped like ContentSerializer output.
+`import_lines` reads such lines one at a time from the request stream.
+Every IMPORT_BATCH_SIZE items it creates them through
+`bulk.bulk_create_contents`, in a transaction of its own, so no
+transaction stays open for the whole upload.
+"""
+
+import json
+from itertools import islice
+
+from cargo.renderers import ORJSONRenderer
+from .bulk import bulk_create_contents
+from .models import Content
+from .serializers import CONTENT_FIELDS, attach_tags
+
+EXPORT_CHUNK_SIZE = 2000
+IMPORT_BATCH_SIZE = 1000
+# Invalid lines beyond this many are counted but not described.
+MAX_REPORTED_ERRORS = 100
+
+
+def export_lines(owner):
+    """Yield the owner's content as NDJSON, one bytes chunk per EXPORT_CHUNK_SIZE items."""
+    renderer = ORJSONRenderer()
+    rows = (
+        Content.objects.filter(owner=owner)
+        .order_by('id')
+        .values(*CONTENT_FIELDS)
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    while chunk := list(islice(rows, EXPORT_CHUNK_SIZE)):
+        yield b''.join(renderer.render(row) + b'\n' for row in attach_tags(chunk))
+
+
+def import_lines(owner, lines):
+    """Create content from NDJSON `lines`, committing a batch at a time; returns a summary."""
+    summary = {'created': 0, 'invalid': 0, 'errors': []}
+
+    def invalid(line_number, errors):
+        summary['invalid'] += 1
+        if len(summary['errors']) < MAX_REPORTED_ERRORS:
+            summary['errors'].append({'line': line_number, 'errors': errors})
+
+    def flush(batch):
+        for (line_number, _), result in zip(batch, bulk_create_contents(owner, [item for _, item in batch])):
+            if result['status'] == 'created':
+                summary['created'] += 1
+            else:
+                invalid(line_number, result['errors'])
+        batch.clear()
+
+    batch = []
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            batch.append((line_number, json.loads(line)))
+        except ValueError as e:
+            invalid(line_number, [f'Invalid JSON: {e}'])
+            continue
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            flush(batch)
+    if batch:
+        flush(batch)
+    return summary
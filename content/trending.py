@@ -0,0 +1,216 @@
+"""
+"Trending now" from time-decayed activity counters.
+
+As activities are recorded, each one adds its action weight to a per-minute
+bucket for its content (a Redis hash that expires after 25 hours). Once a
+minute `refresh` merges the buckets that closed since the last run into an
+exponentially decayed score per content item over a rolling 24-hour window:
+
+    S(t) = sum over buckets b in (t - W, t] of c_b * r^(t - b)
+
+which can be advanced from the previous run without rereading the window:
+
+    S(t + k) = r^k S(t) + sum over new buckets m of (c_m - r^W c_(m - W)) * r^(t + k - m)
+
+The top TOP_K items are rendered once and stored under a single key, so
+the trending endpoint is one cache read.
+"""
+
+import heapq
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+import redis
+from django.conf import settings
+
+from .serializers import content_rows_by_id
+
+logger = logging.getLogger(__name__)
+
+ACTION_WEIGHTS = {
+    "liked": 3.0,
+    "viewed": 1.0,
+}
+
+BUCKET_SECONDS = 60
+BUCKET_TTL = 25 * 60 * 60
+# A refresh further behind than this recomputes from every bucket in the
+# window, before the ones it would need to subtract have expired.
+MAX_CATCH_UP = 60
+# Decayed scores below this are dropped to keep the state small.
+MIN_SCORE = 1e-3
+
+
+def current_minute():
+    return int(time.time() // BUCKET_SECONDS)
+
+
+class LocalTrendingStore:
+    """In-process stand-in for `RedisTrendingStore`, for development and tests."""
+
+    def __init__(self):
+        self._buckets = defaultdict(lambda: defaultdict(float))
+        self._state = (None, {})
+        self._top = None
+        self._lock = threading.Lock()
+
+    def add(self, minute, counts):
+        with self._lock:
+            bucket = self._buckets[minute]
+            for content_id, weight in counts.items():
+                bucket[content_id] += weight
+
+    def buckets(self, minutes):
+        with self._lock:
+            return [dict(self._buckets.get(minute, {})) for minute in minutes]
+
+    def load_state(self):
+        with self._lock:
+            as_of, scores = self._state
+            return as_of, dict(scores)
+
+    def save(self, as_of, scores, top):
+        with self._lock:
+            self._state = (as_of, dict(scores))
+            self._top = top
+            for minute in [minute for minute in self._buckets if minute < as_of - BUCKET_TTL // BUCKET_SECONDS]:
+                del self._buckets[minute]
+
+    def top(self):
+        return self._top
+
+
+class RedisTrendingStore:
+    """Minute buckets, decayed scores and the rendered top-K, all in Redis."""
+
+    def __init__(self, location, key_prefix="trending"):
+        self.key_prefix = key_prefix
+        self.scores_key = f"{key_prefix}:scores"
+        self.as_of_key = f"{key_prefix}:as_of"
+        self.top_key = f"{key_prefix}:top"
+        self.client = redis.Redis.from_url(location)
+
+    def _bucket_key(self, minute):
+        return f"{self.key_prefix}:bucket:{minute}"
+
+    def add(self, minute, counts):
+        key = self._bucket_key(minute)
+        pipe = self.client.pipeline(transaction=False)
+        for content_id, weight in counts.items():
+            pipe.hincrbyfloat(key, content_id, weight)
+        pipe.expire(key, BUCKET_TTL)
+        pipe.execute()
+
+    def buckets(self, minutes):
+        pipe = self.client.pipeline(transaction=False)
+        for minute in minutes:
+            pipe.hgetall(self._bucket_key(minute))
+        return [
+            {int(content_id): float(weight) for content_id, weight in bucket.items()}
+            for bucket in pipe.execute()
+        ]
+
+    def load_state(self):
+        as_of, scores = self.client.pipeline(transaction=False).get(self.as_of_key).hgetall(self.scores_key).execute()
+        if as_of is None:
+            return None, {}
+        return int(as_of), {int(content_id): float(score) for content_id, score in scores.items()}
+
+    def save(self, as_of, scores, top):
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(self.scores_key)
+        if scores:
+            pipe.hset(self.scores_key, mapping=scores)
+        pipe.set(self.as_of_key, as_of)
+        pipe.set(self.top_key, json.dumps(top))
+        pipe.execute()
+
+    def top(self):
+        payload = self.client.get(self.top_key)
+        return json.loads(payload) if payload is not None else None
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_trending_store():
+    global _store
+
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                config = settings.TRENDING
+                if config.get("BACKEND") == "local":
+                    _store = LocalTrendingStore()
+                else:
+                    _store = RedisTrendingStore(config["LOCATION"])
+    return _store
+
+
+def record(activities):
+    """Count `activities` (anything with `content_id` and `action`) towards the current minute.
+
+    Trending is best effort: a failure is logged and never fails the write
+    that recorded the activities.
+    """
+    counts = defaultdict(float)
+    for activity in activities:
+        weight = ACTION_WEIGHTS.get(activity.action)
+        if weight:
+            counts[activity.content_id] += weight
+    if not counts:
+        return
+    try:
+        get_trending_store().add(current_minute(), counts)
+    except Exception as e:
+        logger.error(f"Failed to count activities towards trending: {e}")
+
+
+def _render(top):
+    rows = content_rows_by_id([content_id for content_id, _ in top])
+    return [{**rows[content_id], "score": score} for content_id, score in top if content_id in rows]
+
+
+def refresh():
+    """Merge the minute buckets closed since the last run and store the new top-K; returns its size."""
+    config = settings.TRENDING
+    window = config["WINDOW"] // BUCKET_SECONDS
+    ratio = 0.5 ** (BUCKET_SECONDS / config["HALF_LIFE"])
+    store = get_trending_store()
+
+    target = current_minute() - 1
+    as_of, scores = store.load_state()
+    if as_of is not None and as_of >= target:
+        return None
+    if as_of is None or target - as_of > MAX_CATCH_UP:
+        as_of, scores, expiring = target - window, {}, False
+    else:
+        expiring = True
+
+    steps = target - as_of
+    scores = {content_id: score * ratio ** steps for content_id, score in scores.items()}
+    minutes = range(as_of + 1, target + 1)
+    for minute, bucket in zip(minutes, store.buckets(minutes)):
+        factor = ratio ** (target - minute)
+        for content_id, weight in bucket.items():
+            scores[content_id] = scores.get(content_id, 0.0) + weight * factor
+    if expiring:
+        for minute, bucket in zip(minutes, store.buckets([minute - window for minute in minutes])):
+            factor = ratio ** (target - minute + window)
+            for content_id, weight in bucket.items():
+                scores[content_id] = scores.get(content_id, 0.0) - weight * factor
+
+    scores = {content_id: score for content_id, score in scores.items() if score >= MIN_SCORE}
+    top = heapq.nlargest(config["TOP_K"], scores.items(), key=lambda item: item[1])
+    rendered = _render(top)
+    store.save(target, scores, rendered)
+    return len(rendered)
+
+
+def trending(limit):
+    """The current top `limit` trending items, rendered as in the content API with a `score`."""
+    return (get_trending_store().top() or [])[:limit]
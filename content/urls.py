@@ -1,11 +1,26 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 
 urlpatterns = [
     path('create/', views.create_content, name='create_content'),
     path('', views.get_contents, name='get_contents'),
+    path('feed/', views.get_feed, name='get_feed'),
+    path('search/', views.search_contents, name='search_contents'),
+    path('trending/', views.get_trending_contents, name='get_trending_contents'),
     path('<int:content_id>/', views.get_content_by_id, name='get_content_by_id'),
+    path('<int:content_id>/similar/', views.get_similar_contents, name='get_similar_contents'),
+    path('<int:content_id>/also_liked/', views.get_also_liked_contents, name='get_also_liked_contents'),
     path('update/<int:content_id>/', views.update_content, name='update_content'),
     path('delete/<int:content_id>/', views.delete_content, name='delete_content'),
+    path('bulk/create/', views.bulk_create_content, name='bulk_create_content'),
+    path('bulk/update/', views.bulk_update_content, name='bulk_update_content'),
+    path('bulk/delete/', views.bulk_delete_content, name='bulk_delete_content'),
+    path('export/', views.export_contents, name='export_contents'),
+    path('import/', views.import_contents, name='import_contents'),
+
+    # Native async variants for ASGI (see content/async_views.py).
+    path('async/', async_views.get_contents, name='get_contents_async'),
+    path('async/feed/', async_views.get_feed, name='get_feed_async'),
+    path('async/<int:content_id>/', async_views.get_content_by_id, name='get_content_by_id_async'),
 ]
@@ -1,19 +1,55 @@
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
-from .models import Content, Category
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework.exceptions import NotFound
+from .models import Content, Category, RelatedContent
+from users.authentication import CachedJWTAuthentication
 from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
 import logging
-from content.serializers import ContentSerializer
-from django.views.decorators.cache import cache_page
+from content.serializers import ContentSerializer, content_rows_by_id
+from content.ranking import rank_feed
+from content.pagination import ContentCursorPagination, contents_page
+from content.search import get_search_backend
+from content.similarity import similar_content
+from content.trending import trending
+from django.conf import settings
+from django.core.cache import cache
+from content.bulk import BULK_MAX_ITEMS, bulk_create_contents, bulk_delete_contents, bulk_update_contents
+from content.transfer import export_lines, import_lines
+from content.cache import contents_cache_key, contents_etag, CONTENTS_CACHE_TIMEOUT
+from django.views.decorators.http import condition
 # Create your views here.
 
 
 logger = logging.getLogger(__name__)
 
+FEED_DEFAULT_LIMIT = 20
+FEED_MAX_LIMIT = 100
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+SIMILAR_DEFAULT_LIMIT = 10
+SIMILAR_MAX_LIMIT = 50
+
+ALSO_LIKED_DEFAULT_LIMIT = 10
+ALSO_LIKED_MAX_LIMIT = 50
+
+TRENDING_DEFAULT_LIMIT = 20
+
+
+def contents_list_etag(request):
+    return contents_etag(request.user.id, 'list', request)
+
+
+def content_detail_etag(request, content_id):
+    return contents_etag(request.user.id, 'detail', request)
+
+
 @swagger_auto_schema(
     method="post",
     operation_description="Register a new user",
@@ -24,7 +60,7 @@ logger = logging.getLogger(__name__)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 def create_content(request):
     try:
         serializer = ContentSerializer(data=request.data)
@@ -41,24 +77,39 @@ def create_content(request):
     
 @swagger_auto_schema(
     method="get",
-    operation_description="Retrieve all content items for the authenticated user.",
+    operation_description="Retrieve the authenticated user's content items, one page at a time. "
+                          "Follow the `next` link to fetch the following page. Responses carry an ETag; "
+                          "send it back in If-None-Match to get a 304 when nothing changed.",
+    manual_parameters=[
+        openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description="Opaque cursor taken from a previous page's `next`/`previous` link."),
+        openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                          description=f"Items per page (max {ContentCursorPagination.max_page_size})."),
+    ],
     responses={
         200: ContentSerializer(many=True),
+        304: "Not modified since the ETag sent in If-None-Match.",
+        404: "Invalid cursor.",
         500: "Internal server error."
     }
 )
 
-@cache_page(60 * 15 , key_prefix="contents_list")
 @api_view(['GET'])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 @permission_classes([IsAuthenticated])
+@condition(etag_func=contents_list_etag)
 def get_contents(request):
 
     try:       
         user = request.user
-        contents = Content.objects.filter(owner=user)
-        serializer = ContentSerializer(contents, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        cache_key = contents_cache_key(user.id, 'list', request)
+        data = cache.get(cache_key)
+        if data is None:
+            data = contents_page(request, user)
+            cache.set(cache_key, data, CONTENTS_CACHE_TIMEOUT)
+        return Response(data, status=status.HTTP_200_OK)
+    except NotFound as e:
+        return Response({'message': str(e.detail)}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         logger.error(f"An Error occurred while trying to get the Contents {str(e)}", exc_info=True)
         return Response({"message": f"An Error occurred while trying to get the Contents {e}"} ,status= status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -67,9 +118,130 @@ def get_contents(request):
 
 @swagger_auto_schema(
     method="get",
-    operation_description="Retrieve a specific content item by its ID for the authenticated user.",
+    operation_description="Retrieve a personalised feed of content ranked for the authenticated user.",
+    manual_parameters=[
+        openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                          description=f"Number of items to return (max {FEED_MAX_LIMIT})."),
+    ],
+    responses={
+        200: ContentSerializer(many=True),
+        400: "Bad request - Invalid limit.",
+        500: "Internal server error."
+    }
+)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([CachedJWTAuthentication])
+def get_feed(request):
+    try:
+        limit = int(request.query_params.get('limit', FEED_DEFAULT_LIMIT))
+    except ValueError:
+        return Response({'message': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+    limit = max(1, min(limit, FEED_MAX_LIMIT))
+
+    try:
+        content_ids = rank_feed(request.user, limit)
+        rows = content_rows_by_id(content_ids)
+        ranked = [rows[content_id] for content_id in content_ids if content_id in rows]
+        return Response(ranked, status=status.HTTP_200_OK)
+    except Exception as e:
+        logger.error(f"An Error occurred while trying to build the content feed {str(e)}", exc_info=True)
+        return Response({"message": f"An Error occurred while trying to build the content feed {e}"} ,status= status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@swagger_auto_schema(
+    method="get",
+    operation_description="Full-text search over content titles, descriptions and tag names, ranked by BM25. "
+                          "Every word must match; the last one also matches as a prefix.",
+    manual_parameters=[
+        openapi.Parameter('q', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True,
+                          description="Search text."),
+        openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                          description=f"Number of results to return (max {SEARCH_MAX_LIMIT})."),
+        openapi.Parameter('offset', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                          description="Number of results to skip; use `next_offset` from the previous page."),
+        openapi.Parameter('blend', openapi.IN_QUERY, type=openapi.TYPE_NUMBER,
+                          description="Weight (0-1) given to ai_relevance_score against text relevance."),
+    ],
+    responses={
+        200: "Ranked results, each with its `score`, and the `next_offset` of the following page.",
+        400: "Bad request - Missing query or invalid parameters.",
+        500: "Internal server error."
+    }
+)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([CachedJWTAuthentication])
+def search_contents(request):
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({'message': 'q is required.'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = int(request.query_params.get('limit', SEARCH_DEFAULT_LIMIT))
+        offset = int(request.query_params.get('offset', 0))
+        blend = float(request.query_params.get('blend', 0))
+    except ValueError:
+        return Response({'message': 'limit and offset must be integers and blend a number.'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    offset = max(0, offset)
+    blend = max(0.0, min(blend, 1.0))
+
+    try:
+        hits = get_search_backend().search(query, limit + 1, offset, blend)
+        next_offset = offset + limit if len(hits) > limit else None
+        hits = hits[:limit]
+
+        rows = content_rows_by_id([content_id for content_id, _ in hits])
+        results = [{**rows[content_id], 'score': score} for content_id, score in hits if content_id in rows]
+        return Response({'results': results, 'next_offset': next_offset}, status=status.HTTP_200_OK)
+    except Exception as e:
+        logger.error(f"An Error occurred while trying to search the Contents {str(e)}", exc_info=True)
+        return Response({"message": f"An Error occurred while trying to search the Contents {e}"} ,status= status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@swagger_auto_schema(
+    method="get",
+    operation_description="Retrieve the content trending over the last 24 hours, hottest first. Recent likes and "
+                          "views count most; the list is refreshed every minute.",
+    manual_parameters=[
+        openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                          description=f"Number of items to return (default {TRENDING_DEFAULT_LIMIT}, "
+                                      f"max {settings.TRENDING['TOP_K']})."),
+    ],
+    responses={
+        200: ContentSerializer(many=True),
+        400: "Bad request - Invalid limit.",
+        500: "Internal server error."
+    }
+)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([CachedJWTAuthentication])
+def get_trending_contents(request):
+    try:
+        limit = int(request.query_params.get('limit', TRENDING_DEFAULT_LIMIT))
+    except ValueError:
+        return Response({'message': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+    limit = max(1, min(limit, settings.TRENDING['TOP_K']))
+
+    try:
+        return Response(trending(limit), status=status.HTTP_200_OK)
+    except Exception as e:
+        logger.error(f"An Error occurred while trying to get trending Contents {str(e)}", exc_info=True)
+        return Response({"message": f"An Error occurred while trying to get trending Contents {e}"} ,status= status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@swagger_auto_schema(
+    method="get",
+    operation_description="Retrieve a specific content item by its ID for the authenticated user. "
+                          "Supports If-None-Match like the content list.",
     responses={
         200: ContentSerializer,
+        304: "Not modified since the ETag sent in If-None-Match.",
         404: "Content not found or no permission.",
         500: "Internal server error."
     }
@@ -77,12 +249,17 @@ def get_contents(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
+@condition(etag_func=content_detail_etag)
 def get_content_by_id(request, content_id):
     try:
-        content = Content.objects.get(id=content_id, owner=request.user)
-        serializer = ContentSerializer(content)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        cache_key = contents_cache_key(request.user.id, 'detail', request)
+        data = cache.get(cache_key)
+        if data is None:
+            content = Content.objects.prefetch_related('tags').get(id=content_id, owner=request.user)
+            data = ContentSerializer(content).data
+            cache.set(cache_key, data, CONTENTS_CACHE_TIMEOUT)
+        return Response(data, status=status.HTTP_200_OK)
     except Content.DoesNotExist:
         return Response({'message': 'Content not found or you do not have permission to access this content.'}, 
                         status=status.HTTP_404_NOT_FOUND)
@@ -91,6 +268,90 @@ def get_content_by_id(request, content_id):
         return Response({"message": f"An Error occurred while trying to get the Content {e}"} ,status= status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@swagger_auto_schema(
+    method="get",
+    operation_description="Retrieve the content items most similar to the given one by tags, category and text, "
+                          "most similar first. `similarity` ranges from 0 to 1.",
+    manual_parameters=[
+        openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                          description=f"Number of items to return (default {SIMILAR_DEFAULT_LIMIT}, "
+                                      f"max {SIMILAR_MAX_LIMIT})."),
+    ],
+    responses={
+        200: ContentSerializer(many=True),
+        400: "Bad request - Invalid limit.",
+        404: "Content not found.",
+        500: "Internal server error."
+    }
+)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([CachedJWTAuthentication])
+def get_similar_contents(request, content_id):
+    try:
+        limit = int(request.query_params.get('limit', SIMILAR_DEFAULT_LIMIT))
+    except ValueError:
+        return Response({'message': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+    limit = max(1, min(limit, SIMILAR_MAX_LIMIT))
+
+    try:
+        content = Content.objects.only('id', 'title', 'description', 'category_id').get(id=content_id)
+        hits = similar_content(content, limit)
+
+        rows = content_rows_by_id([hit_id for hit_id, _ in hits])
+        results = [{**rows[hit_id], 'similarity': similarity} for hit_id, similarity in hits if hit_id in rows]
+        return Response(results, status=status.HTTP_200_OK)
+    except Content.DoesNotExist:
+        return Response({'message': 'Content not found.'}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        logger.error(f"An Error occurred while trying to get similar Contents {str(e)}", exc_info=True)
+        return Response({"message": f"An Error occurred while trying to get similar Contents {e}"} ,status= status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@swagger_auto_schema(
+    method="get",
+    operation_description="Retrieve the content items most often liked or viewed by the same users as the given one "
+                          "(\"users who liked this also liked\"), best first. Precomputed in the background.",
+    manual_parameters=[
+        openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                          description=f"Number of items to return (default {ALSO_LIKED_DEFAULT_LIMIT}, "
+                                      f"max {ALSO_LIKED_MAX_LIMIT})."),
+    ],
+    responses={
+        200: ContentSerializer(many=True),
+        400: "Bad request - Invalid limit.",
+        404: "Content not found.",
+        500: "Internal server error."
+    }
+)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([CachedJWTAuthentication])
+def get_also_liked_contents(request, content_id):
+    try:
+        limit = int(request.query_params.get('limit', ALSO_LIKED_DEFAULT_LIMIT))
+    except ValueError:
+        return Response({'message': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+    limit = max(1, min(limit, ALSO_LIKED_MAX_LIMIT))
+
+    try:
+        if not Content.objects.filter(id=content_id).exists():
+            return Response({'message': 'Content not found.'}, status=status.HTTP_404_NOT_FOUND)
+        related = list(
+            RelatedContent.objects.filter(content_id=content_id)
+            .order_by('-score')
+            .values_list('neighbour_id', 'score')[:limit]
+        )
+        rows = content_rows_by_id([neighbour_id for neighbour_id, _ in related])
+        results = [{**rows[neighbour_id], 'score': score} for neighbour_id, score in related if neighbour_id in rows]
+        return Response(results, status=status.HTTP_200_OK)
+    except Exception as e:
+        logger.error(f"An Error occurred while trying to get related Contents {str(e)}", exc_info=True)
+        return Response({"message": f"An Error occurred while trying to get related Contents {e}"} ,status= status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @swagger_auto_schema(
     method="put",
     operation_description="Update an existing content item by its ID.",
@@ -105,7 +366,7 @@ def get_content_by_id(request, content_id):
 
 @api_view(['PUT'])
 @permission_classes([IsAuthenticated])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 def update_content(request, content_id):
     try:
         content = Content.objects.get(id=content_id, owner=request.user)
@@ -132,7 +393,7 @@ def update_content(request, content_id):
     
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 def delete_content(request, content_id):
     try:
         content = Content.objects.get(id=content_id, owner=request.user)
@@ -144,6 +405,159 @@ def delete_content(request, content_id):
                         status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         return Response({"message": f"An Error occurred while trying to get the Content {e}"} ,status= status.HTTP_500_INTERNAL_SERVER_ERROR)
-    
 
-    
+
+
+bulk_results_schema = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    properties={
+        'results': openapi.Schema(
+            type=openapi.TYPE_ARRAY,
+            description="One result per request item, in order, each with a `status` and the item's `id` "
+                        "or its validation `errors`.",
+            items=openapi.Schema(type=openapi.TYPE_OBJECT),
+        ),
+    },
+)
+
+
+def bulk_items(request):
+    """The list of items in the request body, or the 400 Response explaining why there isn't one."""
+    items = request.data
+    if not isinstance(items, list):
+        return None, Response({'message': 'Expected a list of items.'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > BULK_MAX_ITEMS:
+        return None, Response({'message': f'At most {BULK_MAX_ITEMS} items can be sent at once.'},
+                              status=status.HTTP_400_BAD_REQUEST)
+    return items, None
+
+
+@swagger_auto_schema(
+    method="post",
+    operation_description=f"Create up to {BULK_MAX_ITEMS} content items in one transaction. "
+                          "Invalid items are reported and skipped; the others are created.",
+    request_body=ContentSerializer(many=True),
+    responses={
+        200: bulk_results_schema,
+        400: "Bad request - Not a list or too many items.",
+        500: "Internal server error."
+    }
+)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([CachedJWTAuthentication])
+def bulk_create_content(request):
+    items, error = bulk_items(request)
+    if error:
+        return error
+    try:
+        return Response({'results': bulk_create_contents(request.user, items)}, status=status.HTTP_200_OK)
+    except Exception as e:
+        logger.error(f"An Error occurred while trying to bulk create the Contents {str(e)}", exc_info=True)
+        return Response({"message": f"An Error occurred while trying to bulk create the Contents {e}"} ,status= status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@swagger_auto_schema(
+    method="put",
+    operation_description=f"Update up to {BULK_MAX_ITEMS} content items in one transaction. Each item holds "
+                          "the `id` of the content it changes and the fields to change; `tags` replaces the "
+                          "item's tags.",
+    request_body=ContentSerializer(many=True),
+    responses={
+        200: bulk_results_schema,
+        400: "Bad request - Not a list or too many items.",
+        500: "Internal server error."
+    }
+)
+
+@api_view(['PUT'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([CachedJWTAuthentication])
+def bulk_update_content(request):
+    items, error = bulk_items(request)
+    if error:
+        return error
+    try:
+        return Response({'results': bulk_update_contents(request.user, items)}, status=status.HTTP_200_OK)
+    except Exception as e:
+        logger.error(f"An Error occurred while trying to bulk update the Contents {str(e)}", exc_info=True)
+        return Response({"message": f"An Error occurred while trying to bulk update the Contents {e}"} ,status= status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@swagger_auto_schema(
+    method="delete",
+    operation_description=f"Delete up to {BULK_MAX_ITEMS} content items, given as a list of ids, "
+                          "in one transaction.",
+    request_body=openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER)),
+    responses={
+        200: bulk_results_schema,
+        400: "Bad request - Not a list or too many items.",
+        500: "Internal server error."
+    }
+)
+
+@api_view(['DELETE'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([CachedJWTAuthentication])
+def bulk_delete_content(request):
+    content_ids, error = bulk_items(request)
+    if error:
+        return error
+    try:
+        return Response({'results': bulk_delete_contents(request.user, content_ids)}, status=status.HTTP_200_OK)
+    except Exception as e:
+        logger.error(f"An Error occurred while trying to bulk delete the Contents {str(e)}", exc_info=True)
+        return Response({"message": f"An Error occurred while trying to bulk delete the Contents {e}"} ,status= status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@swagger_auto_schema(
+    method="get",
+    operation_description="Download all of the authenticated user's content as newline-delimited JSON, "
+                          "one item per line, streamed in id order.",
+    responses={
+        200: "NDJSON stream of content items.",
+    }
+)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([CachedJWTAuthentication])
+def export_contents(request):
+    response = StreamingHttpResponse(export_lines(request.user), content_type='application/x-ndjson')
+    response['Content-Disposition'] = 'attachment; filename="contents.ndjson"'
+    return response
+
+
+@swagger_auto_schema(
+    method="post",
+    operation_description="Create content from a newline-delimited JSON body, one item per line, such as "
+                          "an export. The body is read as it arrives and committed in batches; invalid "
+                          "lines are skipped and reported by line number.",
+    request_body=openapi.Schema(type=openapi.TYPE_STRING, format='binary'),
+    responses={
+        200: openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'created': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'invalid': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'errors': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT)),
+            },
+        ),
+        400: "Bad request - Empty body.",
+        500: "Internal server error."
+    }
+)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([CachedJWTAuthentication])
+def import_contents(request):
+    # Read the raw body line by line; request.data would parse all of it at once.
+    if request.stream is None:
+        return Response({'message': 'Expected an NDJSON body.'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        return Response(import_lines(request.user, request.stream), status=status.HTTP_200_OK)
+    except Exception as e:
+        logger.error(f"An Error occurred while trying to import the Contents {str(e)}", exc_info=True)
+        return Response({"message": f"An Error occurred while trying to import the Contents {e}"} ,status= status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,42 @@
+"""
+Native async variants of the subscription reads, for ASGI deployments.
+
+Plain Django async views returning the same JSON as their counterparts in
+`subscription.views`; see `content.async_views`.
+"""
+
+import logging
+
+from django.http import JsonResponse
+
+from cargo.http import async_require_GET
+from users.authentication import async_authenticated
+from .catalog import aget_plans
+from .models import Subscription
+from .serializers import SubscriptionSerializer, plan_rows
+
+logger = logging.getLogger(__name__)
+
+
+@async_require_GET
+async def get_subscription_plans(request):
+    try:
+        return JsonResponse(plan_rows(await aget_plans()), status=200, safe=False)
+    except Exception as e:
+        return JsonResponse({"detail": str(e)}, status=500)
+
+
+@async_require_GET
+@async_authenticated
+async def get_subscription_by_id(request, sub_id):
+    try:
+        subscription = await Subscription.objects.aget(user=request.user, id=sub_id)
+        # The serializer reads user.id; it is the user we filtered on.
+        subscription.user = request.user
+        serializer = SubscriptionSerializer(subscription)
+        return JsonResponse(serializer.data, status=200)
+    except Subscription.DoesNotExist:
+        return JsonResponse({"error": "Subscription not found"}, status=404)
+    except Exception as e:
+        logger.error(f"An Error Occured while trying to get the subscription with id {sub_id} : {str(e)}", exc_info=True)
+        return JsonResponse({"message": "An Error Occured while trying to get the subscription"}, status=500)
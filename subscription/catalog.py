@@ -0,0 +1,59 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+
+from cargo.cache import get_catalog_cache
+from .models import SubscriptionPlan
+
+PLANS_KEY = "plans:all"
+PLANS_VERSION_KEY = "plans:version"
+
+
+def _plan_key(plan_id):
+    return f"plan:{plan_id}"
+
+
+def get_plans():
+    return get_catalog_cache().get(PLANS_KEY, lambda: list(SubscriptionPlan.objects.order_by('id')))
+
+
+def plans_version():
+    version = cache.get(PLANS_VERSION_KEY)
+    if version is None:
+        # Seeded from the clock, like content.cache's generations, so an
+        # evicted counter never comes back at a value an old ETag was built from.
+        cache.add(PLANS_VERSION_KEY, time.time_ns() // 1000, timeout=None)
+        version = cache.get(PLANS_VERSION_KEY)
+    return version
+
+
+def bump_plans_version():
+    try:
+        cache.incr(PLANS_VERSION_KEY)
+    except ValueError:
+        cache.add(PLANS_VERSION_KEY, time.time_ns() // 1000, timeout=None)
+
+
+def plans_etag():
+    """Strong ETag for the plan list: changes with the plans version, costs one cache read."""
+    return hashlib.md5(f"{PLANS_KEY}:{plans_version()}".encode()).hexdigest()
+
+
+def get_plan(plan_id):
+    """Return the SubscriptionPlan with `plan_id`, or None if it doesn't exist."""
+    return get_catalog_cache().get(
+        _plan_key(plan_id),
+        lambda: SubscriptionPlan.objects.filter(id=plan_id).first(),
+    )
+
+
+def invalidate_plan(plan_id):
+    get_catalog_cache().invalidate(PLANS_KEY, _plan_key(plan_id))
+    # After the invalidation, so the new ETag is never served with the old plans.
+    bump_plans_version()
+
+
+async def aget_plans():
+    """`get_plans` for async views."""
+    return await get_catalog_cache().aget(PLANS_KEY, lambda: list(SubscriptionPlan.objects.order_by('id')))
@@ -0,0 +1,82 @@
+"""
+Subscription entitlements for authenticated requests.
+
+Every access token carries the user's plan and its expiry as claims (see
+`entitlement_claims`), stamped with the time they were computed. A
+subscription write records the time entitlements last changed for the user
+in the catalog cache for the lifetime of an access token; claims computed
+before that are ignored and the entitlement is looked up (and cached)
+instead. In the common case an entitlement check is a couple of local
+dictionary lookups and no queries.
+"""
+
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from cargo.cache import get_catalog_cache
+from .models import Subscription
+
+
+def _changed_key(user_id):
+    return f"entitlements_changed:{user_id}"
+
+
+def _entitlement_key(user_id):
+    return f"entitlement:{user_id}"
+
+
+def load_entitlement(user_id):
+    subscription = (
+        Subscription.objects.filter(user_id=user_id)
+        .select_related("plan")
+        .only("end_date", "plan__name")
+        .first()
+    )
+    if subscription is None:
+        return {"plan": None, "plan_expires": None}
+    return {"plan": subscription.plan.name, "plan_expires": int(subscription.end_date.timestamp())}
+
+
+def entitlement_claims(user_id):
+    """Claims to embed in a freshly issued access token."""
+    return {**load_entitlement(user_id), "entitlements_at": time.time()}
+
+
+def _entitlements_changed_at(user_id):
+    return get_catalog_cache().get(_changed_key(user_id), lambda: 0.0)
+
+
+def get_entitlement(user, token=None):
+    """Return {"plan": ..., "plan_expires": ...} for `user`, preferring the token's claims."""
+    if token is not None and "entitlements_at" in token:
+        if token["entitlements_at"] > _entitlements_changed_at(user.id):
+            return {"plan": token["plan"], "plan_expires": token["plan_expires"]}
+    return get_catalog_cache().get(_entitlement_key(user.id), lambda: load_entitlement(user.id))
+
+
+def has_active_subscription(user, token=None):
+    entitlement = get_entitlement(user, token)
+    return entitlement["plan"] is not None and entitlement["plan_expires"] >= timezone.now().timestamp()
+
+
+def entitlements_changed(user_ids):
+    """Invalidate token claims and cached entitlements after subscriptions are created, renewed or deleted."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+
+    def mark_changed():
+        # Stamped at commit, so tokens issued while the write was still
+        # uncommitted, with the old claims, are distrusted too.
+        catalog = get_catalog_cache()
+        now = time.time()
+        catalog.set_many(
+            {_changed_key(user_id): now for user_id in user_ids},
+            timeout=int(settings.SIMPLE_JWT["ACCESS_TOKEN_LIFETIME"].total_seconds()),
+        )
+        catalog.invalidate(*[_entitlement_key(user_id) for user_id in user_ids])
+
+    transaction.on_commit(mark_changed)
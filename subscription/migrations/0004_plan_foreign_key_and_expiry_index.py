@@ -0,0 +1,23 @@
+# Generated by Django 4.2.20 on 2026-10-18 18:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscription', '0003_alter_subscription_plan'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='subscription',
+            name='plan',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subscriptions', to='subscription.subscriptionplan'),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['end_date', 'auto_renew'], name='sub_end_date_auto_renew_idx'),
+        ),
+    ]
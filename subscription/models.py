@@ -1,6 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
-from datetime import timedelta, datetime
+from datetime import timedelta
 from django.utils import timezone
 
 User = get_user_model()
@@ -22,11 +22,17 @@ class SubscriptionPlan(models.Model):
 
 class Subscription(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="subscription")
-    plan = models.OneToOneField(SubscriptionPlan, on_delete=models.CASCADE)
+    plan = models.ForeignKey(SubscriptionPlan, on_delete=models.CASCADE, related_name="subscriptions")
     start_date = models.DateTimeField(auto_now_add=True)
     end_date = models.DateTimeField()
     auto_renew = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Serves the expiry/renewal sweep in subscription.tasks.
+            models.Index(fields=["end_date", "auto_renew"], name="sub_end_date_auto_renew_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.start_date:
             self.start_date = timezone.now()  
@@ -35,4 +41,4 @@ class Subscription(models.Model):
         super().save(*args, **kwargs)
 
     def is_active(self):
-        return self.end_date >= datetime.now()
+        return self.end_date >= timezone.now()
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from .catalog import get_plan
 from .models import Subscription, SubscriptionPlan
 from django.utils import timezone
 from datetime import timedelta
@@ -8,8 +9,23 @@ class SubscriptionPlanSerializer(serializers.ModelSerializer):
         model = SubscriptionPlan
         fields = '__all__'
 
+class CachedPlanField(serializers.PrimaryKeyRelatedField):
+    """Resolves plan ids through the catalog cache instead of querying the table."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            plan = get_plan(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if plan is None:
+            self.fail('does_not_exist', pk_value=data)
+        return plan
+
+
 class SubscriptionSerializer(serializers.ModelSerializer):
-    plan = serializers.PrimaryKeyRelatedField(queryset=SubscriptionPlan.objects.all())
+    plan = CachedPlanField(queryset=SubscriptionPlan.objects.all())
     user_id = serializers.IntegerField(source="user.id", read_only=True) 
 
     class Meta:
@@ -22,3 +38,42 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         validated_data["start_date"] = timezone.now()
         validated_data["end_date"] = validated_data["start_date"] + timedelta(days=validated_data["plan"].duration_days)
         return super().create(validated_data)
+
+
+# Read-only fast path. Builds the same dicts as the serializers above from
+# .values() rows, formatting dates and prices with the very DRF fields the
+# serializers use, so large lists skip the per-row model and serializer.
+_datetime_field = serializers.DateTimeField()
+_price_field = SubscriptionPlanSerializer().fields['price']
+
+
+def subscription_rows(queryset):
+    """The rows of a Subscription `queryset`, shaped like SubscriptionSerializer(many=True).data."""
+    to_representation = _datetime_field.to_representation
+    return [
+        {
+            'id': id,
+            'user_id': user_id,
+            'plan': plan_id,
+            'start_date': to_representation(start_date),
+            'end_date': to_representation(end_date),
+            'auto_renew': auto_renew,
+        }
+        for id, user_id, plan_id, start_date, end_date, auto_renew in queryset.values_list(
+            'id', 'user_id', 'plan_id', 'start_date', 'end_date', 'auto_renew'
+        )
+    ]
+
+
+def plan_rows(plans):
+    """`plans` (SubscriptionPlan instances, as cached by the catalog) shaped like
+    SubscriptionPlanSerializer(many=True).data."""
+    return [
+        {
+            'id': plan.id,
+            'name': plan.name,
+            'price': _price_field.to_representation(plan.price),
+            'duration_days': plan.duration_days,
+        }
+        for plan in plans
+    ]
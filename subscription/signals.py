@@ -1,10 +1,10 @@
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.core.cache import cache
+from .catalog import invalidate_plan
 from .models import SubscriptionPlan
 
 @receiver([post_save, post_delete], sender=SubscriptionPlan)
-def invalidate_sub_plans_cache(sender, instance, created, **kwargs):
-    cache_key = 'sub_plans'  
-
-    cache.delete_pattern(cache_key)
+def invalidate_sub_plans_cache(sender, instance, **kwargs):
+    plan_id = instance.id
+    transaction.on_commit(lambda: invalidate_plan(plan_id))
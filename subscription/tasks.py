@@ -1,13 +1,102 @@
+import logging
+import time
+from datetime import timedelta
+
 from celery import shared_task
+from django.db import transaction
+from django.db.models import DurationField, ExpressionWrapper, F, Func, IntegerField, Max, Min, Value
 from django.utils import timezone
+from .catalog import get_plans
+from .entitlements import entitlements_changed
 from .models import Subscription
 
+logger = logging.getLogger(__name__)
+
+EXPIRY_CHUNK_SIZE = 10000
+
+
+def _id_ranges(queryset, size):
+    """Yield half-open [start, end) id ranges covering every row of `queryset`."""
+    bounds = queryset.aggregate(low=Min("id"), high=Max("id"))
+    if bounds["low"] is None:
+        return
+    for start in range(bounds["low"], bounds["high"] + 1, size):
+        yield start, start + size
+
+
+def expire_chunk(start, end, now):
+    """Delete the lapsed, non-renewing subscriptions with ids in [start, end)."""
+    deleted, _ = Subscription.objects.filter(
+        id__gte=start, id__lt=end, end_date__lt=now, auto_renew=False
+    ).delete()
+    return deleted
+
+
+class PeriodsToRenew(Func):
+    """Whole periods of `days` days a datetime that has passed `now` must move on by to end after it."""
+    output_field = IntegerField()
+    template = "(CAST((julianday(%(expressions)s)) / %(days)d AS INTEGER) + 1)"
+    arg_joiner = ") - julianday("
+
+    def __init__(self, expression, now, days):
+        super().__init__(Value(now), expression, days=days)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template="(FLOOR(EXTRACT(EPOCH FROM (%(expressions)s)) / (86400 * %(days)d))::integer + 1)",
+            arg_joiner=" - ", **extra_context,
+        )
+
+
+def renew_chunk(start, end, now, plans):
+    """Extend the lapsed, auto-renewing subscriptions with ids in [start, end) past `now`.
+
+    Each is extended by as many whole periods of its plan as it needs to end
+    after `now`, so its renewal date stays the same, with one UPDATE per plan
+    however long it has lapsed.
+    """
+    renewed = 0
+    for plan in plans:
+        if plan.duration_days <= 0:
+            logger.error(f"Not renewing subscriptions to plan {plan.id}: duration_days is {plan.duration_days}")
+            continue
+        due = Subscription.objects.filter(
+            id__gte=start, id__lt=end, end_date__lt=now, auto_renew=True, plan_id=plan.id
+        )
+        periods = PeriodsToRenew(F("end_date"), now, plan.duration_days)
+        renewed += due.update(end_date=F("end_date") + ExpressionWrapper(
+            periods * Value(timedelta(days=plan.duration_days)), output_field=DurationField()
+        ))
+    return renewed
+
+
 @shared_task
-def deactivate_expired_subscriptions():
+def process_due_subscriptions():
+    """Expire or renew every subscription whose end_date has passed.
+
+    Works through the due rows in bounded id ranges, one transaction per
+    range, so no more than EXPIRY_CHUNK_SIZE rows are touched at a time and
+    nothing is loaded into Python.
+    """
+    started = time.monotonic()
     now = timezone.now()
-    expired_subscriptions = Subscription.objects.filter(end_date__lt=now, auto_renew=False)
-    
-    for sub in expired_subscriptions:
-        sub.delete() 
+    plans = get_plans()
+    expired = renewed = chunks = 0
+
+    for start, end in _id_ranges(Subscription.objects.filter(end_date__lt=now), EXPIRY_CHUNK_SIZE):
+        with transaction.atomic():
+            user_ids = list(Subscription.objects.filter(
+                id__gte=start, id__lt=end, end_date__lt=now
+            ).values_list("user_id", flat=True))
+            expired += expire_chunk(start, end, now)
+            renewed += renew_chunk(start, end, now, plans)
+        entitlements_changed(user_ids)
+        chunks += 1
 
-    return f"Deactivated {expired_subscriptions.count()} expired subscriptions."
+    elapsed = time.monotonic() - started
+    logger.info(
+        f"Processed due subscriptions: expired={expired} renewed={renewed} "
+        f"chunks={chunks} seconds={elapsed:.3f}"
+    )
+    return {"expired": expired, "renewed": renewed, "chunks": chunks, "seconds": round(elapsed, 3)}
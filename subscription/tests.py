@@ -1,3 +1,220 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import AsyncClient, TestCase
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from cargo.renderers import ORJSONRenderer
+from cargo.testing import QueryPlanTestCase, clear_caches, local_services
+from subscription.entitlements import _entitlements_changed_at, has_active_subscription, load_entitlement
+from subscription.models import Subscription, SubscriptionPlan
+from subscription.serializers import SubscriptionPlanSerializer, SubscriptionSerializer, plan_rows, subscription_rows
+from subscription.tasks import expire_chunk, process_due_subscriptions, renew_chunk
+from users.tokens import CargoRefreshToken
+
+
+class SubscriptionQueryPlanTests(QueryPlanTestCase):
+    """Subscription lookups and the expiry sweep must stay on an index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan = SubscriptionPlan.objects.create(name="monthly", price="9.99", duration_days=30)
+        cls.user = User.objects.create_user(username="subscriber", password="password")
+        cls.subscription = Subscription.objects.create(user=cls.user, plan=cls.plan)
+        for i in range(3):
+            user = User.objects.create_user(username=f"lapsed-{i}", password="password")
+            Subscription.objects.create(user=user, plan=cls.plan, end_date=timezone.now() - timedelta(days=1),
+                                        auto_renew=bool(i % 2))
+
+    def test_subscription_detail(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+        self.assertNoFullScan(lambda: client.get(f"/api/subscriptions/{self.subscription.id}"))
+
+    def test_load_entitlement(self):
+        self.assertNoFullScan(lambda: load_entitlement(self.user.id))
+
+    def test_expiry_sweep(self):
+        now = timezone.now()
+        self.assertNoFullScan(lambda: expire_chunk(0, 10000, now))
+        self.assertNoFullScan(lambda: renew_chunk(0, 10000, now, [self.plan]))
+
+
+class FastPathRowTests(TestCase):
+    def test_rows_match_the_serializers(self):
+        plans = [
+            SubscriptionPlan.objects.create(name="monthly", price="9.99", duration_days=30),
+            SubscriptionPlan.objects.create(name="yearly", price="100", duration_days=365),
+        ]
+        for i, plan in enumerate(plans):
+            user = User.objects.create_user(username=f"subscriber-{i}", password="password")
+            Subscription.objects.create(user=user, plan=plan, auto_renew=bool(i),
+                                        end_date=timezone.now() + timedelta(days=plan.duration_days))
+
+        checks = [
+            (plan_rows(SubscriptionPlan.objects.order_by("id")),
+             SubscriptionPlanSerializer(SubscriptionPlan.objects.order_by("id"), many=True).data),
+            (subscription_rows(Subscription.objects.order_by("id")),
+             SubscriptionSerializer(Subscription.objects.order_by("id"), many=True).data),
+        ]
+        for rows, expected in checks:
+            self.assertEqual(rows, expected)
+            self.assertEqual(ORJSONRenderer().render(rows), JSONRenderer().render(expected))
+
+
+@local_services
+class AsyncViewTests(TestCase):
+    """The async routes answer like the sync views they mirror."""
+
+    @classmethod
+    def setUpTestData(cls):
+        plan = SubscriptionPlan.objects.create(name="monthly", price="9.99", duration_days=30)
+        SubscriptionPlan.objects.create(name="yearly", price="100", duration_days=365)
+        cls.subscriber = User.objects.create_user(username="subscriber", password="password")
+        cls.subscription = Subscription.objects.create(user=cls.subscriber, plan=plan,
+                                                       end_date=timezone.now() + timedelta(days=30))
+        cls.headers = {"Authorization": f"Bearer {CargoRefreshToken.for_user(cls.subscriber).access_token}"}
+
+    def setUp(self):
+        clear_caches()
+
+    async def test_same_bodies_as_the_sync_views(self):
+        client = AsyncClient()
+        for async_url, sync_url in [("/api/subscriptions/async/plans/", "/api/subscriptions/plans/"),
+                                    (f"/api/subscriptions/async/{self.subscription.id}",
+                                     f"/api/subscriptions/{self.subscription.id}")]:
+            with self.subTest(async_url):
+                async_response = await client.get(async_url, headers=self.headers)
+                sync_response = await client.get(sync_url, headers=self.headers)
+                self.assertEqual(async_response.status_code, 200)
+                self.assertEqual(sync_response.status_code, 200)
+                self.assertEqual(json.loads(async_response.content), json.loads(sync_response.content))
+
+    async def test_same_401_as_the_sync_views(self):
+        client = AsyncClient()
+        async_response = await client.get(f"/api/subscriptions/async/{self.subscription.id}")
+        sync_response = await client.get(f"/api/subscriptions/{self.subscription.id}")
+        self.assertEqual(async_response.status_code, 401)
+        self.assertEqual(sync_response.status_code, 401)
+        self.assertEqual(async_response["WWW-Authenticate"], sync_response["WWW-Authenticate"])
+        self.assertEqual(json.loads(async_response.content), json.loads(sync_response.content))
+
+
+@local_services
+class PlanListETagTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan = SubscriptionPlan.objects.create(name="monthly", price="9.99", duration_days=30)
+
+    def setUp(self):
+        clear_caches()
+
+    def test_not_modified_until_a_plan_changes(self):
+        etag = self.client.get("/api/subscriptions/plans/")["ETag"]
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/api/subscriptions/plans/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        for change in [lambda: SubscriptionPlan.objects.filter(id=self.plan.id).first().save(),
+                       lambda: SubscriptionPlan.objects.create(name="yearly", price="100", duration_days=365),
+                       lambda: SubscriptionPlan.objects.filter(name="yearly").first().delete()]:
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+                # Nothing is committed yet, so clients keep their copy.
+                self.assertEqual(self.client.get("/api/subscriptions/plans/", HTTP_IF_NONE_MATCH=etag).status_code,
+                                 304)
+            response = self.client.get("/api/subscriptions/plans/", HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["ETag"], etag)
+            etag = response["ETag"]
+
+
+@local_services
+class EntitlementTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        plan = SubscriptionPlan.objects.create(name="monthly", price="9.99", duration_days=30)
+        cls.subscriber = User.objects.create_user(username="subscriber", password="password")
+        cls.subscription = Subscription.objects.create(user=cls.subscriber, plan=plan,
+                                                       end_date=timezone.now() + timedelta(days=30))
+        cls.visitor = User.objects.create_user(username="visitor", password="password")
+
+    def setUp(self):
+        clear_caches()
+
+    def test_answers_from_the_token_claims(self):
+        subscriber_token = CargoRefreshToken.for_user(self.subscriber).access_token
+        visitor_token = CargoRefreshToken.for_user(self.visitor).access_token
+        with self.assertNumQueries(0):
+            self.assertTrue(has_active_subscription(self.subscriber, subscriber_token))
+            self.assertFalse(has_active_subscription(self.visitor, visitor_token))
+
+    def test_subscription_changes_invalidate_earlier_claims(self):
+        token = CargoRefreshToken.for_user(self.subscriber).access_token
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.delete(f"/api/subscriptions/delete/{self.subscription.id}")
+        self.assertEqual(response.status_code, 204)
+
+        self.assertFalse(has_active_subscription(self.subscriber, token))
+        # Tokens minted after the change carry the new claims again.
+        self.assertFalse(has_active_subscription(
+            self.subscriber, CargoRefreshToken.for_user(self.subscriber).access_token))
+
+
+@local_services
+class DueSubscriptionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan = SubscriptionPlan.objects.create(name="monthly", price="9.99", duration_days=30)
+        cls.now = timezone.now()
+
+        def subscribe(username, lapsed_days, auto_renew):
+            user = User.objects.create_user(username=username, password="password")
+            return Subscription.objects.create(user=user, plan=cls.plan, auto_renew=auto_renew,
+                                               end_date=cls.now - timedelta(days=lapsed_days))
+
+        cls.active = subscribe("active", -10, False)
+        cls.lapsed = subscribe("lapsed", 1, False)
+        cls.renewing = subscribe("renewing", 1, True)
+        cls.long_lapsed = subscribe("long-lapsed", 75, True)
+
+    def setUp(self):
+        clear_caches()
+
+    def test_expires_and_renews_due_subscriptions(self):
+        end_dates = {sub.id: sub.end_date for sub in Subscription.objects.all()}
+        with self.captureOnCommitCallbacks(execute=True):
+            result = process_due_subscriptions()
+
+        self.assertEqual((result["expired"], result["renewed"]), (1, 2))
+        self.assertFalse(Subscription.objects.filter(id=self.lapsed.id).exists())
+        self.assertEqual(Subscription.objects.get(id=self.active.id).end_date, end_dates[self.active.id])
+        self.assertEqual(Subscription.objects.get(id=self.renewing.id).end_date,
+                         end_dates[self.renewing.id] + timedelta(days=30))
+        # Lapsed for two and a half periods: renewed by three, to end after now.
+        self.assertEqual(Subscription.objects.get(id=self.long_lapsed.id).end_date,
+                         end_dates[self.long_lapsed.id] + timedelta(days=90))
+
+        # Tokens issued before the sweep no longer vouch for these users' plans.
+        for subscription in (self.lapsed, self.renewing, self.long_lapsed):
+            self.assertGreater(_entitlements_changed_at(subscription.user_id), self.now.timestamp())
+        self.assertEqual(_entitlements_changed_at(self.active.user_id), 0.0)
+
+    def test_renews_many_periods_in_one_update(self):
+        # A one-day period, so three years are over a thousand periods.
+        daily = SubscriptionPlan.objects.create(name="quarterly", price="0.99", duration_days=1)
+        user = User.objects.create_user(username="three-years", password="password")
+        # Lapsed three years and a quarter of a day ago.
+        end_date = self.now - timedelta(days=3 * 365, hours=6)
+        subscription = Subscription.objects.create(user=user, plan=daily, auto_renew=True, end_date=end_date)
+
+        with self.assertNumQueries(1):
+            renewed = renew_chunk(subscription.id, subscription.id + 1, self.now, [daily])
+        self.assertEqual(renewed, 1)
+        self.assertEqual(Subscription.objects.get(id=subscription.id).end_date,
+                         end_date + timedelta(days=3 * 365 + 1))
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 
 urlpatterns = [
@@ -9,4 +9,8 @@ urlpatterns = [
     path('<int:sub_id>', views.get_subscription_by_id, name="subscription_by_id"), 
     path("renew/<int:sub_id>", views.renew_subscription, name="renew_subscription"),
     path("delete/<int:sub_id>", views.delete_subscription, name="delete_subscription"),      
+
+    # Native async variants for ASGI (see subscription/async_views.py).
+    path('async/plans/', async_views.get_subscription_plans, name='get_sub_plans_async'),
+    path('async/<int:sub_id>', async_views.get_subscription_by_id, name='subscription_by_id_async'),
 ]
@@ -6,11 +6,12 @@ from rest_framework.decorators import api_view, permission_classes, authenticati
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework import status, permissions
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from users.authentication import CachedJWTAuthentication
 from .models import Subscription, SubscriptionPlan
-from .serializers import SubscriptionPlanSerializer, SubscriptionSerializer
-from django.core.cache import cache
-from django.views.decorators.cache import cache_page
+from .serializers import SubscriptionPlanSerializer, SubscriptionSerializer, plan_rows, subscription_rows
+from .catalog import get_plans, plans_etag
+from django.views.decorators.http import condition
+from .entitlements import entitlements_changed
 import logging
 
 
@@ -30,7 +31,7 @@ logger = logging.getLogger(__name__)
 )
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 def create_subscription(request):
     try:
         serializer = SubscriptionSerializer(data=request.data)
@@ -47,6 +48,7 @@ def create_subscription(request):
             )
         
         serializer.save(user=request.user)
+        entitlements_changed([request.user.id])
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     except Exception as e:
         logger.error(f"An Error Occured while trying to create a subscription for the user. : {str(e)}", exc_info=True)
@@ -68,12 +70,10 @@ def create_subscription(request):
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 def get_all_subscriptions(request):
     try:
-        subscriptions = Subscription.objects.all()
-        serializer = SubscriptionSerializer(subscriptions, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(subscription_rows(Subscription.objects.all()), status=status.HTTP_200_OK)
     except Exception as e:
         logger.error(f"An Error Occured while trying to get all subscriptions : {str(e)}", exc_info=True)
         return Response({"message": "An Error Occured while trying to get all subscriptions"},
@@ -92,7 +92,7 @@ def get_all_subscriptions(request):
 )
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 def get_subscription_by_id(request, sub_id):
     try:
         subscription = Subscription.objects.get(user=request.user, id=sub_id)
@@ -108,24 +108,28 @@ def get_subscription_by_id(request, sub_id):
         
        
 
+def plans_list_etag(request):
+    return plans_etag()
+
+
 @swagger_auto_schema(
     method="get",
-    operation_description="Retrieve all available subscription plans.",
+    operation_description="Retrieve all available subscription plans. Responses carry an ETag; "
+                          "send it back in If-None-Match to get a 304 when the plans have not changed.",
     responses={
         200: SubscriptionPlanSerializer(many=True),
+        304: "Not modified since the ETag sent in If-None-Match.",
         500: "Internal server error"
     }
 )
 
-@cache_page(60 * 15, key_prefix="sub_plans")
 @api_view(['GET'])
 @authentication_classes([])
 @permission_classes([AllowAny])
+@condition(etag_func=plans_list_etag)
 def get_subscription_plans(request):
     try:
-        plans = SubscriptionPlan.objects.all()
-        serializer = SubscriptionPlanSerializer(plans, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(plan_rows(get_plans()), status=status.HTTP_200_OK)
     except Exception as e:
         return Response({"detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR) 
         
@@ -151,7 +155,7 @@ def get_subscription_plans(request):
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 def renew_subscription(request, sub_id):
     
     try:
@@ -176,6 +180,7 @@ def renew_subscription(request, sub_id):
 
         subscription.end_date += timedelta(days=subscription.plan.duration_days)
         subscription.save()
+        entitlements_changed([user.id])
 
         return Response({
             "message": "Subscription renewed successfully",
@@ -198,11 +203,12 @@ def renew_subscription(request, sub_id):
 )
 @api_view(["DELETE"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 def delete_subscription(request, sub_id):
     try:
         subscription = Subscription.objects.get(user=request.user, id=sub_id)
         subscription.delete()
+        entitlements_changed([request.user.id])
         return Response({"message": "Subscription deleted successfully"}, status=204)
     except Subscription.DoesNotExist:
         logger.error(f"Subscription with id : {sub_id} not found")
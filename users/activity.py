@@ -0,0 +1,113 @@
+import logging
+import uuid
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from content import trending
+from content.models import Content
+from .buffer import get_activity_buffer, make_event
+from .models import UserActivity
+from .serializers import ActivityEventSerializer
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 500
+
+
+def validate_activities(events):
+    """Shape-check events without touching the database.
+
+    On the write-behind path this is the only validation done on the request;
+    content existence is checked when the buffer is drained. Returns
+    `(valid, errors)`, where `valid` holds `(index, validated_data)` pairs.
+    """
+    valid = []
+    errors = []
+    for index, event in enumerate(events):
+        serializer = ActivityEventSerializer(data=event)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            errors.append({"index": index, "errors": serializer.errors})
+    return valid, errors
+
+
+def record_activities(user, events):
+    """Validate and persist a batch of activity events for `user`.
+
+    Every referenced content id is checked with a single `IN` query and the
+    valid events are written with one `bulk_create`. Invalid events are
+    reported back as `{"index": ..., "errors": ...}` instead of failing the
+    whole batch. Returns `(created, errors)`.
+    """
+    valid, errors = validate_activities(events)
+
+    content_ids = {data["content"] for _, data in valid}
+    existing = set(Content.objects.filter(id__in=content_ids).values_list("id", flat=True))
+
+    activities = []
+    for index, data in valid:
+        if data["content"] not in existing:
+            errors.append({
+                "index": index,
+                "errors": {"content": [f'Invalid pk "{data["content"]}" - object does not exist.']},
+            })
+            continue
+        activities.append(UserActivity(user=user, action=data["action"], content_id=data["content"]))
+
+    with transaction.atomic():
+        created = UserActivity.objects.bulk_create(activities)
+    trending.record(created)
+
+    errors.sort(key=lambda error: error["index"])
+    return created, errors
+
+
+def enqueue_activities(user, valid):
+    """Append validated events to the write-behind buffer.
+
+    Raises `BufferFull` when the buffer is at capacity; nothing is enqueued
+    in that case.
+    """
+    if not valid:
+        return
+    get_activity_buffer().push([make_event(user, data["action"], data["content"]) for _, data in valid])
+
+
+def persist_buffered_activities(events):
+    """Store events drained from the write-behind buffer.
+
+    The same event may be drained more than once, so duplicates are dropped
+    both within the batch and against rows already stored (via the unique
+    `event_id`). Events whose user or content no longer exists are discarded.
+    Returns the number of events handed to the database.
+    """
+    unique = list({event["event_id"]: event for event in events}.values())
+    content_ids = set(
+        Content.objects.filter(id__in={event["content"] for event in unique}).values_list("id", flat=True)
+    )
+    user_ids = set(
+        User.objects.filter(id__in={event["user_id"] for event in unique}).values_list("id", flat=True)
+    )
+
+    activities = [
+        UserActivity(
+            event_id=uuid.UUID(event["event_id"]),
+            user_id=event["user_id"],
+            action=event["action"],
+            content_id=event["content"],
+            timestamp=parse_datetime(event["timestamp"]),
+        )
+        for event in unique
+        if event["content"] in content_ids and event["user_id"] in user_ids
+    ]
+    if len(activities) < len(unique):
+        logger.warning(f"Dropped {len(unique) - len(activities)} buffered activities for deleted users or content")
+
+    with transaction.atomic():
+        UserActivity.objects.bulk_create(activities, ignore_conflicts=True)
+    # A redelivered batch counts towards trending again; rare enough not to matter.
+    trending.record(activities)
+    return len(activities)
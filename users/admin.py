@@ -1,3 +1,16 @@
 from django.contrib import admin
+from .models import DailyContentActivity, UserCategoryActivity
 
-# Register your models here.
+
+@admin.register(DailyContentActivity)
+class DailyContentActivityAdmin(admin.ModelAdmin):
+    list_display = ('content', 'day', 'viewed', 'liked', 'skipped')
+    list_filter = ('day',)
+    raw_id_fields = ('content',)
+
+
+@admin.register(UserCategoryActivity)
+class UserCategoryActivityAdmin(admin.ModelAdmin):
+    list_display = ('user', 'category', 'viewed', 'liked', 'skipped')
+    list_filter = ('category',)
+    raw_id_fields = ('user',)
@@ -0,0 +1,193 @@
+import json
+import threading
+import time
+import uuid
+from collections import deque
+
+import redis
+from django.conf import settings
+from django.utils import timezone
+
+
+class BufferFull(Exception):
+    """Raised when accepting more events would exceed the buffer's capacity."""
+
+
+def make_event(user, action, content_id):
+    return {
+        "event_id": uuid.uuid4().hex,
+        "user_id": user.id,
+        "action": action,
+        "content": content_id,
+        "timestamp": timezone.now().isoformat(),
+    }
+
+
+class LocalActivityBuffer:
+    """In-process stand-in for `RedisActivityBuffer`, for development and tests.
+
+    Only events pushed from the same process can be drained from it.
+    """
+
+    def __init__(self, max_size, claim_timeout=300):
+        self.max_size = max_size
+        self.claim_timeout = claim_timeout
+        self._pending = deque()
+        # {claim id: [claimed at, events]}
+        self._claims = {}
+        self._lock = threading.Lock()
+
+    def _claimed(self):
+        return sum(len(events) for _, events in self._claims.values())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending) + self._claimed()
+
+    def push(self, events):
+        if not events:
+            return
+        with self._lock:
+            if len(self._pending) + self._claimed() + len(events) > self.max_size:
+                raise BufferFull()
+            self._pending.extend(events)
+
+    def claim(self, count):
+        with self._lock:
+            now = time.monotonic()
+            # A claim not acknowledged in time belongs to a drain that died;
+            # it is handed out again before any new events.
+            for claim_id, claim in self._claims.items():
+                if claim[0] < now - self.claim_timeout:
+                    claim[0] = now
+                    return claim_id, list(claim[1])
+            events = [self._pending.popleft() for _ in range(min(count, len(self._pending)))]
+            if not events:
+                return None, []
+            claim_id = uuid.uuid4().hex
+            self._claims[claim_id] = [now, events]
+            return claim_id, list(events)
+
+    def ack(self, claim_id):
+        with self._lock:
+            self._claims.pop(claim_id, None)
+
+
+# The scripts run atomically on the Redis server, so concurrent pushes can't
+# overshoot the cap and a claim can't lose events between the keys. Claims
+# are fields of fixed keys rather than keys of their own, so every key a
+# script touches is passed in KEYS, as Redis Cluster requires.
+# KEYS: pending list, claims sorted set (claim id -> claimed at), claimed
+# events hash (claim id -> JSON array of the events), claim sizes hash
+# (claim id -> number of events), count of claimed events.
+PUSH_SCRIPT = """
+local claimed = tonumber(redis.call('GET', KEYS[5]) or '0')
+if redis.call('LLEN', KEYS[1]) + claimed + #ARGV - 1 > tonumber(ARGV[1]) then
+    return -1
+end
+return redis.call('RPUSH', KEYS[1], unpack(ARGV, 2))
+"""
+
+CLAIM_SCRIPT = """
+local stale = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[4], 'LIMIT', 0, 1)
+if #stale > 0 then
+    redis.call('ZADD', KEYS[2], ARGV[3], stale[1])
+    return {stale[1], redis.call('HGET', KEYS[3], stale[1])}
+end
+local claimed = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #claimed == 0 then
+    return {false, false}
+end
+local batch = '[' .. table.concat(claimed, ',') .. ']'
+redis.call('LTRIM', KEYS[1], #claimed, -1)
+redis.call('HSET', KEYS[3], ARGV[2], batch)
+redis.call('HSET', KEYS[4], ARGV[2], #claimed)
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[2])
+redis.call('INCRBY', KEYS[5], #claimed)
+return {ARGV[2], batch}
+"""
+
+ACK_SCRIPT = """
+if redis.call('ZREM', KEYS[2], ARGV[1]) == 1 then
+    redis.call('DECRBY', KEYS[5], redis.call('HGET', KEYS[4], ARGV[1]))
+    redis.call('HDEL', KEYS[3], ARGV[1])
+    redis.call('HDEL', KEYS[4], ARGV[1])
+end
+"""
+
+
+class RedisActivityBuffer:
+    """Bounded activity buffer kept in Redis lists.
+
+    New events are appended to the pending list. A drain moves a batch
+    into a claim of its own, persists it and only then acknowledges it,
+    which deletes the claim. Concurrent drains each hold their own batch. A
+    batch not acknowledged within `claim_timeout` seconds belongs to a drain
+    that died half-way and is claimed again (at-least-once). The keys share
+    the `{key_prefix}` hash tag, so on Redis Cluster they sit in one slot.
+    """
+
+    def __init__(self, location, max_size, claim_timeout=300, key_prefix="activity_buffer"):
+        self.max_size = max_size
+        self.claim_timeout = claim_timeout
+        self.key_prefix = key_prefix
+        self.pending_key = f"{{{key_prefix}}}:pending"
+        self.claims_key = f"{{{key_prefix}}}:claims"
+        self.claimed_events_key = f"{{{key_prefix}}}:claimed_events"
+        self.claim_sizes_key = f"{{{key_prefix}}}:claim_sizes"
+        self.claimed_count_key = f"{{{key_prefix}}}:claimed"
+        self.client = redis.Redis.from_url(location)
+        self._push = self.client.register_script(PUSH_SCRIPT)
+        self._claim = self.client.register_script(CLAIM_SCRIPT)
+        self._ack = self.client.register_script(ACK_SCRIPT)
+
+    @property
+    def _keys(self):
+        return [self.pending_key, self.claims_key, self.claimed_events_key, self.claim_sizes_key,
+                self.claimed_count_key]
+
+    def __len__(self):
+        return self.client.llen(self.pending_key) + int(self.client.get(self.claimed_count_key) or 0)
+
+    def push(self, events):
+        if not events:
+            return
+        payload = [json.dumps(event) for event in events]
+        if self._push(keys=self._keys, args=[self.max_size, *payload]) == -1:
+            raise BufferFull()
+
+    def claim(self, count):
+        """Return (claim id, events) for up to `count` events; pass the id to `ack` once they are stored."""
+        now = time.time()
+        claim_id, batch = self._claim(
+            keys=self._keys, args=[count, uuid.uuid4().hex, now, now - self.claim_timeout],
+        )
+        if claim_id is None:
+            return None, []
+        return claim_id.decode(), json.loads(batch)
+
+    def ack(self, claim_id):
+        self._ack(keys=self._keys, args=[claim_id])
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def write_behind_enabled():
+    return settings.ACTIVITY_BUFFER.get("ENABLED", False)
+
+
+def get_activity_buffer():
+    global _buffer
+
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                config = settings.ACTIVITY_BUFFER
+                claim_timeout = config.get("CLAIM_TIMEOUT", 300)
+                if config.get("BACKEND") == "local":
+                    _buffer = LocalActivityBuffer(config["MAX_SIZE"], claim_timeout)
+                else:
+                    _buffer = RedisActivityBuffer(config["LOCATION"], config["MAX_SIZE"], claim_timeout)
+    return _buffer
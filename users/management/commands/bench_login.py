@@ -0,0 +1,66 @@
+import time
+import uuid
+
+from django.contrib.auth.hashers import get_hasher
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory
+from users.views import LoginView
+
+
+class Command(BaseCommand):
+    help = "Measure login throughput (logins/sec on a single core) through LoginView"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logins", type=int, default=50, help="Number of timed logins")
+        parser.add_argument("--warmup", type=int, default=3, help="Untimed logins before measuring")
+        parser.add_argument(
+            "--hasher-iterations", type=int,
+            help="Override the default password hasher's work factor for this run",
+        )
+
+    def handle(self, *args, **options):
+        hasher = get_hasher()
+        default_iterations = getattr(hasher, "iterations", None)
+        if options["hasher_iterations"]:
+            hasher.iterations = options["hasher_iterations"]
+
+        try:
+            with transaction.atomic():
+                elapsed = self._run(options["logins"], options["warmup"])
+                # Leave no benchmark user behind.
+                transaction.set_rollback(True)
+        finally:
+            if default_iterations is not None:
+                hasher.iterations = default_iterations
+
+        rate = options["logins"] / elapsed
+        work_factor = options["hasher_iterations"] or default_iterations
+        self.stdout.write(self.style.SUCCESS(
+            f"{hasher.algorithm} (work factor {work_factor}): "
+            f"{rate:.1f} logins/sec/core, {elapsed / options['logins'] * 1000:.2f} ms/login "
+            f"over {options['logins']} logins"
+        ))
+
+    def _run(self, logins, warmup):
+        username = f"bench-login-{uuid.uuid4().hex[:12]}"
+        password = uuid.uuid4().hex
+        User.objects.create_user(username=username, password=password)
+
+        factory = APIRequestFactory()
+        view = LoginView.as_view()
+        credentials = {"username": username, "password": password}
+
+        for _ in range(warmup):
+            self._login(factory, view, credentials)
+
+        started = time.perf_counter()
+        for _ in range(logins):
+            self._login(factory, view, credentials)
+        return time.perf_counter() - started
+
+    def _login(self, factory, view, credentials):
+        response = view(factory.post("/api/users/login/", credentials, format="json"))
+        if response.status_code != 200:
+            raise RuntimeError(f"Login failed with status {response.status_code}: {response.data}")
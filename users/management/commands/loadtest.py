@@ -0,0 +1,263 @@
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from cargo.middleware import QueryCountMiddleware
+from content.models import Category, Content
+from subscription.models import Subscription
+
+# Relative frequency of each operation in the mixed workload.
+SCENARIO = {
+    "list_contents": 20,
+    "get_content": 15,
+    "feed": 10,
+    "search": 5,
+    "trending": 5,
+    "create_content": 5,
+    "update_content": 3,
+    "delete_content": 1,
+    "track_activity": 15,
+    "track_activities_batch": 5,
+    "list_plans": 8,
+    "list_subscriptions": 5,
+    "get_subscription": 3,
+}
+
+SEARCH_TERMS = ["market", "travel guide", "music", "python data", "garden", "fin"]
+
+# Operations served by the native async views with --async-routes.
+ASYNC_OPERATIONS = ["list_contents", "get_content", "feed", "list_plans", "get_subscription"]
+
+
+class Stats:
+    """Thread-safe per-endpoint latency, status and query-count samples."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds, status, queries):
+        with self._lock:
+            self.latencies[name].append(seconds)
+            if queries is not None:
+                self.queries[name].append(queries)
+            if status >= 400:
+                self.errors[name] += 1
+
+
+class Client:
+    """Minimal JSON-over-HTTP client for one virtual user."""
+
+    def __init__(self, base_url, stats, timeout):
+        self.base_url = base_url.rstrip("/")
+        self.stats = stats
+        self.timeout = timeout
+        self.token = None
+
+    def request(self, name, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(f"{self.base_url}{path}", data=data, method=method)
+        request.add_header("Content-Type", "application/json")
+        if self.token:
+            request.add_header("Authorization", f"Bearer {self.token}")
+
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                status, headers, payload = response.status, response.headers, response.read()
+        except urllib.error.HTTPError as e:
+            status, headers, payload = e.code, e.headers, e.read()
+        elapsed = time.perf_counter() - started
+
+        queries = headers.get(QueryCountMiddleware.header)
+        self.stats.add(name, elapsed, status, int(queries) if queries is not None else None)
+        try:
+            return status, json.loads(payload) if payload else None
+        except ValueError:
+            return status, None
+
+
+class VirtualUser:
+    def __init__(self, client, user_id, username, password, category_ids, content_ids, async_routes=False):
+        self.client = client
+        self.async_routes = async_routes
+        self.user_id = user_id
+        self.username = username
+        self.password = password
+        self.category_ids = category_ids
+        self.content_ids = content_ids
+        self.own_content_ids = []
+        self.subscription_id = None
+
+    def login(self):
+        status, body = self.client.request("login", "POST", "/api/users/login/",
+                                           {"username": self.username, "password": self.password})
+        if status != 200:
+            raise CommandError(f"Login as {self.username} failed with status {status}; seed the data first")
+        self.client.token = body["access"]
+
+    def run(self, operation):
+        getattr(self, operation)()
+
+    def _read_path(self, app, path=""):
+        """`/api/<app>/<path>`, or its async variant under --async-routes."""
+        return f"/api/{app}/async/{path}" if self.async_routes else f"/api/{app}/{path}"
+
+    def list_contents(self):
+        status, body = self.client.request("list_contents", "GET", self._read_path("contents"))
+        if status == 200:
+            self.own_content_ids = [item["id"] for item in body["results"]]
+
+    def get_content(self):
+        if self.own_content_ids:
+            self.client.request("get_content", "GET",
+                                self._read_path("contents", f"{random.choice(self.own_content_ids)}/"))
+
+    def feed(self):
+        self.client.request("feed", "GET", self._read_path("contents", "feed/"))
+
+    def search(self):
+        query = urllib.parse.quote(random.choice(SEARCH_TERMS))
+        self.client.request("search", "GET", f"/api/contents/search/?q={query}")
+
+    def trending(self):
+        self.client.request("trending", "GET", "/api/contents/trending/")
+
+    def create_content(self):
+        self.client.request("create_content", "POST", "/api/contents/create/", {
+            "title": f"Load test item {random.randrange(10 ** 6)}",
+            "description": "Created by the load test harness",
+            "category_id": random.choice(self.category_ids),
+            "tags": random.sample(["loadtest", "tag-0", "tag-1", "tag-2", "tag-3"], 2),
+        })
+
+    def update_content(self):
+        if self.own_content_ids:
+            self.client.request("update_content", "PUT", f"/api/contents/update/{random.choice(self.own_content_ids)}/",
+                                {"title": f"Updated {random.randrange(10 ** 6)}"})
+
+    def delete_content(self):
+        if self.own_content_ids:
+            content_id = self.own_content_ids.pop(random.randrange(len(self.own_content_ids)))
+            self.client.request("delete_content", "DELETE", f"/api/contents/delete/{content_id}/")
+
+    def track_activity(self):
+        self.client.request("track_activity", "POST", "/api/users/activities/", {
+            "action": random.choice(["viewed", "viewed", "liked", "skipped"]),
+            "content": random.choice(self.content_ids),
+        })
+
+    def track_activities_batch(self):
+        self.client.request("track_activities_batch", "POST", "/api/users/activities/batch/", [
+            {"action": random.choice(["viewed", "liked"]), "content": random.choice(self.content_ids)}
+            for _ in range(20)
+        ])
+
+    def list_plans(self):
+        self.client.request("list_plans", "GET", self._read_path("subscriptions", "plans/"))
+
+    def list_subscriptions(self):
+        status, body = self.client.request("list_subscriptions", "GET", "/api/subscriptions/")
+        if status == 200:
+            own = [item["id"] for item in body if item["user_id"] == self.user_id]
+            self.subscription_id = own[0] if own else None
+
+    def get_subscription(self):
+        if self.subscription_id:
+            self.client.request("get_subscription", "GET", self._read_path("subscriptions", str(self.subscription_id)))
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the API of a running server with concurrent virtual users and report throughput, "
+        "p50/p95/p99 latency and SQL queries per endpoint. Run seed_synthetic_data first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--concurrency", type=int, default=8, help="Number of concurrent virtual users")
+        parser.add_argument("--duration", type=float, default=30, help="Seconds to run after logging in")
+        parser.add_argument("--prefix", default="synthetic-", help="Username prefix used by seed_synthetic_data")
+        parser.add_argument("--password", default="synthetic-password")
+        parser.add_argument("--timeout", type=float, default=10)
+        parser.add_argument("--seed", type=int)
+        parser.add_argument("--operations",
+                            help=f"Comma-separated subset of the scenario to run, e.g. {','.join(ASYNC_OPERATIONS)}")
+        parser.add_argument("--async-routes", action="store_true",
+                            help="Send the reads in ASYNC_OPERATIONS to the native async views; "
+                                 "run the server under ASGI (see README)")
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        accounts = list(User.objects.filter(username__startswith=options["prefix"])
+                        .order_by("?").values_list("id", "username")[:options["concurrency"]])
+        category_ids = list(Category.objects.values_list("id", flat=True)[:100])
+        content_ids = list(Content.objects.order_by("?").values_list("id", flat=True)[:1000])
+        if not accounts or not category_ids or not content_ids:
+            raise CommandError("No synthetic data found; run `manage.py seed_synthetic_data` first")
+
+        scenario = SCENARIO
+        if options["operations"]:
+            names = options["operations"].split(",")
+            unknown = set(names) - SCENARIO.keys()
+            if unknown:
+                raise CommandError(f"Unknown operations: {', '.join(sorted(unknown))}")
+            scenario = {name: SCENARIO[name] for name in names}
+
+        stats = Stats()
+        users = [
+            VirtualUser(Client(options["base_url"], stats, options["timeout"]), *accounts[i % len(accounts)],
+                        options["password"], category_ids, content_ids, options["async_routes"])
+            for i in range(options["concurrency"])
+        ]
+        operations, weights = zip(*scenario.items())
+        subscription_ids = dict(Subscription.objects.filter(user_id__in=[user.user_id for user in users])
+                                .values_list("user_id", "id"))
+        for user in users:
+            user.subscription_id = subscription_ids.get(user.user_id)
+
+        def work(user):
+            user.login()
+            user.list_contents()
+            deadline = time.monotonic() + options["duration"]
+            while time.monotonic() < deadline:
+                user.run(random.choices(operations, weights)[0])
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            for future in [executor.submit(work, user) for user in users]:
+                future.result()
+        self._report(stats, time.perf_counter() - started)
+
+    def _report(self, stats, elapsed):
+        header = f"{'endpoint':<24}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}" \
+                 f"{'avg SQL':>9}{'max SQL':>9}"
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+        total = 0
+        for name in sorted(stats.latencies):
+            latencies = np.array(stats.latencies[name]) * 1000
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            queries = stats.queries.get(name)
+            avg_sql = f"{np.mean(queries):.1f}" if queries else "-"
+            max_sql = f"{max(queries)}" if queries else "-"
+            total += len(latencies)
+            self.stdout.write(
+                f"{name:<24}{len(latencies):>9}{stats.errors[name]:>8}{len(latencies) / elapsed:>9.1f}"
+                f"{p50:>9.1f}{p95:>9.1f}{p99:>9.1f}{avg_sql:>9}{max_sql:>9}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} requests in {elapsed:.1f}s: {total / elapsed:.1f} req/s overall"
+        ))
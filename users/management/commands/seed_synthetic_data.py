@@ -0,0 +1,172 @@
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from content.models import Category, Content, Tag
+from content.search import get_search_backend, search_enabled
+from subscription.models import Subscription, SubscriptionPlan
+from users.models import UserActivity
+
+PLANS = [
+    ("monthly", "9.99", 30),
+    ("quarterly", "26.99", 90),
+    ("bi_yearly", "49.99", 180),
+    ("yearly", "89.99", 365),
+]
+
+ACTIONS = ["viewed", "liked", "skipped"]
+ACTION_PROBABILITIES = [0.7, 0.2, 0.1]
+
+WORDS = (
+    "market price stock travel guide recipe review video music sport news update "
+    "design garden health fitness science space history movie game coding python "
+    "data cloud mobile photo fashion finance budget home family weekend city"
+).split()
+
+
+def zipf_probabilities(size, exponent):
+    weights = 1.0 / np.arange(1, size + 1) ** exponent
+    return weights / weights.sum()
+
+
+class Command(BaseCommand):
+    help = "Generate a synthetic dataset (users, content, tags, plans, subscriptions, activity) for load testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--contents", type=int, default=10000)
+        parser.add_argument("--activities", type=int, default=100000)
+        parser.add_argument("--categories", type=int, default=20)
+        parser.add_argument("--tags", type=int, default=500)
+        parser.add_argument("--tags-per-content", type=int, default=4, help="Upper bound; at least one each")
+        parser.add_argument("--subscribed", type=float, default=0.3, help="Fraction of new users with a subscription")
+        parser.add_argument("--zipf-exponent", type=float, default=1.1,
+                            help="Skew of tag usage and content popularity")
+        parser.add_argument("--days", type=int, default=30, help="Spread activity timestamps over this many days")
+        parser.add_argument("--prefix", default="synthetic-", help="Username prefix; the loadtest logs in with it")
+        parser.add_argument("--password", default="synthetic-password")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int)
+
+    def handle(self, *args, **options):
+        self.rng = np.random.default_rng(options["seed"])
+        self.batch_size = options["batch_size"]
+        started = time.perf_counter()
+
+        plans = self._plans()
+        categories = self._named(Category, "category", options["categories"])
+        tags = self._named(Tag, "tag", options["tags"])
+        users = self._users(options["users"], options["prefix"], options["password"])
+        subscriptions = self._subscriptions(users, plans, options["subscribed"])
+        contents = self._contents(options["contents"], users, categories)
+        tag_links = self._tag_links(contents, tags, options["tags_per_content"], options["zipf_exponent"])
+        activities = self._activities(options["activities"], users, contents, options["zipf_exponent"],
+                                      options["days"])
+        self._index_for_search(contents)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(users)} users, {subscriptions} subscriptions, {len(contents)} content items, "
+            f"{tag_links} tag links and {activities} activities in {time.perf_counter() - started:.1f}s"
+        ))
+
+    def _bulk_create(self, model, objects, **kwargs):
+        return model.objects.bulk_create(objects, batch_size=self.batch_size, **kwargs)
+
+    def _plans(self):
+        self._bulk_create(SubscriptionPlan, [
+            SubscriptionPlan(name=name, price=price, duration_days=days) for name, price, days in PLANS
+        ], ignore_conflicts=True)
+        return list(SubscriptionPlan.objects.all())
+
+    def _named(self, model, prefix, count):
+        names = [f"{prefix}-{i}" for i in range(count)]
+        self._bulk_create(model, [model(name=name) for name in names], ignore_conflicts=True)
+        # Ordered by name rank, so the Zipf head is tag-0, tag-1, ...
+        by_name = {obj.name: obj.id for obj in model.objects.filter(name__in=names)}
+        return np.array([by_name[name] for name in names], dtype=np.int64)
+
+    def _users(self, count, prefix, password):
+        start = User.objects.filter(username__startswith=prefix).count()
+        # Hashing is deliberately slow; every synthetic user shares one hash.
+        password_hash = make_password(password)
+        users = self._bulk_create(User, [
+            User(username=f"{prefix}{start + i}", email=f"{prefix}{start + i}@example.com", password=password_hash)
+            for i in range(count)
+        ])
+        return np.array([user.id for user in users], dtype=np.int64)
+
+    def _subscriptions(self, users, plans, fraction):
+        subscribed = users[self.rng.random(len(users)) < fraction]
+        now = timezone.now()
+        subscriptions = []
+        for user_id, plan_index in zip(subscribed.tolist(), self.rng.integers(len(plans), size=len(subscribed))):
+            plan = plans[plan_index]
+            # start_date is auto_now_add. Some subscriptions are already past
+            # their end date, so the expiry sweep has work to do.
+            remaining = int(self.rng.integers(-7, plan.duration_days))
+            subscriptions.append(Subscription(
+                user_id=user_id, plan=plan, end_date=now + timedelta(days=remaining),
+                auto_renew=bool(self.rng.random() < 0.5),
+            ))
+        return len(self._bulk_create(Subscription, subscriptions))
+
+    def _text(self, words):
+        return " ".join(self.rng.choice(WORDS, size=words))
+
+    def _contents(self, count, users, categories):
+        owners = self.rng.choice(users, size=count)
+        category_ids = self.rng.choice(categories, size=count)
+        contents = self._bulk_create(Content, [
+            Content(
+                owner_id=owner_id, category_id=category_id,
+                title=self._text(4).capitalize(), description=self._text(30),
+            )
+            for owner_id, category_id in zip(owners.tolist(), category_ids.tolist())
+        ])
+        return np.array([content.id for content in contents], dtype=np.int64)
+
+    def _tag_links(self, contents, tags, per_content, exponent):
+        counts = self.rng.integers(1, per_content + 1, size=len(contents))
+        drawn = self.rng.choice(tags, size=int(counts.sum()), p=zipf_probabilities(len(tags), exponent))
+        owners = np.repeat(contents, counts)
+        # Duplicate draws for the same item collapse into one link.
+        pairs = np.unique(np.stack([owners, drawn], axis=1), axis=0)
+        through = Content.tags.through
+        self._bulk_create(through, [
+            through(content_id=content_id, tag_id=tag_id) for content_id, tag_id in pairs.tolist()
+        ])
+        return len(pairs)
+
+    def _activities(self, count, users, contents, exponent, days):
+        # Popularity follows the same skew: a few items attract most activity.
+        popularity = self.rng.permutation(contents)
+        content_ids = self.rng.choice(popularity, size=count, p=zipf_probabilities(len(contents), exponent))
+        user_ids = self.rng.choice(users, size=count)
+        actions = self.rng.choice(len(ACTIONS), size=count, p=ACTION_PROBABILITIES)
+        ages = self.rng.random(count) * days * 24 * 60 * 60
+        now = timezone.now()
+
+        created = 0
+        for start in range(0, count, self.batch_size):
+            end = start + self.batch_size
+            created += len(UserActivity.objects.bulk_create([
+                UserActivity(user_id=user_id, content_id=content_id, action=ACTIONS[action],
+                             timestamp=now - timedelta(seconds=age))
+                for user_id, content_id, action, age in zip(
+                    user_ids[start:end].tolist(), content_ids[start:end].tolist(),
+                    actions[start:end].tolist(), ages[start:end].tolist(),
+                )
+            ]))
+        return created
+
+    def _index_for_search(self, contents):
+        """bulk_create skips the signals that keep the search index in step."""
+        if search_enabled():
+            backend = get_search_backend()
+            for start in range(0, len(contents), self.batch_size):
+                backend.index(contents[start:start + self.batch_size].tolist())
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.20 on 2026-10-18 18:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0002_tag_alter_content_ai_relevance_score_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0003_useractivity_event_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCategoryActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('viewed', models.PositiveIntegerField(default=0)),
+                ('liked', models.PositiveIntegerField(default=0)),
+                ('skipped', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_activity', to='content.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_activity', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyContentActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('viewed', models.PositiveIntegerField(default=0)),
+                ('liked', models.PositiveIntegerField(default=0)),
+                ('skipped', models.PositiveIntegerField(default=0)),
+                ('content', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to='content.content')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='usercategoryactivity',
+            constraint=models.UniqueConstraint(fields=('user', 'category'), name='unique_user_category_activity'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailycontentactivity',
+            constraint=models.UniqueConstraint(fields=('content', 'day'), name='unique_daily_content_activity'),
+        ),
+    ]
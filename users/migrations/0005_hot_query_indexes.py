@@ -0,0 +1,17 @@
+# Generated by Django 4.2.20 on 2026-10-18 18:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_activity_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['user', 'content', 'action'], name='useractivity_user_content_idx'),
+        ),
+    ]
@@ -1,7 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
-from content.models import Content
+from content.models import Category, Content
 
 
 # Create your models here.
@@ -15,8 +16,65 @@ class UserActivity(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     action = models.CharField(max_length=10, choices=ACTION_CHOICES)
     content = models.ForeignKey(Content, on_delete=models.CASCADE)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)
+    # Set for events that went through the write-behind buffer, so a batch
+    # that is drained more than once is only stored once.
+    event_id = models.UUIDField(null=True, blank=True, unique=True, editable=False)
 
+    class Meta:
+        indexes = [
+            # Covers the feed's per-user reads: what a user has seen, and
+            # their tag affinities by action.
+            models.Index(fields=["user", "content", "action"], name="useractivity_user_content_idx"),
+        ]
+
+
+    def __str__(self):
+        return f"{self.user.username} {self.action} content {self.content.title}"
+
+class ActivityWatermark(models.Model):
+    """Id of the last UserActivity row a background job has already processed."""
+
+    name = models.CharField(max_length=100, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_id}"
+
+
+
+class DailyContentActivity(models.Model):
+    """Per-content, per-day UserActivity counts, maintained by `users.rollups`."""
+
+    content = models.ForeignKey(Content, on_delete=models.CASCADE, related_name="daily_activity")
+    day = models.DateField()
+    viewed = models.PositiveIntegerField(default=0)
+    liked = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["content", "day"], name="unique_daily_content_activity"),
+        ]
+
+    def __str__(self):
+        return f"content {self.content_id} on {self.day}"
+
+
+class UserCategoryActivity(models.Model):
+    """Per-user, per-category UserActivity counts, maintained by `users.rollups`."""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="category_activity")
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="user_activity")
+    viewed = models.PositiveIntegerField(default=0)
+    liked = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "category"], name="unique_user_category_activity"),
+        ]
 
     def __str__(self):
-        return f"{self.user.username} {self.action} content {self.content.title}"
\ No newline at end of file
+        return f"user {self.user_id} in category {self.category_id}"
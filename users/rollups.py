@@ -0,0 +1,105 @@
+import logging
+
+from django.db import connection, transaction
+from django.db.models import Count, Max, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ActivityWatermark, DailyContentActivity, UserActivity, UserCategoryActivity
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_WATERMARK = "activity_rollups"
+ROLLUP_CHUNK_SIZE = 50000
+
+COUNT_COLUMNS = ["viewed", "liked", "skipped"]
+
+
+def _action_counts():
+    return {
+        column: Count("id", filter=Q(action=column))
+        for column in COUNT_COLUMNS
+    }
+
+
+def _upsert_counts(model, key_columns, rows):
+    """Add `rows` onto the existing counts with INSERT ... ON CONFLICT DO UPDATE."""
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = key_columns + COUNT_COLUMNS
+    sql = (
+        f"INSERT INTO {table} ({', '.join(quote(column) for column in columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON CONFLICT ({', '.join(quote(column) for column in key_columns)}) DO UPDATE SET "
+        + ", ".join(f"{quote(column)} = {table}.{quote(column)} + excluded.{quote(column)}" for column in COUNT_COLUMNS)
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def fold_activity_range(low, high):
+    """Fold UserActivity rows with `low < id <= high` into the rollup tables."""
+    events = UserActivity.objects.filter(id__gt=low, id__lte=high)
+
+    daily = (
+        events.annotate(day=TruncDate("timestamp"))
+        .values("content_id", "day")
+        .annotate(**_action_counts())
+        .order_by()
+    )
+    _upsert_counts(DailyContentActivity, ["content_id", "day"], [
+        (row["content_id"], connection.ops.adapt_datefield_value(row["day"]),
+         row["viewed"], row["liked"], row["skipped"])
+        for row in daily
+    ])
+
+    per_category = (
+        events.values("user_id", "content__category_id")
+        .annotate(**_action_counts())
+        .order_by()
+    )
+    _upsert_counts(UserCategoryActivity, ["user_id", "category_id"], [
+        (row["user_id"], row["content__category_id"], row["viewed"], row["liked"], row["skipped"])
+        for row in per_category
+    ])
+
+
+def fold_new_activity():
+    """Fold every UserActivity row past the rollup watermark, one chunk per transaction.
+
+    Each chunk claims its id range by moving the watermark with a
+    compare-and-set UPDATE in the same transaction as the upserts, so two
+    concurrent runs can never fold the same rows twice. Returns the number
+    of ids covered.
+
+    The watermark assumes rows become visible in id order. That holds on
+    SQLite, where a write transaction holds the database lock from its first
+    insert until it commits. On a database with concurrent writers (e.g.
+    PostgreSQL) a transaction can commit a lower id after a higher one has
+    been folded, and that row would never be counted; such a backend needs
+    the fold to hold back a trailing margin of ids first.
+    """
+    ActivityWatermark.objects.get_or_create(name=ROLLUP_WATERMARK)
+    high = UserActivity.objects.aggregate(high=Max("id"))["high"] or 0
+    folded = 0
+
+    while True:
+        low = ActivityWatermark.objects.get(name=ROLLUP_WATERMARK).last_id
+        if low >= high:
+            break
+        upper = min(low + ROLLUP_CHUNK_SIZE, high)
+        with transaction.atomic():
+            claimed = ActivityWatermark.objects.filter(name=ROLLUP_WATERMARK, last_id=low).update(
+                last_id=upper, updated_at=timezone.now()
+            )
+            if not claimed:
+                # Another run got here first; pick up from wherever it left off.
+                continue
+            fold_activity_range(low, upper)
+        folded += upper - low
+
+    if folded:
+        logger.info(f"Folded activity ids up to {high} into the rollup tables")
+    return folded
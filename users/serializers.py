@@ -1,8 +1,10 @@
 from django.contrib.auth.models import User
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 
 from content.models import Content
 from .models import UserActivity
+from .tokens import CargoRefreshToken
 
 class RegisterUserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=6)
@@ -20,6 +22,14 @@ class RegisterUserSerializer(serializers.ModelSerializer):
         return user
     
 
+class CargoTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = CargoRefreshToken
+
+
+class CargoTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = CargoRefreshToken
+
+
 class UserSerializer(serializers.ModelSerializer):
     id = serializers.CharField(read_only=True)
     class Meta:
@@ -37,3 +47,13 @@ class UserActivitySerializer(serializers.ModelSerializer):
         fields = "__all__"
         read_only_fields = ["timestamp"]
     
+
+
+class ActivityEventSerializer(serializers.Serializer):
+    """Shape-only validation of a single event in an activity batch.
+
+    Content existence is checked for the whole batch at once, see
+    `users.activity.record_activities`.
+    """
+    action = serializers.ChoiceField(choices=UserActivity.ACTION_CHOICES)
+    content = serializers.IntegerField(min_value=1)
@@ -0,0 +1,8 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .authentication import evict_cached_user
+
+@receiver([post_save, post_delete], sender=User)
+def evict_cached_auth_user(sender, instance, **kwargs):
+    evict_cached_user(instance.id)
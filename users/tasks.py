@@ -0,0 +1,31 @@
+from celery import shared_task
+from django.conf import settings
+from .activity import persist_buffered_activities
+from .buffer import get_activity_buffer
+from .rollups import fold_new_activity
+
+# Upper bound on batches per run, so one slow drain can't run into the next.
+MAX_DRAIN_BATCHES = 100
+
+
+@shared_task
+def drain_activity_buffer():
+    buffer = get_activity_buffer()
+    batch_size = settings.ACTIVITY_BUFFER["DRAIN_BATCH_SIZE"]
+    drained = 0
+
+    for _ in range(MAX_DRAIN_BATCHES):
+        claim_id, events = buffer.claim(batch_size)
+        if not events:
+            break
+        drained += persist_buffered_activities(events)
+        buffer.ack(claim_id)
+
+    return f"Drained {drained} buffered activities."
+
+
+
+@shared_task
+def rollup_user_activity():
+    folded = fold_new_activity()
+    return f"Folded {folded} activity ids into the rollup tables."
@@ -1,3 +1,295 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncDate
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from cargo.testing import QueryPlanTestCase, local_services
+from content.models import Category, Content, Tag
+from content.ranking import _category_rows
+from subscription.models import Subscription, SubscriptionPlan
+from users import rollups
+from users.activity import MAX_BATCH_SIZE, persist_buffered_activities
+from users.buffer import BufferFull, LocalActivityBuffer, make_event
+from users.management.commands import loadtest
+from users.models import DailyContentActivity, UserActivity, UserCategoryActivity
+from users.rollups import fold_activity_range, fold_new_activity
+from users.tasks import drain_activity_buffer
+
+
+class ActivityQueryPlanTests(QueryPlanTestCase):
+    """The per-user activity reads behind the feed must stay on an index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="reader", password="password")
+        other = User.objects.create_user(username="writer", password="password")
+        category = Category.objects.create(name="News")
+        tag = Tag.objects.create(name="python")
+        contents = [
+            Content.objects.create(owner=other, title=f"Item {i}", description="Body", category=category)
+            for i in range(4)
+        ]
+        for content in contents:
+            content.tags.add(tag)
+        cls.activities = [
+            UserActivity.objects.create(user=user, content=content, action=action)
+            for user in (cls.user, other)
+            for content in contents
+            for action in ("viewed", "liked")
+        ]
+
+    def test_seen_content(self):
+        seen = lambda: list(
+            UserActivity.objects.filter(user=self.user).values_list("content_id", flat=True).distinct()
+        )
+        self.assertUsesIndex(seen, "useractivity_user_content_idx")
+        self.assertNoFullScan(seen)
+
+    def test_tag_affinity(self):
+        rows = lambda: list(
+            UserActivity.objects.filter(user=self.user)
+            .values("content__tags", "action")
+            .annotate(n=Count("id"))
+            .order_by()
+        )
+        self.assertNoFullScan(rows)
+
+    def test_category_affinity(self):
+        self.assertNoFullScan(lambda: list(_category_rows(self.user)))
+
+    def test_rollup_fold(self):
+        low, high = self.activities[0].id - 1, self.activities[-1].id
+        self.assertNoFullScan(lambda: fold_activity_range(low, high))
+
+
+class RollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(username=f"reader-{i}", password="password") for i in range(3)]
+        categories = [Category.objects.create(name="News"), Category.objects.create(name="Sport")]
+        cls.contents = [
+            Content.objects.create(owner=cls.users[0], title=f"Item {i}", description="Body",
+                                   category=categories[i % 2])
+            for i in range(4)
+        ]
+
+    def add_activity(self, round_):
+        now = timezone.now()
+        actions = ["viewed", "liked", "skipped"]
+        for i, user in enumerate(self.users):
+            for j, content in enumerate(self.contents):
+                UserActivity.objects.create(user=user, content=content, action=actions[(i + j + round_) % 3],
+                                            timestamp=now - timedelta(days=(i * j + round_) % 3))
+
+    def counts(self):
+        return {column: Count("id", filter=Q(action=column)) for column in rollups.COUNT_COLUMNS}
+
+    def test_totals_match_a_group_by_after_several_folds(self):
+        # Small chunks, so each fold spans several of them.
+        with mock.patch.object(rollups, "ROLLUP_CHUNK_SIZE", 5):
+            for round_ in range(3):
+                self.add_activity(round_)
+                fold_new_activity()
+        self.assertEqual(fold_new_activity(), 0)
+
+        daily = (UserActivity.objects.annotate(day=TruncDate("timestamp"))
+                 .values("content_id", "day").annotate(**self.counts()).order_by())
+        self.assertEqual(
+            {(row.pop("content_id"), row.pop("day")): row for row in daily},
+            {(row.pop("content_id"), row.pop("day")): row
+             for row in DailyContentActivity.objects.values("content_id", "day", *rollups.COUNT_COLUMNS)},
+        )
+        per_category = (UserActivity.objects.values("user_id", category_id=F("content__category_id"))
+                        .annotate(**self.counts()).order_by())
+        self.assertEqual(
+            {(row.pop("user_id"), row.pop("category_id")): row for row in per_category},
+            {(row.pop("user_id"), row.pop("category_id")): row
+             for row in UserCategoryActivity.objects.values("user_id", "category_id", *rollups.COUNT_COLUMNS)},
+        )
+
+
+@local_services
+class ActivityBufferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="reader", password="password")
+        owner = User.objects.create_user(username="writer", password="password")
+        cls.content = Content.objects.create(owner=owner, title="Item", description="Body",
+                                             category=Category.objects.create(name="News"))
+
+    def events(self, count):
+        return [make_event(self.user, "viewed", self.content.id) for _ in range(count)]
+
+    def test_concurrent_claims_are_acknowledged_separately(self):
+        buffer = LocalActivityBuffer(max_size=10)
+        buffer.push(self.events(3))
+        first_id, first = buffer.claim(2)
+        second_id, second = buffer.claim(2)
+        self.assertEqual((len(first), len(second)), (2, 1))
+
+        buffer.ack(first_id)
+        self.assertEqual(len(buffer), 1)
+        buffer.ack(second_id)
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(buffer.claim(2), (None, []))
+
+    def test_full_buffer_rejects_events(self):
+        buffer = LocalActivityBuffer(max_size=3)
+        buffer.push(self.events(2))
+        buffer.claim(2)
+        # Claimed events still count towards the capacity until acknowledged.
+        with self.assertRaises(BufferFull):
+            buffer.push(self.events(2))
+        self.assertEqual(len(buffer), 2)
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with override_settings(ACTIVITY_BUFFER={"ENABLED": True, "BACKEND": "local", "MAX_SIZE": 3}), \
+                mock.patch("users.activity.get_activity_buffer", return_value=buffer):
+            response = client.post("/api/users/activities/batch/",
+                                   [{"action": "liked", "content": self.content.id}] * 2, format="json")
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response)
+
+    def test_empty_batch_is_accepted_without_touching_the_buffer(self):
+        buffer = mock.Mock()
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with override_settings(ACTIVITY_BUFFER={"ENABLED": True, "BACKEND": "local", "MAX_SIZE": 3}), \
+                mock.patch("users.activity.get_activity_buffer", return_value=buffer):
+            response = client.post("/api/users/activities/batch/", [], format="json")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["accepted"], 0)
+        buffer.push.assert_not_called()
+
+    def test_batch_of_a_crashed_drain_is_stored_once(self):
+        buffer = LocalActivityBuffer(max_size=10, claim_timeout=0)
+        buffer.push(self.events(3))
+        # A drain that stored its batch but died before acknowledging it.
+        _, events = buffer.claim(2)
+        persist_buffered_activities(events)
+
+        with mock.patch("users.tasks.get_activity_buffer", return_value=buffer):
+            drain_activity_buffer()
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(UserActivity.objects.filter(user=self.user).count(), 3)
+
+
+@local_services
+class ActivityBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="reader", password="password")
+        owner = User.objects.create_user(username="writer", password="password")
+        cls.content = Content.objects.create(owner=owner, title="Item", description="Body",
+                                             category=Category.objects.create(name="News"))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, events):
+        return self.client.post("/api/users/activities/batch/", events, format="json")
+
+    def test_partial_success_reports_each_rejected_event(self):
+        response = self.post([
+            {"action": "liked", "content": self.content.id},
+            {"action": "shared", "content": self.content.id},
+            {"action": "viewed", "content": self.content.id + 100},
+            {"action": "viewed", "content": self.content.id},
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual([error["index"] for error in response.data["errors"]], [1, 2])
+        self.assertIn("action", response.data["errors"][0]["errors"])
+        self.assertIn("content", response.data["errors"][1]["errors"])
+        self.assertEqual(UserActivity.objects.filter(user=self.user).count(), 2)
+
+    def test_rejects_a_batch_with_no_valid_events(self):
+        response = self.post([{"action": "viewed", "content": self.content.id + 100}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["created"], 0)
+
+    def test_rejects_oversized_batches_before_validating(self):
+        with self.assertNumQueries(0):
+            response = self.post([{"action": "viewed", "content": self.content.id}] * (MAX_BATCH_SIZE + 1))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(UserActivity.objects.exists())
+
+    def test_content_is_checked_with_one_query(self):
+        events = [{"action": "viewed", "content": self.content.id + i % 2} for i in range(50)]
+        # The IN lookup of the content ids, then the savepoint, the insert
+        # and the release around bulk_create.
+        with self.assertNumQueries(4):
+            response = self.post(events)
+        self.assertEqual(response.data["created"], 25)
+
+
+class LoginTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="reader", password="password")
+
+    def login(self, password):
+        return APIClient().post("/api/users/login/", {"username": "reader", "password": password}, format="json")
+
+    def test_returns_a_token_pair_with_entitlement_claims(self):
+        with mock.patch("django.contrib.auth.backends.ModelBackend.authenticate", autospec=True,
+                        side_effect=ModelBackend.authenticate) as authenticate:
+            response = self.login("password")
+        self.assertEqual(response.status_code, 200)
+        # The credentials are checked, and the password hashed, once.
+        self.assertEqual(authenticate.call_count, 1)
+        access = AccessToken(response.data["access"])
+        self.assertEqual(access["user_id"], self.user.id)
+        self.assertIsNone(access["plan"])
+        self.assertIn("refresh", response.data)
+
+    def test_wrong_credentials_are_unauthorized(self):
+        response = self.login("wrong")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data, {"detail": "Invalid credentials"})
+
+
+@local_services
+class LoadTestCommandTests(TestCase):
+    def seed(self):
+        call_command("seed_synthetic_data", users=5, contents=20, activities=50, categories=3, tags=10,
+                     batch_size=7, seed=1, stdout=StringIO())
+
+    def test_seeding_twice_adds_data_and_reuses_the_shared_rows(self):
+        self.seed()
+        counts = lambda: [model.objects.count() for model in (User, Content, UserActivity)]
+        first = counts()
+        self.assertEqual(first, [5, 20, 50])
+        shared = lambda: [list(model.objects.order_by("id").values_list("id", "name"))
+                          for model in (Category, Tag, SubscriptionPlan)]
+        shared_rows = shared()
+
+        self.seed()
+        self.assertEqual(counts(), [2 * n for n in first])
+        self.assertEqual(shared(), shared_rows)
+        self.assertFalse(Subscription.objects.values("user").annotate(n=Count("id")).filter(n__gt=1).exists())
+
+    def test_report_handles_endpoints_without_query_samples(self):
+        stats = loadtest.Stats()
+        stats.add("list_contents", 0.010, 200, 3)
+        stats.add("list_contents", 0.020, 200, 5)
+        # Responses without the query-count header (e.g. from a proxy).
+        stats.add("search", 0.030, 502, None)
+        out = StringIO()
+        loadtest.Command(stdout=out)._report(stats, elapsed=2.0)
+
+        lines = {line.split()[0]: line.split() for line in out.getvalue().splitlines()[2:-1]}
+        self.assertEqual(lines["list_contents"][1:3] + lines["list_contents"][-2:], ["2", "0", "4.0", "5"])
+        self.assertEqual(lines["search"][1:3] + lines["search"][-2:], ["1", "1", "-", "-"])
+        self.assertIn("3 requests in 2.0s", out.getvalue())
@@ -0,0 +1,17 @@
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from subscription.entitlements import entitlement_claims
+
+
+class CargoRefreshToken(RefreshToken):
+    """Refresh token whose access tokens carry up-to-date subscription entitlement claims.
+
+    The claims are computed whenever an access token is minted, both at login
+    and on refresh, rather than copied from the refresh token.
+    """
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        access.payload.update(entitlement_claims(self[api_settings.USER_ID_CLAIM]))
+        return access
@@ -2,16 +2,21 @@ from django.shortcuts import render
 from django.contrib.auth.models import User
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.response import Response
 from rest_framework import status
 from .serializers import RegisterUserSerializer
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import permissions
-from django.contrib.auth import authenticate
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from rest_framework_simplejwt.views import TokenObtainPairView
 from .models import UserActivity
-from .serializers import UserActivitySerializer
+from .serializers import UserActivitySerializer, ActivityEventSerializer
+from .activity import record_activities, validate_activities, enqueue_activities, MAX_BATCH_SIZE
+from .buffer import BufferFull, write_behind_enabled
+from content import trending
+
+BUFFER_RETRY_AFTER_SECONDS = 5
 
 # Create your views here.
 
@@ -37,18 +42,30 @@ class LoginView(TokenObtainPairView):
     permission_classes = [permissions.AllowAny]
 
     def post(self, request, *args, **kwargs):
-
-        username = request.data.get("username")
-        password = request.data.get("password")
-
-        user = authenticate(username=username, password=password)
-        if user is not None:
-            return super().post(request, *args, **kwargs)
-        else:
+        # The token serializer authenticates the credentials and mints the
+        # pair for the user it found, so the password is hashed only once.
+        serializer = self.get_serializer(data=request.data)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except (AuthenticationFailed, ValidationError):
             return Response(
                 {"detail": "Invalid credentials"},
                 status=status.HTTP_401_UNAUTHORIZED
             )
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+
+        return Response(serializer.validated_data, status=status.HTTP_200_OK)
+
+
+def _enqueue(user, valid, body):
+    try:
+        enqueue_activities(user, valid)
+    except BufferFull:
+        return Response({"message": "Activity buffer is full, please retry later."},
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        headers={"Retry-After": str(BUFFER_RETRY_AFTER_SECONDS)})
+    return Response(body, status=status.HTTP_202_ACCEPTED)
             
             
 
@@ -58,21 +75,69 @@ class LoginView(TokenObtainPairView):
     request_body=UserActivitySerializer,
     responses={
         201: "Activity logged successfully",
+        202: "Activity accepted for asynchronous storage (write-behind mode)",
         400: "Bad request. Invalid data format.",
         401: "Unauthorized. Authentication required.",
-        500: "Internal server error."
+        500: "Internal server error.",
+        503: "Activity buffer is full, retry later (write-behind mode)"
     }
 )
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def track_user_activity(request):
     try:
+        if write_behind_enabled():
+            valid, errors = validate_activities([request.data])
+            if errors:
+                return Response(errors[0]["errors"], status=status.HTTP_400_BAD_REQUEST)
+            return _enqueue(request.user, valid, {"message": "UserActivity accepted"})
+
         serializer = UserActivitySerializer(data=request.data)
         
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)            
             
-        serializer.save(user=request.user) 
+        activity = serializer.save(user=request.user)
+        trending.record([activity])
         return Response({"message": "UserActivity Created successfully"}, status=status.HTTP_201_CREATED)
     except Exception as e:
-        return Response({"message" : "An Error Occured while trying to create the UserActivity"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        return Response({"message" : "An Error Occured while trying to create the UserActivity"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+
+@swagger_auto_schema(
+    method="post",
+    operation_description="Track a batch of user activities (viewed, liked or skipped content) in one request. "
+                          "Invalid events are reported per item and do not reject the rest of the batch.",
+    request_body=ActivityEventSerializer(many=True),
+    responses={
+        201: "Activities logged, with per-item errors for any rejected events",
+        202: "Activities accepted for asynchronous storage (write-behind mode)",
+        400: "Bad request. Invalid payload or every event was rejected.",
+        401: "Unauthorized. Authentication required.",
+        500: "Internal server error.",
+        503: "Activity buffer is full, retry later (write-behind mode)"
+    }
+)
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def track_user_activities_batch(request):
+    events = request.data
+    if not isinstance(events, list):
+        return Response({"message": "Expected a list of activity events."}, status=status.HTTP_400_BAD_REQUEST)
+    if len(events) > MAX_BATCH_SIZE:
+        return Response({"message": f"A batch can contain at most {MAX_BATCH_SIZE} events."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        if write_behind_enabled():
+            valid, errors = validate_activities(events)
+            if not valid and errors:
+                return Response({"accepted": 0, "errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+            return _enqueue(request.user, valid, {"accepted": len(valid), "errors": errors})
+
+        created, errors = record_activities(request.user, events)
+        response_status = status.HTTP_201_CREATED if created or not errors else status.HTTP_400_BAD_REQUEST
+        return Response({"created": len(created), "errors": errors}, status=response_status)
+    except Exception as e:
+        return Response({"message" : "An Error Occured while trying to create the UserActivities"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file